@@ -8,30 +8,92 @@ Render.com 실행: uvicorn api_server:app --host 0.0.0.0 --port $PORT
 로컬 테스트:     uvicorn api_server:app --host 0.0.0.0 --port 8000 --reload
 """
 
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
 
 # core/logic.py 및 config.py 임포트를 위해 경로 설정
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from starlette.requests import ClientDisconnect
+from typing import Dict, List, Optional
+
+import pandas as pd
 
 import config
+from core.idempotency import IdempotencyStore
+from core.job_queue import JobQueue
+from core.single_writer import SingleWriter
 from core.logic import (
-    deduct_by_menu,
+    deduct_by_menus,
     get_menu_cost_breakdown,
     get_low_stock_items,
     get_available_menus,
+    get_all_menu_costs,
+    simulate_menu_prices,
+    get_ingredient_menus,
+    get_ingredient_consumption,
+    add_price_version,
+    recost_sales,
+    forecast_ingredient_demand,
+    get_recipe_version,
+    load_inventory_as_of,
+    flush_pending_writes,
+    data_mutation,
+    applied_sale_refs,
+    DeductWriteError,
 )
 
+# 재고·단가 등 모든 변경은 이 작성자 하나가 순서대로 실행 (core/single_writer.py)
+# 조회 엔드포인트는 거치지 않음 - 동시에 실행
+# 작성자는 작업자 프로세스마다 하나 - 프로세스 사이(--workers N, Streamlit)는 core.logic 의 파일 잠금으로 직렬화
+writer = SingleWriter("inventory-writer")
+
+# 비동기 차감 작업 큐 (core/job_queue.py) - 요청을 먼저 기록하고 202 응답
+jobs = JobQueue(config.JOB_QUEUE_DB)
+_job_tasks: set = set()   # 실행 중인 작업 태스크 참조 (GC 방지)
+
+# 재시도된 차감 요청은 저장된 응답을 그대로 반환 (core/idempotency.py)
+idempotency = IdempotencyStore(config.JOB_QUEUE_DB, max_keys=config.IDEMPOTENCY_MAX_KEYS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    시작: 이전 실행에서 처리하지 못한 작업 재개 + 오래된 작업 기록 정리
+    종료: 대기 중인 변경 작업을 마치고 write-behind 큐에 남은 CSV 저장 기록
+    """
+    if config.API_WORKERS == 1:
+        # 작업자가 여럿이면 다른 작업자가 처리 중인 running 작업까지 되돌리게 되므로
+        # uvicorn 시작 전에 start.sh 가 한 번만 recover (queued 작업은 claim 이 원자적이라 여러 작업자가 나눠 처리)
+        await asyncio.to_thread(jobs.recover)
+    for job_id in await asyncio.to_thread(jobs.queued_ids):
+        _schedule_job(job_id)
+    await asyncio.to_thread(jobs.prune, config.JOB_RETENTION_DAYS)
+    try:
+        yield
+    finally:
+        await writer.stop()
+        flush_pending_writes()
+
+
 # ── 앱 초기화 ─────────────────────────────────────────────────
 app = FastAPI(
     title="Everest Inventory API",
     description="Everest POS ↔ 재고관리 앱 연동 REST API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -71,6 +133,54 @@ def verify_api_key(x_api_key: Optional[str]) -> None:
         raise HTTPException(status_code=401, detail="인증 실패: 유효하지 않은 API Key")
 
 
+# ── 레시피 응답 캐시 (ETag / 304) ─────────────────────────────
+# 레시피·단가 원본 파일 내용 해시(get_recipe_version)가 같으면 같은 응답
+# → 같은 프로세스의 반복 조회는 get_menu_cost_breakdown 없이 캐시에서,
+#   If-None-Match 가 ETag 와 같으면 본문 없이 304
+RESPONSE_CACHE_MAX = 4096
+_response_cache: "OrderedDict[tuple, tuple]" = OrderedDict()   # key → (etag, body)
+_response_cache_version = ""
+_response_cache_lock = threading.Lock()
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def cached_recipe_response(key: tuple, if_none_match: Optional[str], build) -> Response:
+    """
+    build() 결과(dict)를 레시피 버전별로 캐시해 ETag 와 함께 반환.
+    build() 가 HTTPException 을 던지면 캐시하지 않음 (없는 메뉴 등).
+    """
+    global _response_cache_version
+    version = get_recipe_version()
+    with _response_cache_lock:
+        if version != _response_cache_version:   # 원본이 바뀌면 전부 무효
+            _response_cache.clear()
+            _response_cache_version = version
+        hit = _response_cache.get(key)
+        if hit is not None:
+            _response_cache.move_to_end(key)
+    if hit is None:
+        body = build()
+        digest = hashlib.sha1(f"{version}|{key!r}".encode("utf-8")).hexdigest()[:20]
+        hit = (f'"{digest}"', body)
+        with _response_cache_lock:
+            if version == _response_cache_version:
+                _response_cache[key] = hit
+                while len(_response_cache) > RESPONSE_CACHE_MAX:
+                    _response_cache.popitem(last=False)
+
+    etag, body = hit
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}   # 매번 재검증 (변경 즉시 반영)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+
 # ── 요청/응답 모델 ────────────────────────────────────────────
 
 class DeductItem(BaseModel):
@@ -83,6 +193,25 @@ class DeductRequest(BaseModel):
     branch_id: int          # POS branches.id
     items: List[DeductItem] # 판매된 메뉴 목록
     source: Optional[str] = "pos"
+    request_id: Optional[str] = None   # 재시도 시 같은 값 (Idempotency-Key 헤더 대신 사용 가능)
+
+
+class PriceScenario(BaseModel):
+    name: Optional[str] = None
+    prices: Dict[str, float] = {}   # 원가DB 재료명 → 새 g당 단가
+    pct: Dict[str, float] = {}      # 원가DB 재료명 → 변동률 (%)
+
+
+class PriceVersion(BaseModel):
+    item: str                              # 원가DB 재료명 또는 프렙명
+    price_per_g: float
+    effective_date: Optional[str] = None   # YYYY-MM-DD (없으면 오늘)
+
+
+class SimulateRequest(BaseModel):
+    scenarios: List[PriceScenario]
+    sale_prices: Optional[Dict[str, float]] = None   # 메뉴 → 1인분 판매가 (없으면 sales_log 평균)
+    servings: int = 1
 
 
 # ─────────────────────────────────────────────────────────────
@@ -97,6 +226,7 @@ def health_check():
         "service":      "Everest Inventory API",
         "version":      "1.0.0",
         "storage_mode": config.STORAGE_MODE,
+        "storage_backend": config.STORAGE_BACKEND,
         "base_dir":     config.BASE_DIR,
     }
 
@@ -109,13 +239,19 @@ def health_check():
 def get_recipe_ingredients(
     menuId: str = Query(..., description="POS 메뉴명 (name_ko)"),
     x_api_key: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     POS가 결제 완료 후 식재료 목록을 조회하는 API.
     core/logic.py의 get_menu_cost_breakdown() 사용.
+    레시피·단가 파일이 바뀌기 전까지는 캐시된 응답 (ETag / If-None-Match → 304).
     """
     verify_api_key(x_api_key)
+    return cached_recipe_response(("ingredients", menuId), if_none_match,
+                                  lambda: _recipe_ingredients_body(menuId))
+
 
+def _recipe_ingredients_body(menuId: str) -> dict:
     items, result = get_menu_cost_breakdown(menuId, servings=1)
     if items is None:
         raise HTTPException(
@@ -148,13 +284,23 @@ def get_recipe_ingredients(
 # POST /api/inventory/out
 # ─────────────────────────────────────────────────────────────
 @app.post("/api/inventory/out", tags=["inventory"])
-def deduct_inventory(
+async def deduct_inventory(
     request: DeductRequest,
+    mode: Optional[str] = Query(None, description="sync / async (생략 시 INVENTORY_OUT_MODE 설정)"),
     x_api_key: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
 ):
     """
     POS 결제 완료 후 판매된 메뉴 목록으로 재고를 자동 차감.
-    core/logic.py의 deduct_by_menu() 사용.
+    core/logic.py의 deduct_by_menus() 사용 - 요청 전체를 재료별로 합산해
+    재고 읽기/저장·입출고 기록·판매 로그 추가를 각각 한 번만 수행.
+    동시에 들어온 차감 요청은 단일 작성자(writer)가 하나씩 처리 (차감 유실 방지).
+
+    mode=async: 요청을 작업 큐에 기록한 뒤 바로 202 + job_id 응답,
+                결과(차감 내역·재고 부족 알림)는 GET /api/inventory/jobs/{job_id}
+
+    Idempotency-Key 헤더 (또는 request_id): 같은 키로 재시도하면 다시 차감하지 않고 처음 응답을 반환
+      (Idempotent-Replayed: true). 처음 요청이 아직 처리 중이면 409, 키는 같은데 내용이 다르면 422.
 
     요청 예시:
     {
@@ -163,36 +309,99 @@ def deduct_inventory(
             { "item_id": "치킨마살라", "qty": 2 },
             { "item_id": "갈릭난",     "qty": 3 }
         ],
-        "source": "pos"
+        "source": "pos",
+        "request_id": "pos-20261017-000123"
     }
     """
     verify_api_key(x_api_key)
 
-    branch_name = get_branch_name(request.branch_id)
-    all_alerts: List[str] = []
-    deducted = 0
-    errors:   List[str] = []
+    key = idempotency_key or request.request_id
+    if key:
+        key = f"inventory/out:{key}"
+        fingerprint = hashlib.sha256(
+            request.model_dump_json(exclude={"request_id"}).encode("utf-8")).hexdigest()
+        existing = await asyncio.to_thread(idempotency.reserve, key, fingerprint)
+        if existing is not None:
+            if existing["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422,
+                                    detail="같은 Idempotency-Key 로 내용이 다른 요청이 들어왔습니다")
+            if existing["status_code"] is None:
+                raise HTTPException(status_code=409, detail="같은 키의 요청을 처리 중입니다",
+                                    headers={"Retry-After": "1"})
+            return JSONResponse(status_code=existing["status_code"], content=existing["response"],
+                                headers={"Idempotent-Replayed": "true"})
+
+    # 예약한 키는 여기서 풀지 않음: 연결이 끊겨(취소) 응답을 못 받아도 작성자가 차감을 실행하고
+    # 그 결과를 같은 작업 안에서 키에 저장 (작업이 끝내 실행되지 않으면 stale_after 후 재예약 가능)
+    status_code, body = await _process_deduct(request, get_branch_name(request.branch_id), mode, key)
+    return JSONResponse(status_code=status_code, content=body)
+
+
+async def _process_deduct(request: DeductRequest, branch_name: str, mode: Optional[str],
+                          key: Optional[str]) -> tuple:
+    """Returns: (상태 코드, 응답 본문) - 멱등성 키 저장은 실제 처리하는 스레드 작업 안에서"""
+    sales = [(item.item_id, item.qty, 0) for item in request.items]   # 판매가는 POS DB에서 관리
+
+    if (mode or config.INVENTORY_OUT_MODE) == "async":
+        job_id, body = await asyncio.to_thread(_enqueue_deduct, {
+            "branch_id": request.branch_id,
+            "branch":    branch_name,
+            "sales":     sales,
+            "source":    request.source,
+        }, key)
+        _schedule_job(job_id)
+        return 202, body
+
+    return await writer.submit(_deduct_and_record, sales, branch_name, key)
+
+
+def _enqueue_deduct(payload: dict, key: Optional[str]) -> tuple:
+    """작업 등록 + 202 응답을 키에 저장 (요청이 취소돼도 스레드에서 끝까지 실행)"""
+    job_id = jobs.enqueue("deduct", payload)
+    body = {
+        "job_id":     job_id,
+        "status":     "queued",
+        "status_url": f"/api/inventory/jobs/{job_id}",
+    }
+    if key:
+        idempotency.save(key, 202, body)
+    return job_id, body
 
-    for item in request.items:
-        try:
-            success, message, alerts = deduct_by_menu(
-                menu_name=item.item_id,
-                servings=item.qty,
-                branch=branch_name,
-                sale_price=0,      # 판매가는 POS DB에서 관리
-            )
-            if success:
-                deducted += 1
-                all_alerts.extend(alerts)
-            else:
-                errors.append(f"{item.item_id}: {message}")
-        except Exception as e:
-            errors.append(f"{item.item_id}: {str(e)}")
 
+def _deduct_and_record(sales: list, branch_name: str, key: Optional[str]) -> tuple:
+    """
+    작성자 안에서 차감 + 결과를 멱등성 키에 저장.
+    요청 측 future 가 취소돼도 작성자는 작업을 실행하므로 키 기록도 여기서 해야 재시도가 다시 차감하지 않음.
+    키는 sales_log 의 Ref 로도 남김 → 차감 후 응답 저장 전에 중단돼 예약이 만료된 뒤 재시도해도 다시 차감하지 않음.
+    기록 단계 실패(DeductWriteError)는 일부 반영됐을 수 있으므로 500 을 키에 저장 (같은 키 재시도는 실패 응답 반환),
+    그 전의 실패(원가 모델 로드, 잠금 등)는 반영된 것이 없으므로 예약을 풀어 같은 키로 다시 시도할 수 있게 함
+    """
+    try:
+        with data_mutation():   # 반영 여부 확인 → 차감 사이에 다른 프로세스가 끼어들지 않게
+            if key and applied_sale_refs([key]):
+                status_code = 200
+                body = _deduct_result(branch_name, [s[0] for s in sales], [], [])
+                body["recovered"] = True
+            else:
+                processed, errors, alerts = deduct_by_menus(sales, branch=branch_name, ref=key)
+                status_code, body = 200, _deduct_result(branch_name, processed, errors, alerts)
+    except DeductWriteError as e:
+        status_code, body = 500, _deduct_result(branch_name, [], [str(e)], [])
+    except Exception as e:
+        if key:
+            idempotency.release(key)
+        return 500, _deduct_result(branch_name, [], [str(e)], [])
+    if key:
+        idempotency.save(key, status_code, body)
+    return status_code, body
+
+
+def _deduct_result(branch_name: str, processed: list, errors: list, alerts: list) -> dict:
+    deducted = len(processed)
     return {
         "success":  len(errors) == 0,
         "deducted": deducted,
-        "alerts":   all_alerts,        # 재고 부족 품목 목록
+        "alerts":   alerts,            # 재고 부족 품목 목록
         "errors":   errors,
         "message":  (
             f"재고 차감 완료 | 지점: {branch_name} | {deducted}개 메뉴 처리"
@@ -202,6 +411,52 @@ def deduct_inventory(
     }
 
 
+def _run_deduct_job(job_id: str) -> None:
+    """작업 큐의 차감 1건 처리 (단일 작성자 안에서 실행)"""
+    job = jobs.claim(job_id)
+    if job is None:        # 이미 처리됨
+        return
+    payload = job["payload"]
+    try:
+        with data_mutation():   # 반영 여부 확인 → 차감 사이에 다른 프로세스가 끼어들지 않게
+            if applied_sale_refs([job_id]):
+                # 차감은 반영됐지만 complete 전에 중단돼 recover 로 되돌아온 작업 → 다시 차감하지 않음
+                result = _deduct_result(payload["branch"], [s[0] for s in payload["sales"]], [], [])
+                result["recovered"] = True
+                jobs.complete(job_id, result)
+                return
+            processed, errors, alerts = deduct_by_menus([tuple(s) for s in payload["sales"]],
+                                                        branch=payload["branch"], ref=job_id)
+    except Exception as e:
+        jobs.fail(job_id, str(e))
+        return
+    jobs.complete(job_id, _deduct_result(payload["branch"], processed, errors, alerts))
+
+
+def _schedule_job(job_id: str) -> None:
+    task = asyncio.get_running_loop().create_task(writer.submit(_run_deduct_job, job_id))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+
+@app.get("/api/inventory/jobs/{job_id}", tags=["inventory"])
+def get_deduct_job(job_id: str, x_api_key: Optional[str] = Header(None)):
+    """비동기 차감 작업 상태 (queued / running / done / failed) 와 결과"""
+    verify_api_key(x_api_key)
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"작업 '{job_id}'을(를) 찾을 수 없습니다")
+    return {
+        "job_id":     job["id"],
+        "status":     job["status"],
+        "branch":     job["payload"].get("branch"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "result":     job["result"],     # done: deduct 응답과 같은 형식 (alerts 포함)
+        "error":      job["error"],
+    }
+
+
 # ─────────────────────────────────────────────────────────────
 # 엔드포인트 4: 재고 부족 알림 조회
 # GET /api/inventory/alerts?branch_id=1
@@ -227,11 +482,391 @@ def get_inventory_alerts(
 # GET /api/menus
 # ─────────────────────────────────────────────────────────────
 @app.get("/api/menus", tags=["recipe"])
-def list_menus(x_api_key: Optional[str] = Header(None)):
-    """레시피북에 등록된 메뉴 전체 목록"""
+def list_menus(
+    x_api_key: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """레시피북에 등록된 메뉴 전체 목록 (ETag 캐시)"""
+    verify_api_key(x_api_key)
+
+    def build():
+        menus = get_available_menus()
+        return {"count": len(menus), "menus": menus}
+    return cached_recipe_response(("menus",), if_none_match, build)
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 6: 특정 날짜 기준 재고 (이벤트 소싱 모드)
+# GET /api/inventory/as-of?date=2026-10-01&branch_id=1
+# ─────────────────────────────────────────────────────────────
+@app.get("/api/inventory/as-of", tags=["inventory"])
+def get_inventory_as_of(
+    date: str = Query(..., description="기준 날짜 (YYYY-MM-DD)"),
+    branch_id: Optional[int] = Query(None, description="POS branch_id (생략 시 전체 지점)"),
+    x_api_key: Optional[str] = Header(None),
+):
+    """입출고 로그를 date 까지 접은 재고 (체크포인트 + 이후 이벤트 재생)"""
     verify_api_key(x_api_key)
-    menus = get_available_menus()
-    return {"count": len(menus), "menus": menus}
+    branch_name = get_branch_name(branch_id) if branch_id is not None else None
+    try:
+        df = load_inventory_as_of(date, branch=branch_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "date":   date,
+        "branch": branch_name,
+        "count":  len(df),
+        "items":  df[["Branch", "Category", "Item", "Unit", "CurrentQty"]].to_dict("records"),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 7: 전체 메뉴 원가표
+# GET /api/menus/costs?servings=1
+# ─────────────────────────────────────────────────────────────
+@app.get("/api/menus/costs", tags=["recipe"])
+def list_menu_costs(
+    servings: int = Query(1, ge=1, description="인분 수"),
+    x_api_key: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """레시피북 전체 메뉴의 원가 (컴파일된 원가 모델에서 한 번에 계산, ETag 캐시)"""
+    verify_api_key(x_api_key)
+
+    def build():
+        df = get_all_menu_costs(servings)
+        return {
+            "servings": servings,
+            "count":    len(df),
+            "menus":    df.to_dict("records"),
+        }
+    return cached_recipe_response(("menu_costs", servings), if_none_match, build)
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 8: 식재료 단가 변동 시뮬레이션
+# POST /api/menus/simulate
+# ─────────────────────────────────────────────────────────────
+@app.post("/api/menus/simulate", tags=["recipe"])
+def simulate_prices(
+    request: SimulateRequest,
+    x_api_key: Optional[str] = Header(None),
+):
+    """
+    단가 변동 시나리오(여러 개 가능)별 전 메뉴 원가·마진.
+
+    요청 예시:
+    {
+        "scenarios": [
+            { "name": "버터 +15%", "pct": { "ASEEL PURE GHEE": 15 } },
+            { "name": "쌀 단가",   "prices": { "MEHRAN BASMATI RICE": 4.2 } }
+        ],
+        "sale_prices": { "갈릭 난": 3000 }
+    }
+    """
+    verify_api_key(x_api_key)
+    if request.servings < 1:
+        raise HTTPException(status_code=400, detail="servings 는 1 이상이어야 합니다")
+    df, unknown = simulate_menu_prices(
+        [sc.model_dump() for sc in request.scenarios],
+        sale_prices=request.sale_prices,
+        servings=request.servings,
+    )
+    df = df.astype(object).where(df.notna(), None)   # NaN → null
+    return {
+        "servings":      request.servings,
+        "unknown_items": unknown,
+        "scenarios": [
+            {"name": name, "menus": part.drop(columns="scenario").to_dict("records")}
+            for name, part in df.groupby("scenario", sort=False)
+        ],
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 9: 재료 → 사용 메뉴 + 예상 하루 사용량
+# GET /api/ingredients/usage?item=꽃소금&window_days=28
+# ─────────────────────────────────────────────────────────────
+@app.get("/api/ingredients/usage", tags=["recipe"])
+def ingredient_usage(
+    item: str = Query(..., description="원가DB 재료명 또는 프렙명"),
+    window_days: int = Query(28, ge=1, le=365, description="판매 속도 계산 기간 (일)"),
+    x_api_key: Optional[str] = Header(None),
+):
+    """재료를 쓰는 메뉴별 1인분 g + 최근 판매 속도 기준 지점별 하루 예상 사용량"""
+    verify_api_key(x_api_key)
+    menus = get_ingredient_menus(item)
+    if menus.empty:
+        raise HTTPException(status_code=404, detail=f"'{item}' 을(를) 사용하는 메뉴가 없습니다")
+    daily = get_ingredient_consumption(item, window_days)
+    return {
+        "item":  item,
+        "count": len(menus),
+        "menus": menus.to_dict("records"),
+        "daily_consumption": {
+            "window_days":   window_days,
+            "branches":      daily.to_dict("records"),
+            "grams_per_day": round(float(daily["grams_per_day"].sum()), 1),
+        },
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 10: 단가 이력 추가 / 과거 판매 원가 재계산
+# POST /api/prices/versions
+# GET  /api/sales/recost?start=2026-10-01&end=2026-10-31&branch_id=1
+# ─────────────────────────────────────────────────────────────
+@app.post("/api/prices/versions", tags=["recipe"])
+async def create_price_version(
+    request: PriceVersion,
+    x_api_key: Optional[str] = Header(None),
+):
+    """재료 단가를 effective_date 부터 적용하는 이력 추가"""
+    verify_api_key(x_api_key)
+    if request.price_per_g < 0:
+        raise HTTPException(status_code=400, detail="price_per_g 는 0 이상이어야 합니다")
+    await writer.submit(add_price_version, request.item, request.price_per_g, request.effective_date)
+    return {"success": True, "item": request.item, "effective_date": request.effective_date}
+
+
+@app.get("/api/sales/recost", tags=["sales"])
+def recost_sales_range(
+    start: Optional[str] = Query(None, description="시작일 (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="종료일 (YYYY-MM-DD)"),
+    branch_id: Optional[int] = Query(None, description="POS branch_id (생략 시 전체 지점)"),
+    x_api_key: Optional[str] = Header(None),
+):
+    """기간 내 판매를 판매일 당시 단가(단가 이력)로 원가 재계산"""
+    verify_api_key(x_api_key)
+    branch_name = get_branch_name(branch_id) if branch_id is not None else None
+    df = recost_sales(start, end, branch_name)
+    if df.empty:
+        return {"count": 0, "food_cost": 0, "recost_food_cost": 0, "sales": []}
+    food_cost = round(float(pd.to_numeric(df["FoodCost"], errors="coerce").sum()), 1)
+    recost    = round(float(df["RecostFoodCost"].sum()), 1)
+    df = df.astype(object).where(df.notna(), None)   # NaN → null
+    return {
+        "count":            len(df),
+        "food_cost":        food_cost,
+        "recost_food_cost": recost,
+        "sales":            df.to_dict("records"),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 11: 식재료 수요 예측
+# GET /api/forecast/ingredients?days=7&branch_id=1
+# ─────────────────────────────────────────────────────────────
+@app.get("/api/forecast/ingredients", tags=["inventory"])
+def forecast_ingredients(
+    days: int = Query(7, ge=1, le=60, description="예측 기간 (일, 내일부터)"),
+    branch_id: Optional[int] = Query(None, description="POS branch_id (생략 시 전체 지점)"),
+    history_days: int = Query(56, ge=7, le=365, description="학습에 쓸 최근 판매 기간 (일)"),
+    x_api_key: Optional[str] = Header(None),
+):
+    """판매 로그 지수평활 예측 × 레시피 g 행렬 → 지점별 원재료 예상 사용량 (g)"""
+    verify_api_key(x_api_key)
+    branch_name = get_branch_name(branch_id) if branch_id is not None else None
+    df = forecast_ingredient_demand(days, branch=branch_name, history_days=history_days)
+    df = df.astype(object).where(df.notna(), None)   # NaN → null
+    return {
+        "days":   days,
+        "branch": branch_name,
+        "count":  len(df),
+        "items":  df.to_dict("records"),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# 엔드포인트 12: 판매 일괄 수신 (NDJSON 스트리밍)  ← 장애 복구·마감 정산
+# POST /api/inventory/ingest   (Content-Type: application/x-ndjson)
+# ─────────────────────────────────────────────────────────────
+@app.post("/api/inventory/ingest", tags=["inventory"])
+async def ingest_sales(
+    request: Request,
+    batch_size: int = Query(config.INGEST_BATCH_SIZE, ge=1, le=10000, description="배치당 최대 건수"),
+    batch_ms: int = Query(config.INGEST_BATCH_MS, ge=10, le=60000, description="배치 최대 대기 시간 (ms)"),
+    x_api_key: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    """
+    한 줄에 판매 1건인 NDJSON 을 받는 대로 읽어, batch_size 건 또는 batch_ms 마다
+    deduct_by_menus() 한 번으로 차감 (지점이 섞여 있어도 재고 읽기/저장 1회).
+    배치마다 결과를 한 줄씩 NDJSON 으로 바로 응답, 마지막 줄은 {"done": true, ...}.
+
+    date (YYYY-MM-DD, 생략 시 오늘): 판매일 - 입출고 기록·sales_log 날짜 (미래 날짜는 invalid)
+    재전송 중복 방지 (이미 반영된 건은 차감하지 않고 skipped 에 줄 번호로 표시):
+      - 줄마다 id: 판매 건 고유 값 (POS 영수증 번호 등)
+      - Idempotency-Key 헤더: id 없는 줄은 (키, 줄 번호) 로 식별 - 끊긴 스트림을 같은 키로 처음부터 다시 보내면 남은 줄만 반영
+
+    요청 줄 예시:
+        {"branch_id": 1, "item_id": "갈릭 난", "qty": 2}
+        {"branch_id": 4, "item_id": "버터 치킨", "qty": 1, "sale_price": 16000, "date": "2026-10-16", "id": "R-000123"}
+    응답 줄 예시:
+        {"batch": 1, "records": 500, "deducted": 497, "skipped": [12], "failed": [], "invalid": [], "errors": [...], "alerts": [...], "elapsed_ms": 85}
+    저장 실패 시 그 배치의 줄 번호를 failed 로 보고하고 마지막 줄 {"done": false, "error": ...} 로 스트림 종료
+    """
+    verify_api_key(x_api_key)
+    body_done = asyncio.get_running_loop().create_future()
+    return _DuplexStreamingResponse(
+        _ingest_stream(request, batch_size, batch_ms / 1000, idempotency_key, body_done),
+        body_done, media_type="application/x-ndjson")
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    요청 본문을 읽으면서 응답을 보내는 스트리밍 응답.
+    기본 StreamingResponse 는 (ASGI 2.4 미만 서버에서) listen_for_disconnect 가 receive() 를 읽어
+    아직 읽지 않은 요청 본문을 가로챔 → 본문을 다 읽을 때까지는 생성기(_ingest_stream)가 receive 를 맡아 종료도 감지,
+    그 뒤로는 기본 감지. __call__ (OSError → ClientDisconnect, 백그라운드 작업 등)은 기본 동작 그대로.
+    body_done: 본문 읽기가 끝나면 결과가 정해지는 future (True = 읽는 중 연결 종료)
+    """
+
+    def __init__(self, content, body_done: asyncio.Future, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_done = body_done
+
+    async def listen_for_disconnect(self, receive) -> None:
+        if await asyncio.shield(self.body_done):
+            return
+        await super().listen_for_disconnect(receive)
+
+
+def _parse_sale_line(line: bytes, line_no: int, stream_key: Optional[str]) -> tuple:
+    """NDJSON 1줄 → deduct_by_menus 판매 튜플 (menu, servings, sale_price, branch, sale_date, ref)"""
+    rec = json.loads(line)
+    qty = int(rec["qty"])
+    if qty < 1:
+        raise ValueError("qty 는 1 이상이어야 합니다")
+    sale_date = None
+    if rec.get("date"):
+        sale_date = datetime.strptime(str(rec["date"]), "%Y-%m-%d").date()
+        if sale_date > datetime.now().date():
+            raise ValueError(f"date 가 미래입니다: {sale_date}")
+        sale_date = str(sale_date)
+    if rec.get("id") not in (None, ""):
+        ref = f"ingest:{rec['id']}"
+    else:
+        ref = f"ingest:{stream_key}:{line_no}" if stream_key else None
+    return (str(rec["item_id"]), qty, float(rec.get("sale_price") or 0),
+            get_branch_name(int(rec["branch_id"])), sale_date, ref)
+
+
+def _ingest_batch(batch: list) -> tuple:
+    """
+    작성자 안에서 배치 1개 차감. batch: [(줄 번호, 판매 튜플)]
+    이미 반영된 ref (재전송) 와 배치 안에서 겹친 ref 는 건너뜀 - 확인과 차감을 같은 잠금 안에서
+    Returns: (processed, errors, alerts, skipped 줄 번호)
+    """
+    with data_mutation():
+        applied = applied_sale_refs(sale[5] for _, sale in batch)
+        sales, skipped = [], []
+        for line_no, sale in batch:
+            if sale[5] and sale[5] in applied:
+                skipped.append(line_no)
+                continue
+            if sale[5]:
+                applied.add(sale[5])
+            sales.append(sale)
+        if not sales:
+            return [], [], [], skipped
+        processed, errors, alerts = deduct_by_menus(sales, branch=sales[0][3])
+    return processed, errors, alerts, skipped
+
+
+async def _ingest_stream(request: Request, batch_size: int, batch_wait: float,
+                         stream_key: Optional[str], body_done: asyncio.Future):
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=64)
+
+    async def read_body():
+        disconnected = False
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    await chunks.put(chunk)
+        except ClientDisconnect:
+            disconnected = True
+        finally:
+            if not body_done.done():
+                body_done.set_result(disconnected)
+            await chunks.put(None)   # 본문 끝
+
+    reader = asyncio.create_task(read_body())
+    buffer, line_no, batch_no, total, deducted_total = b"", 0, 0, 0, 0
+    sales, invalid = [], []
+    deadline, failure = None, None
+
+    async def commit():
+        nonlocal sales, invalid, batch_no, total, deducted_total, deadline, failure
+        started = time.perf_counter()
+        batch, bad = sales, invalid
+        sales, invalid, deadline = [], [], None
+        batch_no += 1
+        total += len(batch) + len(bad)
+        processed, errors, alerts, skipped, failed = [], [], [], [], []
+        if batch:
+            try:
+                processed, errors, alerts, skipped = await writer.submit(_ingest_batch, batch)
+            except Exception as e:
+                # 저장 실패 (sales_log 의 ref 가 남지 않았을 수 있음) → 배치 전체를 실패로 보고하고 스트림 중단
+                failed, errors, failure = [n for n, _ in batch], [str(e)], str(e)
+        deducted_total += len(processed)
+        return json.dumps({
+            "batch":      batch_no,
+            "records":    len(batch) + len(bad),
+            "deducted":   len(processed),
+            "skipped":    skipped,
+            "failed":     failed,
+            "invalid":    bad,
+            "errors":     errors,
+            "alerts":     alerts,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }, ensure_ascii=False) + "\n"
+
+    def summary():
+        # done=false: 실패한 배치 이후 줄은 처리하지 않음 - 같은 id / 키로 다시 보내면 반영 안 된 건만 차감
+        return json.dumps({"done": failure is None, "records": total, "batches": batch_no,
+                           "deducted": deducted_total, "error": failure}, ensure_ascii=False) + "\n"
+
+    try:
+        finished = False
+        while not finished:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                chunk = await asyncio.wait_for(chunks.get(), timeout)
+            except asyncio.TimeoutError:
+                yield await commit()          # batch_ms 경과
+                if failure:
+                    yield summary()
+                    return
+                continue
+            if chunk is None:
+                if body_done.result():
+                    return                    # 연결 종료 - 받다 만 배치는 버림 (재전송 시 id / 키로 이어서 반영)
+                finished, lines = True, [buffer] if buffer.strip() else []
+                buffer = b""
+            else:
+                *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                line_no += 1
+                if not line.strip():
+                    continue
+                try:
+                    sales.append((line_no, _parse_sale_line(line, line_no, stream_key)))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    invalid.append({"line": line_no, "error": str(e)})
+                if deadline is None:
+                    deadline = time.monotonic() + batch_wait
+                if len(sales) + len(invalid) >= batch_size:
+                    yield await commit()
+                    if failure:
+                        yield summary()
+                        return
+        if sales or invalid:
+            yield await commit()
+        yield summary()
+    finally:
+        reader.cancel()
 
 
 # ─────────────────────────────────────────────────────────────
@@ -11,6 +11,10 @@ from config import (
     BASE_DIR,
     STORAGE_MODE,
     STORAGE_MESSAGE,
+    STORAGE_BACKEND,
+    TYPED_FRAMES,
+    INVENTORY_EVENT_SOURCED,
+    HISTORY_TAIL_ROWS,
     DATA_FILE,
     HISTORY_FILE,
     ORDERS_FILE,
@@ -419,30 +423,8 @@ html, body, [class*="css"] {
 </style>
 """, unsafe_allow_html=True)
 
-def robust_read_csv(file_path, **kwargs):
-    """
-    다양한 인코딩 및 형식을 지원하는 강건한 CSV 읽기 함수.
-    """
-    if not os.path.exists(file_path):
-        return pd.DataFrame()
-        
-    encodings = ['utf-8-sig', 'utf-16', 'cp949', 'latin-1']
-    for enc in encodings:
-        try:
-            # sep=None, engine='python'은 구분자 자동 감지를 위해 사용
-            df = pd.read_csv(file_path, sep=None, engine='python', encoding=enc, **kwargs)
-            return df
-        except (UnicodeDecodeError, UnicodeError):
-            continue
-        except Exception:
-            # 인코딩 외의 에러(예: 빈 파일)일 경우 다음으로 넘어가거나 빈 DF 반환
-            continue
-            
-    # 모든 인코딩 실패 시 최후의 방법 (바이트 무시)
-    try:
-        return pd.read_csv(file_path, sep=None, engine='python', encoding='utf-8', errors='ignore', **kwargs)
-    except:
-        return pd.DataFrame()
+# 인코딩/구분자 감지 결과를 캐시하는 공용 CSV 읽기 함수 (core/logic.py)
+from core.logic import robust_read_csv
 
 def load_item_db(file_path):
     """
@@ -523,58 +505,100 @@ def get_unit_for_item(file_path, category, item):
     return ""
 
 # ================= Data Load / Save ==================
+# 실제 저장 방식(CSV / SQLite)은 core/logic.py 가 config.STORAGE_BACKEND 에 따라 처리
+from core import logic as core_logic
+from core.inventory_store import InventoryStore
+
 @st.cache_data(ttl=60)  # Cache for 60 seconds
-def load_inventory():
-    df = robust_read_csv(DATA_FILE)
-    expected = ["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
-    if df.empty:
-        return pd.DataFrame(columns=expected)
-    
-    # 필요한 컬럼 보장
-    for col in expected:
-        if col not in df.columns:
-            df[col] = ""
-    return df[expected]
-
-def save_inventory(df):
-    df.to_csv(DATA_FILE, index=False, encoding="utf-8-sig")
+def load_inventory(branch=None, typed=False):
+    # branch 지정 시 해당 지점만 (지점별 샤드 모드에서는 그 지점 파일만 읽음)
+    return core_logic.load_inventory(branch, typed=typed)
+
+def save_inventory(df, branches=None, keys=None):
+    core_logic.save_inventory(df, branches=branches, keys=keys)
     # Clear cache after saving
     load_inventory.clear()
+    load_low_stock.clear()
+
+@st.cache_data(ttl=60)
+def load_low_stock():
+    # 전 지점 최소 수량 미달 행 (샤드는 하나씩 읽어 미달 행만 모음)
+    return core_logic.scan_low_stock()
+
+def get_inv_store(branch, fresh=False):
+    """
+    지점 작업용 (Branch, Category, Item) 해시 인덱스 재고 - flush() 시 save_inventory
+    fresh=True: 캐시 없이 파일에서 (core_logic.data_mutation() 안에서 수정·저장할 때)
+    """
+    # 샤드 모드: 그 지점 파일만 / 그 외: 전체 (저장 시 파일 전체를 쓰므로)
+    scope = branch if core_logic.branch_sharded() else None
+    df = core_logic.load_inventory(scope) if fresh else load_inventory(scope)
+    return InventoryStore(df, saver=save_inventory)
 
 @st.cache_data(ttl=60)  # Cache for 60 seconds
-def load_history():
-    df = robust_read_csv(HISTORY_FILE)
-    expected = ["Date","Branch","Category","Item","Unit","Type","Qty"]
-    if df.empty:
-        return pd.DataFrame(columns=expected)
-        
-    for col in expected:
-        if col not in df.columns:
-            df[col] = ""
-    return df[expected]
+def load_history(typed=False):
+    # typed=True: category / float32 / datetime64 (세션마다 보관하는 조회용 로그의 메모리 절약)
+    return core_logic.load_history(typed=typed)
+
+# Recent Stock Movements 용: 로그 끝에서 최근 n 행만 읽음 (로그 길이와 무관)
+@st.cache_data(ttl=60)
+def load_history_tail(n=HISTORY_TAIL_ROWS, typed=False):
+    return core_logic.load_history_tail(n, typed=typed)
 
 def save_history(df):
-    df.to_csv(HISTORY_FILE, index=False, encoding="utf-8-sig")
+    core_logic.save_history(df)
     # Clear cache after saving
     load_history.clear()
+    load_history_tail.clear()
+    load_history_period.clear()
+    history_periods.clear()
+
+def append_history(rows):
+    # 새 행만 로그 끝에 추가 (전체 재작성 없음)
+    core_logic.append_history(rows)
+    if INVENTORY_EVENT_SOURCED:
+        load_inventory.clear()   # 재고 수량이 로그에서 계산되므로 함께 갱신
+        load_low_stock.clear()
+    load_history.clear()
+    load_history_tail.clear()
+    load_history_period.clear()
+    history_periods.clear()
+
+# 분석 탭용: 선택한 연월 파티션만 읽음 (전체 로그를 불러와 날짜 변환하지 않음)
+@st.cache_data(ttl=60)
+def load_history_period(year, month, branch=None, category=None, columns=None):
+    return core_logic.load_history_period(year, month, branch=branch, category=category,
+                                          columns=list(columns) if columns else None)
+
+@st.cache_data(ttl=60)
+def history_periods():
+    return core_logic.history_periods()
 
 def load_orders():
-    df = robust_read_csv(ORDERS_FILE)
-    expected = ["OrderId", "Date", "Branch", "Vendor", "Items", "Status", "CreatedDate"]
-    if df.empty:
-        return pd.DataFrame(columns=expected)
-    for col in expected:
-        if col not in df.columns:
-            df[col] = ""
-    return df[expected]
-
-def save_orders(df):
-    df.to_csv(ORDERS_FILE, index=False, encoding="utf-8-sig")
+    return core_logic.load_orders()
+
+def save_orders(df, keys=None):
+    core_logic.save_orders(df, keys=keys)
+
+@st.cache_resource
+def _seen_data_version():
+    return {"version": None}
+
+def sync_data_caches():
+    """API 서버(다른 프로세스)가 데이터를 바꿨으면 (공유 데이터 버전 증가) 조회 캐시를 비움"""
+    seen = _seen_data_version()
+    version = core_logic.data_version()
+    if seen["version"] != version:
+        for cached in (load_inventory, load_low_stock, load_history, load_history_tail,
+                       load_history_period, history_periods):
+            cached.clear()
+        seen["version"] = version
 
 # ================= Session & Data Refresh ==================
 # 매 리런(Rerun) 마다 최신 데이터를 파일에서 직접 읽어오도록 하여 실시간성 확보
-st.session_state.inventory = load_inventory()
-st.session_state.history = load_history()
+# 화면에 보여 주는 로그는 최근 행만 (전체 로그는 분석 탭에서 기간별로 읽음)
+sync_data_caches()
+st.session_state.history = load_history_tail(HISTORY_TAIL_ROWS, typed=TYPED_FRAMES)
 
 # ================= Header (Compact) ==================
 col_h1, col_h2 = st.columns([0.5, 9.5])
@@ -602,19 +626,12 @@ with col_h2:
 st.markdown("---")
 
 # ================= Low Stock Alert ==================
-if not st.session_state.inventory.empty:
-    # Ensure numeric columns
-    inv_df = st.session_state.inventory.copy()
-    inv_df["CurrentQty"] = pd.to_numeric(inv_df["CurrentQty"], errors="coerce").fillna(0)
-    inv_df["MinQty"] = pd.to_numeric(inv_df["MinQty"], errors="coerce").fillna(0)
-    
-    # Check condition: CurrentQty <= MinQty AND MinQty > 0
-    low_stock = inv_df[(inv_df["CurrentQty"] <= inv_df["MinQty"]) & (inv_df["MinQty"] > 0)]
-    
-    if not low_stock.empty:
-        st.error(f"⚠️ Warning: {len(low_stock)} items are below minimum stock level!", icon="🚨")
-        with st.expander("View Low Stock Items"):
-            st.dataframe(low_stock[["Branch", "Category", "Item", "CurrentQty", "MinQty", "Unit"]], use_container_width=True)
+# Check condition: CurrentQty <= MinQty AND MinQty > 0 (core/logic.scan_low_stock)
+low_stock = load_low_stock()
+if not low_stock.empty:
+    st.error(f"⚠️ Warning: {len(low_stock)} items are below minimum stock level!", icon="🚨")
+    with st.expander("View Low Stock Items"):
+        st.dataframe(low_stock[["Branch", "Category", "Item", "CurrentQty", "MinQty", "Unit"]], use_container_width=True)
 
 # ================= Tabs ==================
 # Use CSS to hide tab text on mobile, always use full names in Python
@@ -676,9 +693,8 @@ if tab1:
             unit = st.selectbox("Unit", unit_options, index=default_index, key="unit_select")
 
         # ---- 기존 데이터 확인 로직 (위젯 렌더링 전에 실행해야 함) ----
-        df_curr = st.session_state.inventory
-        mask = (df_curr["Branch"] == branch) & (df_curr["Category"] == category) & (df_curr["Item"] == item)
-        existing_row = df_curr[mask]
+        inv_store = get_inv_store(branch)
+        existing_row = inv_store.get(branch, category, item)   # 해시 인덱스 조회 (없으면 None)
         
         is_update = False
         full_key = f"{branch}_{category}_{item}"
@@ -689,11 +705,11 @@ if tab1:
         
         # 아이템 변경 감지 -> 데이터 로드 또는 초기화
         if st.session_state.last_loaded_key != full_key:
-            if not existing_row.empty:
+            if existing_row is not None:
                 # DB 값 불러오기
-                st.session_state["qty"] = float(existing_row.iloc[0]["CurrentQty"])
-                st.session_state["min_qty"] = float(existing_row.iloc[0]["MinQty"])
-                st.session_state["note"] = str(existing_row.iloc[0]["Note"])
+                st.session_state["qty"] = float(existing_row["CurrentQty"])
+                st.session_state["min_qty"] = float(existing_row["MinQty"])
+                st.session_state["note"] = str(existing_row["Note"])
             else:
                 # 신규 -> 초기화
                 st.session_state["qty"] = 0.0
@@ -705,7 +721,7 @@ if tab1:
             # 하지만 확실한 UI 갱신을 위해 rerun 할 수도 있으나, 
             # widget key가 설정된 상태에서 값 update후 렌더링이면 반영됨.
 
-        if not existing_row.empty:
+        if existing_row is not None:
             is_update = True
 
         with col3:
@@ -720,31 +736,26 @@ if tab1:
         with b_col1:
             btn_label = "💾 Update Inventory" if is_update else "💾 Register New"
             if st.button(btn_label, key="save_btn"):
-                df = st.session_state.inventory.copy()
-                if is_update:
-                    df.loc[mask, "CurrentQty"] = qty
-                    df.loc[mask, "MinQty"] = min_qty
-                    df.loc[mask, "Note"] = note
-                    df.loc[mask, "Date"] = str(selected_date)
-                    df.loc[mask, "Unit"] = unit 
-                    st.success("Updated Successfully!")
-                else:
-                    new_row = pd.DataFrame(
-                        [[branch, item, category, unit, qty, min_qty, note, str(selected_date)]],
-                        columns=["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
-                    )
-                    df = pd.concat([df, new_row], ignore_index=True)
-                    st.success("Registered Successfully!")
-                st.session_state.inventory = df
-                save_inventory(df)
+                # 다른 프로세스(API 서버)의 차감과 겹치지 않도록 잠금 안에서 최신 재고를 다시 읽어 저장
+                with core_logic.data_mutation():
+                    if INVENTORY_EVENT_SOURCED:
+                        # 로그가 원본: 직접 입력한 수량을 SET 이벤트로 기록
+                        append_history([[str(selected_date), branch, category, item, unit, "SET", qty]])
+                    inv_store = get_inv_store(branch, fresh=True)
+                    inv_store.upsert(branch, category, item, Unit=unit, CurrentQty=qty,
+                                     MinQty=min_qty, Note=note, Date=str(selected_date))
+                    inv_store.flush()
+                st.success("Updated Successfully!" if is_update else "Registered Successfully!")
         
         with b_col2:
             if is_update:
                 if st.button("🗑 Delete Item", key="del_btn", type="primary"):
-                    df = st.session_state.inventory.copy()
-                    df = df[~mask]
-                    st.session_state.inventory = df
-                    save_inventory(df)
+                    with core_logic.data_mutation():
+                        if INVENTORY_EVENT_SOURCED:
+                            append_history([[str(selected_date), branch, category, item, unit, "DEL", 0]])
+                        inv_store = get_inv_store(branch, fresh=True)
+                        inv_store.delete(branch, category, item)
+                        inv_store.flush()
                     st.warning("Item Deleted.")
                     st.session_state.last_loaded_key = ""
                     st.rerun()
@@ -755,17 +766,16 @@ if tab1:
 with tab2:
     st.subheader("View / Print Inventory")
     
-    df = st.session_state.inventory.copy()
-    
-    # 날짜 필터
     date_filter = st.date_input("Filter by Date", key="view_date")
-    if date_filter:
-        df = df[df["Date"] == str(date_filter)]
-    
     # 지점 필터 (추가됨)
     branch_filter = st.selectbox("Branch", ["All"] + BRANCHES, key="view_branch")
-    if branch_filter != "All":
-        df = df[df["Branch"] == branch_filter]
+
+    # 지점을 고르면 그 지점만 로드 (샤드 모드에서 "All" 일 때만 전체 지점을 이어 붙임)
+    df = load_inventory(None if branch_filter == "All" else branch_filter).copy()
+
+    # 날짜 필터
+    if date_filter:
+        df = df[df["Date"] == str(date_filter)]
     
     category_filter = st.selectbox("Category", ["All"] + sorted(set(df["Category"])), key="view_cat")
     if category_filter != "All":
@@ -959,21 +969,22 @@ with tab3:
                         import uuid
                         import json
                         
-                        orders_df = load_orders()
-                        new_order = {
-                            "OrderId": str(uuid.uuid4()),
-                            "Date": str(p_date),
-                            "Branch": p_branch,
-                            "Vendor": v_name,
-                            "Items": json.dumps(data["items"], ensure_ascii=False),
-                            "Status": "Pending",
-                            "CreatedDate": str(datetime.now())
-                        }
+                        with core_logic.data_mutation():   # 읽기 → 행 추가 → 저장 사이에 다른 변경이 끼어들지 않게
+                            orders_df = load_orders()
+                            new_order = {
+                                "OrderId": str(uuid.uuid4()),
+                                "Date": str(p_date),
+                                "Branch": p_branch,
+                                "Vendor": v_name,
+                                "Items": json.dumps(data["items"], ensure_ascii=False),
+                                "Status": "Pending",
+                                "CreatedDate": str(datetime.now())
+                            }
                         
-                        # pd.concat to add row
-                        new_row_df = pd.DataFrame([new_order])
-                        orders_df = pd.concat([orders_df, new_row_df], ignore_index=True)
-                        save_orders(orders_df)
+                            # pd.concat to add row
+                            new_row_df = pd.DataFrame([new_order])
+                            orders_df = pd.concat([orders_df, new_row_df], ignore_index=True)
+                            save_orders(orders_df, keys=[new_order["OrderId"]])
                         
                         st.toast(f"✅ Order Saved! Opening SMS...", icon="📨")
                         
@@ -1054,47 +1065,40 @@ with tab3:
                                 if st.button("📥 Confirm Receipt (입고 확정)", key=f"confirm_{oid}", type="primary", use_container_width=True):
                                     # ... existing logic ...
                                     # 1. Update Inventory & History based on EDITED df
-                                    inv_df = st.session_state.inventory.copy()
-                                    hist_df = st.session_state.history.copy()
+                                    with core_logic.data_mutation():   # 재고·발주를 잠금 안에서 최신 내용으로 다시 읽어 수정
+                                        hist_rows = []
+                                        inv_store = get_inv_store(o_branch, fresh=True)
+                                        orders_df = load_orders()
                                     
-                                    # Convert back to list of dicts to save in order history
-                                    final_items = []
+                                        # Convert back to list of dicts to save in order history
+                                        final_items = []
                                     
-                                    for _, e_row in edited_df.iterrows():
-                                        cat, i_name, qty, unit = e_row["Category"], e_row["Item"], float(e_row["Qty"]), e_row["Unit"]
+                                        for _, e_row in edited_df.iterrows():
+                                            cat, i_name, qty, unit = e_row["Category"], e_row["Item"], float(e_row["Qty"]), e_row["Unit"]
                                         
-                                        # Update final items for record
-                                        final_items.append({"cat": cat, "item": i_name, "qty": qty, "unit": unit})
+                                            # Update final items for record
+                                            final_items.append({"cat": cat, "item": i_name, "qty": qty, "unit": unit})
                                         
-                                        if qty > 0:
-                                            # History Log
-                                            hist_df.loc[len(hist_df)] = [
-                                                str(date.today()), o_branch, cat, i_name, unit, "IN", qty
-                                            ]
+                                            if qty > 0:
+                                                # History Log
+                                                hist_rows.append([
+                                                    str(date.today()), o_branch, cat, i_name, unit, "IN", qty
+                                                ])
                                             
-                                            # Inventory Update
-                                            mask = (inv_df["Branch"] == o_branch) & (inv_df["Item"] == i_name) & (inv_df["Category"] == cat)
-                                            if mask.any():
-                                                current_qty = float(inv_df.loc[mask, "CurrentQty"].values[0])
-                                                inv_df.loc[mask, "CurrentQty"] = current_qty + qty
-                                            else:
-                                                # New Item entry
-                                                new_row = pd.DataFrame(
-                                                    [[o_branch, i_name, cat, unit, qty, 0, "", str(date.today())]],
-                                                    columns=["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
+                                                # Inventory Update (없는 품목이면 New Item entry)
+                                                inv_store.apply_delta(
+                                                    o_branch, cat, i_name, qty,
+                                                    create={"Unit": unit, "MinQty": 0, "Note": "", "Date": str(date.today())}
                                                 )
-                                                inv_df = pd.concat([inv_df, new_row], ignore_index=True)
 
-                                    # 2. Update Order Status & Received Items
-                                    orders_df.loc[orders_df["OrderId"] == oid, "Items"] = json.dumps(final_items, ensure_ascii=False)
-                                    orders_df.loc[orders_df["OrderId"] == oid, "Status"] = "Completed"
+                                        # 2. Update Order Status & Received Items
+                                        orders_df.loc[orders_df["OrderId"] == oid, "Items"] = json.dumps(final_items, ensure_ascii=False)
+                                        orders_df.loc[orders_df["OrderId"] == oid, "Status"] = "Completed"
                                     
-                                    # 3. Save All
-                                    st.session_state.inventory = inv_df
-                                    st.session_state.history = hist_df
-                                    save_inventory(inv_df)
-                                    save_history(hist_df)
-                                    save_orders(orders_df)
+                                        # 3. Save All
+                                        append_history(hist_rows)   # 로그 먼저 (이벤트 소싱 모드에서는 로그가 원본)
+                                        inv_store.flush()
+                                        save_orders(orders_df, keys=[oid])
                                     
                                     # [Fix] Add to freshly_confirmed so it stays visible for photo upload
                                     st.session_state.freshly_confirmed.append(oid)
@@ -1188,17 +1192,8 @@ with tab4:
         st.write(f"Unit: **{log_unit or '-'}**")
         
         # --- 실시간 재고 확인 로직 추가 ---
-        inv_data = st.session_state.inventory
-        current_stock_row = inv_data[
-            (inv_data["Branch"] == log_branch) & 
-            (inv_data["Category"] == log_category) & 
-            (inv_data["Item"] == log_item)
-        ]
-        
-        if not current_stock_row.empty:
-            curr_qty = float(current_stock_row.iloc[0]["CurrentQty"])
-        else:
-            curr_qty = 0.0
+        inv_store = get_inv_store(log_branch)
+        curr_qty = inv_store.current_qty(log_branch, log_category, log_item)
             
         st.metric(label="Current Stock (현재 재고)", value=f"{curr_qty} {log_unit}")
         # ------------------------------
@@ -1207,39 +1202,40 @@ with tab4:
         log_qty = st.number_input("Quantity", min_value=0.0, step=1.0, key="log_qty")
 
     if st.button("📥 Record IN / OUT", key="log_btn"):
-        # 1) 히스토리 저장
-        history_df = st.session_state.history.copy()
-        history_df.loc[len(history_df)] = [
-            str(log_date), log_branch, log_category, log_item, log_unit, log_type, log_qty
-        ]
-        st.session_state.history = history_df
-        save_history(history_df)
-
-        # 2) 재고 자동 반영
-        inv = st.session_state.inventory.copy()
-        mask = (inv["Branch"] == log_branch) & (inv["Item"] == log_item) & (inv["Category"] == log_category)
-        if mask.any():
-            if log_type == "IN":
-                inv.loc[mask, "CurrentQty"] = inv.loc[mask, "CurrentQty"] + log_qty
-            else:
-                inv.loc[mask, "CurrentQty"] = inv.loc[mask, "CurrentQty"] - log_qty
-        else:
-            # 기존 재고 없는 상태에서 IN이면 새로 생성
-            if log_type == "IN":
-                new_row = pd.DataFrame(
-                    [[log_branch, log_item, log_category, log_unit, log_qty, 0, "", str(log_date)]],
-                    columns=["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
-                )
-                inv = pd.concat([inv, new_row], ignore_index=True)
-            else:
+        with core_logic.data_mutation():   # 로그 추가 + 재고 반영을 다른 프로세스의 변경과 겹치지 않게
+            # 잠금 안에서 최신 재고를 다시 읽음 (로그 추가 전 기준으로 기존 품목인지 판단)
+            inv_store = get_inv_store(log_branch, fresh=True)
+            exists = (log_branch, log_category, log_item) in inv_store
+
+            # 1) 히스토리 저장 (새 행만 추가)
+            append_history([
+                [str(log_date), log_branch, log_category, log_item, log_unit, log_type, log_qty]
+            ])
+            st.session_state.history = load_history_tail(HISTORY_TAIL_ROWS, typed=TYPED_FRAMES)
+
+            # 2) 재고 자동 반영
+            if not exists and log_type == "OUT":
                 st.warning("OUT인데 해당 재고가 없어서 수량은 반영되지 않았습니다.")
+            elif INVENTORY_EVENT_SOURCED:
+                # 수량은 방금 추가한 로그를 접은 값에 이미 반영됨 → 다시 더하지 않음
+                # 새 품목(IN)만 재고 파일에 속성 행(Unit/MinQty/Note/Date) 추가
+                if not exists:
+                    inv_store = get_inv_store(log_branch, fresh=True)
+                    inv_store.upsert(log_branch, log_category, log_item,
+                                     Unit=log_unit, MinQty=0, Note="", Date=str(log_date))
+            elif exists:
+                inv_store.apply_delta(log_branch, log_category, log_item,
+                                      log_qty if log_type == "IN" else -log_qty)
+            else:
+                # 기존 재고 없는 상태에서 IN이면 새로 생성
+                inv_store.apply_delta(log_branch, log_category, log_item, log_qty,
+                                      create={"Unit": log_unit, "MinQty": 0, "Note": "", "Date": str(log_date)})
 
-        st.session_state.inventory = inv
-        save_inventory(inv)
+            inv_store.flush()
         st.success("IN / OUT recorded and inventory updated!")
 
     st.markdown("### Recent Stock Movements")
-    st.dataframe(st.session_state.history.tail(50), use_container_width=True)
+    st.dataframe(st.session_state.history.tail(HISTORY_TAIL_ROWS), use_container_width=True)
 
 # ======================================================
 # TAB 4: Usage Analysis (All)
@@ -1248,12 +1244,10 @@ with tab5:
     st.subheader("Usage Analysis (by Branch / Category / Item)")
     
     if check_login("tab5"):
-        history_df = st.session_state.history.copy()
-        if history_df.empty:
+        periods = history_periods()
+        if not periods:
             st.info("No history data yet.")
         else:
-            history_df["DateObj"] = pd.to_datetime(history_df["Date"])
-
             a1, a2, a3 = st.columns(3)
             with a1:
                 sel_branch = st.selectbox("Branch", ["All"] + BRANCHES, key="ana_branch")
@@ -1261,18 +1255,17 @@ with tab5:
                 sel_cat = st.selectbox("Category", ["All"] + get_all_categories(INV_DB), key="ana_cat")
             with a3:
                 # 기간 선택 (월 단위)
-                year_options = sorted(set(history_df["DateObj"].dt.year))
+                year_options = sorted(set(int(p[:4]) for p in periods))
                 sel_year = st.selectbox("Year", year_options, index=len(year_options)-1, key="ana_year")
                 sel_month = st.selectbox("Month", list(range(1,13)), index=datetime.now().month-1, key="ana_month")
 
-            # 필터 적용
-            filt = (history_df["DateObj"].dt.year == sel_year) & (history_df["DateObj"].dt.month == sel_month)
-            if sel_branch != "All":
-                filt &= (history_df["Branch"] == sel_branch)
-            if sel_cat != "All":
-                filt &= (history_df["Category"] == sel_cat)
-
-            use_df = history_df[filt]
+            # 필터 적용 - 선택한 연월(+지점) 파티션의 필요한 컬럼만 읽음
+            use_df = load_history_period(
+                sel_year, sel_month,
+                branch=None if sel_branch == "All" else sel_branch,
+                category=None if sel_cat == "All" else sel_cat,
+                columns=("Branch", "Category", "Item", "Type", "Qty"),
+            )
 
             if use_df.empty:
                 st.info("선택한 조건에 해당하는 데이터가 없습니다.")
@@ -1290,6 +1283,23 @@ with tab5:
                 cat_usage = cat_usage.sort_values("Qty", ascending=False)
                 st.dataframe(cat_usage, use_container_width=True)
 
+        # 판매 로그 × 레시피 기반 수요 예측 (입출고 기록과 무관하게 표시)
+        st.markdown("#### Ingredient Demand Forecast (from Sales × Recipes)")
+        f1, f2 = st.columns(2)
+        with f1:
+            fc_branch = st.selectbox("Branch", ["All"] + BRANCHES, key="fc_branch")
+        with f2:
+            fc_days = st.number_input("Days ahead", min_value=1, max_value=60, value=7, step=1, key="fc_days")
+        fc_df = core_logic.forecast_ingredient_demand(
+            int(fc_days), branch=None if fc_branch == "All" else fc_branch
+        )
+        if fc_df.empty:
+            st.info("판매 기록(sales_log)이 없어 예측할 수 없습니다.")
+        else:
+            fc_df["Shortfall_g"] = (fc_df["forecast_g"] - pd.to_numeric(fc_df["CurrentQty"], errors="coerce")).clip(lower=0)
+            st.caption("최근 8주 판매를 요일 계절성 지수평활로 예측 · 단위 g · Shortfall = 예측 사용량 - 현재고")
+            st.dataframe(fc_df, use_container_width=True, hide_index=True)
+
 # ======================================================
 # TAB 5: Monthly Report (Manager Only)
 # ======================================================
@@ -1302,15 +1312,12 @@ if tab6:
             rep_month = st.number_input("Month", min_value=1, max_value=12, value=datetime.now().month, step=1, key="rep_month")
 
             if st.button("Generate Monthly Report", key="rep_btn"):
-                inv = st.session_state.inventory.copy()
-                hist = st.session_state.history.copy()
-
-                # 날짜 처리
-                inv["DateObj"] = pd.to_datetime(inv["Date"], errors="coerce")
-                hist["DateObj"] = pd.to_datetime(hist["Date"], errors="coerce")
+                # 날짜 처리 - typed 로드 시 Date 가 이미 datetime64
+                inv = load_inventory(typed=True)
 
-                inv_m = inv[(inv["DateObj"].dt.year == rep_year) & (inv["DateObj"].dt.month == rep_month)]
-                hist_m = hist[(hist["DateObj"].dt.year == rep_year) & (hist["DateObj"].dt.month == rep_month)]
+                inv_m = inv[(inv["Date"].dt.year == rep_year) & (inv["Date"].dt.month == rep_month)]
+                # 로그는 해당 월 파티션만 읽음
+                hist_m = load_history_period(rep_year, rep_month)
 
                 # 월간 사용량 (OUT 기준)
                 usage_m = pd.DataFrame()
@@ -1407,8 +1414,10 @@ if tab7:
                 with col_b1:
                     st.markdown("**Create Backup (백업 생성)**")
                     if st.button("📦 Create Backup Now (지금 백업)", type="primary", use_container_width=True):
-                        files_to_backup = [DATA_FILE, HISTORY_FILE, ORDERS_FILE, INV_DB, PUR_DB, VENDOR_FILE]
-                        success, msg = create_backup(BASE_DIR, files_to_backup)
+                        with core_logic.data_mutation():   # 백업 중에는 다른 프로세스가 파일을 바꾸지 않게
+                            core_logic.flush_pending_writes()         # 대기 중인 저장을 먼저 파일에 반영
+                            files_to_backup = get_all_file_paths()  # 저장 백엔드(CSV/SQLite)에 맞는 파일 목록
+                            success, msg = create_backup(BASE_DIR, files_to_backup)
                         if success:
                             st.success(msg)
                         else:
@@ -1443,7 +1452,9 @@ if tab7:
                         
                         if st.button("🔄 Restore Selected Backup", type="primary"):
                             backup_path = backup_options[selected_backup]
-                            success, msg = restore_from_backup(backup_path, BASE_DIR)
+                            with core_logic.data_mutation():   # 복원 후 버전이 올라 다른 프로세스의 캐시도 다시 읽음
+                                core_logic.flush_pending_writes()   # 대기 중인 저장이 복원본을 덮어쓰지 않도록 먼저 기록
+                                success, msg = restore_from_backup(backup_path, BASE_DIR)
                             if success:
                                 st.success(msg)
                                 st.balloons()
@@ -1487,11 +1498,17 @@ if tab7:
                 st.error("이 버튼을 누르면 모든 데이터가 영구적으로 삭제됩니다. 처음부터 다시 시작할 때만 사용하세요.")
                 if st.button("🧨 Delete All Data (모든 데이터 삭제)", key="init_btn", type="primary"):
                     try:
-                        files_to_delete = [INV_DB, PUR_DB, VENDOR_FILE, ORDERS_FILE, DATA_FILE, HISTORY_FILE]
-                        for f in files_to_delete:
-                            if os.path.exists(f):
-                                os.remove(f)
-                        st.session_state.inventory = pd.DataFrame()
+                        with core_logic.data_mutation():
+                            files_to_delete = [INV_DB, PUR_DB, VENDOR_FILE, ORDERS_FILE, DATA_FILE, HISTORY_FILE]
+                            for f in files_to_delete:
+                                if os.path.exists(f):
+                                    os.remove(f)
+                            # 입출고 로그는 월별 세그먼트·SQLite 까지 함께 비우도록 저장 함수로 초기화
+                            save_history(pd.DataFrame(columns=HISTORY_COLUMNS))
+                            # 재고·발주도 저장 함수로 비움 (SQLite 테이블, 지점 샤드, 대기 중인 write-behind 저장 포함)
+                            save_inventory(pd.DataFrame(columns=INVENTORY_COLUMNS))
+                            save_orders(pd.DataFrame(columns=ORDERS_COLUMNS))
+                            core_logic.reset_inventory_ledger()
                         st.session_state.history = pd.DataFrame()
                         st.session_state.purchase_cart = {}
                         st.success("All data deleted successfully. (모든 데이터가 삭제되었습니다)")
@@ -1765,6 +1782,12 @@ with tab9:
         from core.logic import (
             get_available_menus,
             get_menu_cost_breakdown,
+            get_all_menu_costs,
+            get_simulation_items,
+            simulate_menu_prices,
+            get_ingredient_menus,
+            get_ingredient_consumption,
+            recost_sales,
             deduct_by_menu,
             get_sales_summary,
             get_low_stock_items,
@@ -1787,6 +1810,65 @@ with tab9:
             else:
                 st.success(f"**{alert_branch}** 지점 재고 부족 없음 ✅")
 
+        # ── 전체 메뉴 원가표 ─────────────────────────────────
+        with st.expander("📊 전체 메뉴 원가표", expanded=False):
+            cost_table = get_all_menu_costs()
+            if cost_table.empty:
+                st.info("레시피북(recipe_db.csv)에 등록된 메뉴가 없습니다")
+            else:
+                missing = int((cost_table["unpriced"] > 0).sum())
+                if missing:
+                    st.warning(f"단가가 없는 재료가 포함된 메뉴 {missing}개 (원가가 실제보다 낮게 계산됨)")
+                st.dataframe(
+                    cost_table.rename(columns={"menu": "메뉴", "cost": "1인분 원가(원)",
+                                               "ingredients": "재료 수", "unpriced": "단가 없음"}),
+                    use_container_width=True, hide_index=True,
+                )
+
+        # ── 단가 변동 시뮬레이션 ─────────────────────────────
+        with st.expander("🧪 단가 변동 시뮬레이션 (공급가 인상 시 메뉴별 마진 변화)", expanded=False):
+            sim_items = get_simulation_items()
+            sim_col1, sim_col2 = st.columns([3, 1])
+            with sim_col1:
+                sim_sel = st.multiselect("단가가 바뀌는 재료", sim_items["item"].tolist(), key="sim_items")
+            with sim_col2:
+                sim_pct = st.number_input("변동률 (%)", min_value=-90.0, max_value=500.0,
+                                          value=10.0, step=5.0, key="sim_pct")
+            if sim_sel:
+                sim_df, _ = simulate_menu_prices([{"name": "sim", "pct": {i: sim_pct for i in sim_sel}}])
+                affected = sim_df[sim_df["delta"] != 0].sort_values("delta", ascending=False)
+                a1, a2 = st.columns(2)
+                a1.metric("영향받는 메뉴", f"{len(affected)}개")
+                a2.metric("최대 원가 변동", f"₩{affected['delta'].abs().max() if len(affected) else 0:,.1f}")
+                st.dataframe(
+                    affected.drop(columns="scenario").rename(columns={
+                        "menu": "메뉴", "base_cost": "현재 원가", "cost": "변동 후 원가", "delta": "차이",
+                        "sale_price": "평균 판매가", "margin": "변동 후 마진", "margin_rate": "마진율(%)",
+                    }),
+                    use_container_width=True, hide_index=True,
+                )
+                st.caption("판매가는 판매 로그의 1인분 평균 판매가 (판매가 입력 기록이 없는 메뉴는 빈칸)")
+
+        # ── 재료별 사용 메뉴 ─────────────────────────────────
+        with st.expander("🔎 재료별 사용 메뉴 · 예상 하루 사용량", expanded=False):
+            use_item = st.selectbox("재료 (원가DB 재료명 / 프렙명)", sorted(core_logic.get_cost_model().used_by),
+                                    index=None, key="usage_item")
+            if use_item:
+                u1, u2 = st.columns([1, 1])
+                with u1:
+                    st.dataframe(
+                        get_ingredient_menus(use_item).rename(columns={"menu": "메뉴", "grams_per_serving": "1인분 g"}),
+                        use_container_width=True, hide_index=True,
+                    )
+                with u2:
+                    daily = get_ingredient_consumption(use_item)
+                    if daily.empty:
+                        st.info("최근 28일 판매 기록이 없어 사용량을 추정할 수 없습니다")
+                    else:
+                        st.metric("전 지점 하루 예상 사용량", f"{daily['grams_per_day'].sum():,.0f}g")
+                        st.dataframe(daily.rename(columns={"Branch": "지점", "grams_per_day": "하루 사용량(g)"}),
+                                     use_container_width=True, hide_index=True)
+
         st.markdown("---")
 
         # ── 왼쪽: 판매 입력 / 오른쪽: 원가 미리보기 ─────────────
@@ -1915,6 +1997,23 @@ with tab9:
                 hide_index=True
             )
 
+            # 단가 이력(ingredient_price_history.csv) 기준 원가 재계산
+            if st.checkbox("📈 판매일 당시 단가로 원가 재계산", key="sales_recost"):
+                recost_df = recost_sales(
+                    start_date=str(log_start) if log_start else None,
+                    end_date=str(log_end) if log_end else None,
+                    branch=None if log_branch == "전체" else log_branch,
+                )
+                r1, r2 = st.columns(2)
+                r1.metric("재계산 식재료 원가", f"₩{recost_df['RecostFoodCost'].sum():,.0f}",
+                          delta=f"{recost_df['CostDiff'].sum():,.0f}", delta_color="inverse")
+                r2.metric("원가가 달라진 판매", f"{int((recost_df['CostDiff'] != 0).sum())}건")
+                st.dataframe(
+                    recost_df[['Date', 'Branch', 'Menu', 'Servings', 'FoodCost', 'RecostFoodCost', 'CostDiff', 'RecostMargin']]
+                    .sort_values("Date", ascending=False),
+                    use_container_width=True, hide_index=True,
+                )
+
             # CSV 다운로드
             csv_data = sales_df.to_csv(index=False, encoding="utf-8-sig").encode("utf-8-sig")
             st.download_button(
@@ -46,6 +46,9 @@ if not os.path.exists(BASE_DIR):
 DATA_FILE = os.path.join(BASE_DIR, "inventory_data.csv")          # Current inventory snapshot
 HISTORY_FILE = os.path.join(BASE_DIR, "stock_history.csv")        # IN/OUT transaction log
 ORDERS_FILE = os.path.join(BASE_DIR, "orders_db.csv")             # Purchase orders
+SALES_LOG_FILE = os.path.join(BASE_DIR, "sales_log.csv")          # POS / Sales tab sales log
+PRICE_HISTORY_FILE = os.path.join(BASE_DIR, "ingredient_price_history.csv")  # Effective-dated price versions
+APPLIED_PRICE_FILE = os.path.join(BASE_DIR, "applied_prices.csv")  # Price versions in effect (overlaid on the price DBs)
 
 # Database files
 INV_DB = os.path.join(BASE_DIR, "inventory_db.csv")               # Inventory items master
@@ -55,6 +58,61 @@ VENDOR_FILE = os.path.join(BASE_DIR, "vendor_mapping.csv")        # Vendor conta
 # Legacy/backup files
 ITEM_FILE = os.path.join(BASE_DIR, "food ingredients.txt")        # Original format backup
 
+# ==================== Storage Backend ====================
+# "csv"    : 기존 방식 (저장할 때마다 CSV 파일 전체를 다시 씀)
+# "sqlite" : SQLite(WAL) 단일 DB 파일 - 변경된 행만 기록, 인덱스 조회
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").lower()
+SQLITE_DB_FILE = os.path.join(BASE_DIR, "everest.db")             # SQLite backend database
+
+# CSV 백엔드의 입출고 로그 기록 방식
+# True  : 새 행만 월별 세그먼트(stock_history_YYYY-MM.csv)에 추가 (core/history_log.py)
+# False : 기존 방식 (stock_history.csv 전체 재작성)
+HISTORY_APPEND_ONLY = os.getenv("HISTORY_APPEND_ONLY", "true").lower() == "true"
+HISTORY_FSYNC_EVERY = int(os.getenv("HISTORY_FSYNC_EVERY", "20"))          # rows per fsync
+HISTORY_FSYNC_INTERVAL = float(os.getenv("HISTORY_FSYNC_INTERVAL", "1.0"))  # seconds between fsyncs
+
+# CSV 전체 저장(재고·발주·판매 로그) write-behind: 이 시간(초) 안의 같은 파일 연속 저장은 한 번만 기록
+# 기록은 임시 파일 → os.replace (0 이면 즉시 기록)
+WRITE_BEHIND_DELAY = float(os.getenv("WRITE_BEHIND_DELAY", "0.3"))
+
+# POS 재고 차감(POST /api/inventory/out) 처리 방식
+# "sync"  : 차감을 마친 뒤 결과 응답 (기존 방식)
+# "async" : 요청을 작업 큐(jobs.db)에 기록 후 바로 202 + job_id, 백그라운드에서 차감 (GET /api/inventory/jobs/{id})
+# 요청별로 ?mode=sync / ?mode=async 로 바꿀 수 있음
+INVENTORY_OUT_MODE = os.getenv("INVENTORY_OUT_MODE", "sync").lower()
+JOB_QUEUE_DB = os.path.join(BASE_DIR, "jobs.db")
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))   # 완료된 작업 기록 보관 기간
+# NDJSON 판매 일괄 수신(POST /api/inventory/ingest): N 건 또는 T ms 마다 한 번에 차감
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_BATCH_MS = int(os.getenv("INGEST_BATCH_MS", "200"))
+
+# API 서버 작업자 프로세스 수 (start.sh 의 uvicorn --workers)
+# 작업자들과 Streamlit 은 core/process_lock.py 의 파일 잠금으로 변경(read-modify-write)을 직렬화하고
+# 변경이 끝날 때마다 공유 데이터 버전을 올려 프로세스별 캐시를 무효화
+API_WORKERS = max(int(os.getenv("API_WORKERS", "1")), 1)
+DATA_LOCK_FILE = os.path.join(BASE_DIR, ".data.lock")
+DATA_VERSION_FILE = os.path.join(BASE_DIR, ".data.version")
+
+# Idempotency-Key (또는 request_id) 로 받은 차감 요청의 응답 보관 개수 (jobs.db, 오래된 것부터 삭제)
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+# 분석 탭용 Parquet 파티션 저장소 (연월 × 지점, pyarrow 필요 / 원본 로그에서 자동 재생성되는 캐시)
+ENABLE_HISTORY_PARTITIONS = os.getenv("ENABLE_HISTORY_PARTITIONS", "true").lower() == "true"
+HISTORY_PARTITION_DIR = os.path.join(BASE_DIR, "history_parquet")
+
+# 지점별 샤드 (CSV 백엔드, core/branch_shards.py): branches/<지점>/inventory.csv + stock_history*.csv
+# 한 지점 작업은 그 지점 파일만 읽고 씀. 최초 사용 시 기존 단일 파일을 지점별로 나눔 (원본은 그대로 둠)
+# 이벤트 소싱 모드에서는 사용하지 않음
+SHARD_BY_BRANCH = os.getenv("SHARD_BY_BRANCH", "false").lower() == "true"
+BRANCH_SHARD_DIR = os.path.join(BASE_DIR, "branches")
+
+# 이벤트 소싱 재고 (core/inventory_ledger.py)
+# True : 입출고 로그가 원본 - 재고 수량은 로그를 접어서 계산, 재고 파일에는 MinQty/Note 등 속성만 의미 있음
+#        재고 등록/수정·삭제도 로그에 SET / DEL 행으로 기록
+INVENTORY_EVENT_SOURCED = os.getenv("INVENTORY_EVENT_SOURCED", "false").lower() == "true"
+INVENTORY_CHECKPOINT_EVERY = int(os.getenv("INVENTORY_CHECKPOINT_EVERY", "500"))  # events per checkpoint
+INVENTORY_CHECKPOINT_DIR = os.path.join(BASE_DIR, "inventory_checkpoints")
+
 # ==================== Security Settings ====================
 SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", "1800"))       # 30 minutes default
 PASSWORD_SALT = os.getenv("PASSWORD_SALT", "everest_inventory_salt_2026")
@@ -92,21 +150,67 @@ INVENTORY_COLUMNS = ["Branch", "Item", "Category", "Unit", "CurrentQty", "MinQty
 HISTORY_COLUMNS = ["Date", "Branch", "Category", "Item", "Unit", "Type", "Qty"]
 ORDERS_COLUMNS = ["OrderId", "Date", "Branch", "Vendor", "Items", "Status", "CreatedDate"]
 
+# Explicit read dtypes per schema (lets robust_read_csv use the fast C parser without type guessing)
+INVENTORY_DTYPES = {
+    "Branch": str, "Item": str, "Category": str, "Unit": str,
+    "CurrentQty": "float64", "MinQty": "float64", "Note": str, "Date": str
+}
+HISTORY_DTYPES = {
+    "Date": str, "Branch": str, "Category": str, "Item": str, "Unit": str, "Type": str,
+    "Qty": "float64"
+}
+ORDERS_DTYPES = {col: str for col in ORDERS_COLUMNS}
+
+RECIPE_MODEL_CHECK_INTERVAL = float(os.getenv("RECIPE_MODEL_CHECK_INTERVAL", "2.0"))  # seconds between recipe/price file change checks
+# Compiled cost model artifact (pickle keyed by a content hash of the recipe/mapping/price/prep CSVs)
+# Loaded at startup instead of re-parsing the CSVs; rebuilt only when a source file's content changes. "" disables
+COST_MODEL_ARTIFACT = os.getenv("COST_MODEL_ARTIFACT", os.path.join(BASE_DIR, "cache", "cost_model.pkl"))
+HISTORY_TAIL_ROWS = 50   # rows shown in "Recent Stock Movements" (read from the end of the log)
+
+# Typed (read-only) frames: text → category, quantities → float32, Date → datetime64 parsed once at load
+# Used for the per-session history view; editable frames stay plain so saves keep the CSV format
+TYPED_FRAMES = os.getenv("TYPED_FRAMES", "true").lower() == "true"
+INVENTORY_CATEGORICALS = ["Branch", "Category", "Item", "Unit"]
+HISTORY_CATEGORICALS = ["Branch", "Category", "Item", "Unit", "Type"]
+
 # ==================== Feature Flags ====================
 ENABLE_MOBILE_MODE = os.getenv("ENABLE_MOBILE_MODE", "true").lower() == "true"
 ENABLE_SESSION_TIMEOUT = MANAGER_PASSWORD is not None  # Only if .env configured
 
 # ==================== Helper Functions ====================
+def get_history_segment_paths():
+    """Return monthly history segment files (stock_history_YYYY-MM.csv), oldest first"""
+    import glob
+    root, ext = os.path.splitext(HISTORY_FILE)
+    return sorted(glob.glob(f"{glob.escape(root)}_[0-9][0-9][0-9][0-9]-[0-9][0-9]{ext}"))
+
+def get_inventory_checkpoint_paths():
+    """Return event-sourced inventory checkpoint files (ckpt_NNNNNNNNN.json), oldest first"""
+    import glob
+    return sorted(glob.glob(os.path.join(glob.escape(INVENTORY_CHECKPOINT_DIR), "ckpt_[0-9]*.json")))
+
+def get_branch_shard_paths():
+    """Return per-branch shard files (branches/<branch>/*.csv) plus the split marker"""
+    import glob
+    marker = os.path.join(BRANCH_SHARD_DIR, ".migrated")
+    return sorted(glob.glob(os.path.join(glob.escape(BRANCH_SHARD_DIR), "*", "*.csv"))) \
+        + ([marker] if os.path.exists(marker) else [])
+
 def get_all_file_paths():
     """Return list of all critical data files for backup"""
     return [
         DATA_FILE,
         HISTORY_FILE,
         ORDERS_FILE,
+        SALES_LOG_FILE,
+        PRICE_HISTORY_FILE,
+        APPLIED_PRICE_FILE,
         INV_DB,
         PUR_DB,
         VENDOR_FILE
-    ]
+    ] + get_history_segment_paths() + ([SQLITE_DB_FILE] if STORAGE_BACKEND == "sqlite" else []) \
+      + (get_inventory_checkpoint_paths() if INVENTORY_EVENT_SOURCED else []) \
+      + (get_branch_shard_paths() if SHARD_BY_BRANCH else [])
 
 def get_config_summary():
     """Return configuration summary for debugging"""
@@ -117,6 +221,7 @@ def get_config_summary():
         "storage": {
             "base_dir": BASE_DIR,
             "mode": STORAGE_MODE,
+            "backend": STORAGE_BACKEND,
             "exists": os.path.exists(BASE_DIR)
         },
         "features": {
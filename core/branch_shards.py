@@ -0,0 +1,62 @@
+"""
+지점별 샤드 저장 경로 (config.SHARD_BY_BRANCH)
+- 지점마다 폴더 하나에 재고 스냅샷과 입출고 로그를 따로 보관
+    branches/
+        동탄/inventory.csv
+        동탄/stock_history.csv, stock_history_2026-10.csv ...   ← core/history_log.py
+        양재/...
+- 한 지점 작업은 그 지점 파일만 읽고 씀 (다른 지점 행을 다시 쓰지 않음)
+- 지점 목록은 폴더에서 찾으므로 config.BRANCHES 밖의 지점도 그대로 동작
+- 경로 계산만 담당, 실제 읽기/쓰기는 core/logic.py
+"""
+
+import os
+from typing import List
+
+INVENTORY_NAME = "inventory.csv"
+HISTORY_NAME = "stock_history.csv"
+MIGRATED_MARKER = ".migrated"
+NO_BRANCH = "_no_branch"        # Branch 값이 비어 있는 행
+
+
+def shard_name(branch) -> str:
+    """지점명 → 폴더 이름 (경로 구분자만 치환, 빈 값은 NO_BRANCH)"""
+    name = "" if branch is None else str(branch).strip()
+    if not name or name.lower() == "nan":
+        return NO_BRANCH
+    return name.replace(os.sep, "_").replace("/", "_").replace("\\", "_")
+
+
+class BranchShards:
+    def __init__(self, root: str):
+        self.root = root
+
+    def shard_dir(self, branch) -> str:
+        return os.path.join(self.root, shard_name(branch))
+
+    def inventory_path(self, branch) -> str:
+        return os.path.join(self.shard_dir(branch), INVENTORY_NAME)
+
+    def history_base(self, branch) -> str:
+        return os.path.join(self.shard_dir(branch), HISTORY_NAME)
+
+    def branches(self) -> List[str]:
+        """샤드 폴더가 있는 지점(폴더 이름) 목록"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    def ensure(self, branch) -> str:
+        path = self.shard_dir(branch)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # ================= 최초 분할 ==================
+    def is_migrated(self) -> bool:
+        return os.path.exists(os.path.join(self.root, MIGRATED_MARKER))
+
+    def mark_migrated(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, MIGRATED_MARKER), "w", encoding="utf-8") as f:
+            f.write("split from inventory_data.csv / stock_history.csv\n")
@@ -0,0 +1,445 @@
+"""
+컴파일된 메뉴 원가 모델
+- recipe_db / ingredient_mapping_final / ingredient_price_db / prep_price_db (+ prep_recipe_db) 파일을 한 번만 읽어
+  메뉴별로 (레시피 재료명, 원가DB 재료명, 1인분 g, g당 단가, 타입) 목록을 미리 계산
+- 원가 조회(get_menu_cost_breakdown)는 메모리의 목록만 사용 (파일 읽기·iterrows 없음)
+- menu_costs(): 조인된 재료 행 전체에 벡터 연산 한 번으로 전 메뉴 원가 계산
+- prep_recipe_db (선택): 프렙 → 원재료(또는 다른 프렙) 배합표
+  컴파일 때 메뉴 → 프렙 → 원재료를 끝까지 펼쳐 메뉴별 1인분 원재료 g 목록(usage)을 만들어 둠
+  → 판매 차감은 usage 조회 한 번 (판매마다 재귀로 펼치지 않음)
+- used_by: 재료 → 그 재료를 쓰는 메뉴와 1인분 g (역색인, 컴파일 때 함께 생성)
+  원재료는 프렙 배합으로 들어가는 양까지 포함, 프렙명으로도 조회 가능
+- matrix() / simulate(): 메뉴 × 재료 1인분 g 행렬 (처음 쓸 때 한 번 생성)
+  단가 변동 시나리오 여러 개를 (재료 행 × 시나리오) 배열 연산 한 번으로 계산 (재료 행별 반올림은 menu_costs 와 같음)
+- 컴파일 결과는 원본 파일 내용 해시와 함께 pickle 아티팩트로 저장 (config.COST_MODEL_ARTIFACT)
+  → 새 프로세스(API 워커·Streamlit 세션·재배포 직후)는 해시가 같으면 CSV 파싱 없이 아티팩트만 읽음
+- 원본 파일 중 하나라도 mtime/크기가 바뀌면 다음 조회 때 다시 컴파일
+  (변경 확인용 stat 도 check_interval 초에 한 번만)
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ARTIFACT_VERSION = 1   # CostModel 구조가 바뀌면 올림 (이전 아티팩트 무시)
+
+# 조인된 재료 행 테이블 컬럼 (CostModel.lines)
+LINE_COLUMNS = ["menu", "ingredient", "mapped", "grams", "price_per_g", "type"]
+
+
+class MenuLine(NamedTuple):
+    ingredient: str     # 레시피북 재료명
+    mapped: str         # 원가DB 재료명 (zero 타입은 '-' 가능)
+    grams: float        # 1인분 사용량 (g)
+    price_per_g: float
+    type: str           # ingredient / prep / zero
+
+
+class CostMatrix(NamedTuple):
+    menus: List[str]        # 행: 메뉴 (CostModel.menu_names 순서)
+    items: List[str]        # 열: 원가DB 재료명 / 프렙명
+    grams: np.ndarray       # 메뉴 × 재료, 1인분 사용량 (g)
+    prices: np.ndarray      # 재료별 현재 g당 단가
+
+
+class CostModel:
+    def __init__(self, menus: Dict[str, Tuple[MenuLine, ...]], recipe_loaded: bool,
+                 lines: Optional[pd.DataFrame] = None,
+                 usage: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None,
+                 used_by: Optional[Dict[str, Tuple[Tuple[str, float], ...]]] = None):
+        self.menus = menus
+        self.recipe_loaded = recipe_loaded
+        self.menu_names = sorted(menus)
+        self.lines = lines if lines is not None else pd.DataFrame(columns=LINE_COLUMNS)   # 조인된 재료 행 전체
+        self.usage = usage if usage is not None else {}   # 메뉴 → ((원재료명, 1인분 g), ...) 프렙까지 펼친 값
+        self.used_by = used_by if used_by is not None else {}   # 재료 → ((메뉴, 1인분 g), ...) g 내림차순
+        self.version = ""   # 원본 파일 내용 해시 (CompiledCostModel 이 설정, API ETag 등에 사용)
+        self._matrix: Optional[CostMatrix] = None
+        self._usage_matrix: Optional[Tuple[List[str], np.ndarray]] = None
+
+    def breakdown(self, menu_name: str, servings: int = 1) -> tuple:
+        """get_menu_cost_breakdown 과 같은 반환 형식: (items, total_cost) / 실패 시 (None, 에러메시지)"""
+        if not self.recipe_loaded:
+            return None, "recipe_db.csv 파일을 찾을 수 없습니다"
+        lines = self.menus.get(menu_name)
+        if lines is None:
+            return None, f"'{menu_name}' 메뉴를 레시피북에서 찾을 수 없습니다"
+
+        items, total_cost = [], 0.0
+        for line in lines:
+            qty = line.grams * servings
+            if line.type == 'zero':
+                items.append({'ingredient': line.ingredient, 'mapped': line.mapped,
+                              'qty_g': qty, 'price_per_g': 0, 'cost': 0, 'type': 'zero'})
+                continue
+            cost = round(qty * line.price_per_g, 1)
+            total_cost += cost
+            items.append({'ingredient': line.ingredient, 'mapped': line.mapped,
+                          'qty_g': qty, 'price_per_g': line.price_per_g, 'cost': cost, 'type': line.type})
+        return items, round(total_cost, 1)
+
+    def consumption(self, menu_name: str, servings: int = 1) -> Optional[List[Tuple[str, float]]]:
+        """
+        재고 차감량: [(원가DB 재료명, g), ...] (프렙은 원재료로 펼친 값, 같은 원재료는 합산)
+        메뉴가 없으면 None
+        """
+        if menu_name not in self.menus:
+            return None
+        return [(item, grams * servings) for item, grams in self.usage.get(menu_name, ())]
+
+    def menus_using(self, item: str) -> List[Tuple[str, float]]:
+        """item(원가DB 재료명 또는 프렙명)을 쓰는 메뉴: [(메뉴, 1인분 g), ...] (없으면 빈 목록)"""
+        return list(self.used_by.get(str(item).strip(), ()))
+
+    def menu_costs(self, servings: int = 1) -> pd.DataFrame:
+        """
+        전체 메뉴 원가를 한 번에 계산 (재료 행 전체에 대한 벡터 연산 + 메뉴별 합계).
+        Returns: menu / cost (servings 인분 원가) / ingredients (원가 계산 재료 수) / unpriced (단가 0 인 재료 수)
+        """
+        lines = self.lines
+        priced = lines["type"] != "zero"
+        df = pd.DataFrame({
+            "menu": lines["menu"],
+            # breakdown() 과 같게 재료별로 반올림 후 합계
+            "cost": (lines["grams"] * servings * lines["price_per_g"]).round(1).where(priced, 0.0),
+            "ingredients": priced.astype(int),
+            "unpriced": (priced & (lines["price_per_g"] == 0)).astype(int),
+        })
+        out = df.groupby("menu", sort=True)[["cost", "ingredients", "unpriced"]].sum()
+        out = out.reindex(self.menu_names, fill_value=0)
+        out["cost"] = out["cost"].round(1)
+        return out.rename_axis("menu").reset_index()
+
+
+    def matrix(self) -> CostMatrix:
+        """메뉴 × 재료 g 행렬 (zero 타입 제외, 같은 메뉴의 같은 재료는 합산)"""
+        if self._matrix is None:
+            priced = self.lines[self.lines["type"] != "zero"]
+            grams = priced.pivot_table(index="menu", columns="mapped", values="grams",
+                                       aggfunc="sum", fill_value=0.0)
+            grams = grams.reindex(index=self.menu_names, fill_value=0.0)
+            prices = priced.drop_duplicates("mapped").set_index("mapped")["price_per_g"]
+            items = list(grams.columns)
+            self._matrix = CostMatrix(self.menu_names, items,
+                                      grams.to_numpy(dtype=float),
+                                      prices.reindex(items).fillna(0).to_numpy(dtype=float))
+        return self._matrix
+
+    def usage_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """재고 차감 기준 메뉴 × 원재료 1인분 g 행렬 (프렙은 원재료로 펼친 값). Returns: (원재료 목록, 행렬)"""
+        if self._usage_matrix is None:
+            items = sorted({item for used in self.usage.values() for item, _ in used})
+            col = {item: j for j, item in enumerate(items)}
+            grams = np.zeros((len(self.menu_names), len(items)))
+            for i, menu in enumerate(self.menu_names):
+                for item, g in self.usage.get(menu, ()):
+                    grams[i, col[item]] += g
+            self._usage_matrix = (items, grams)
+        return self._usage_matrix
+
+    def simulate(self, scenarios: Sequence[Mapping[str, Mapping[str, float]]],
+                 servings: int = 1) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        단가 변동 시나리오별 전 메뉴 원가.
+        scenarios: [{"prices": {재료: 새 g당 단가}, "pct": {재료: 변동률 %}}, ...]  (둘 다 선택)
+        Returns: (현재 원가 (메뉴,), 시나리오 원가 (메뉴 × 시나리오), 행렬에 없는 재료명 목록)
+        원가는 menu_costs() / breakdown() 과 같게 재료 행별로 반올림한 뒤 합계
+        → 현재 원가는 원가표에 보이는 값과 같고, 변동 없는 시나리오의 차이는 0
+        """
+        m = self.matrix()
+        col = {item: j for j, item in enumerate(m.items)}
+        prices = np.repeat(m.prices[:, None], len(scenarios), axis=1)
+        unknown = []
+        for k, scenario in enumerate(scenarios):
+            for item, price in (scenario.get("prices") or {}).items():
+                if item in col:
+                    prices[col[item], k] = float(price)
+                else:
+                    unknown.append(item)
+            for item, pct in (scenario.get("pct") or {}).items():
+                if item in col:
+                    prices[col[item], k] *= 1 + float(pct) / 100
+                else:
+                    unknown.append(item)
+
+        # 재료 행 단위: 시나리오가 바꾼 재료만 새 단가, 나머지는 그 행의 현재 단가 (menu_costs 와 같은 값)
+        priced = self.lines[self.lines["type"] != "zero"]
+        row = {menu: i for i, menu in enumerate(m.menus)}
+        menu_idx = priced["menu"].map(row).to_numpy(dtype=int)
+        item_idx = priced["mapped"].map(col).to_numpy(dtype=int)
+        grams = priced["grams"].to_numpy(dtype=float)[:, None] * servings
+        line_price = priced["price_per_g"].to_numpy(dtype=float)[:, None]
+        changed = prices[item_idx] != m.prices[item_idx][:, None]
+        base = np.zeros(len(m.menus))
+        costs = np.zeros((len(m.menus), len(scenarios)))
+        np.add.at(base, menu_idx, (grams * line_price).round(1)[:, 0])
+        np.add.at(costs, menu_idx, (grams * np.where(changed, prices[item_idx], line_price)).round(1))
+        base, costs = base.round(1), costs.round(1)
+        return base, costs, sorted(set(unknown))
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype(str).str.strip()
+
+
+def join_lines(recipe_db: pd.DataFrame, mapping_df: pd.DataFrame,
+               price_db: pd.DataFrame, prep_db: pd.DataFrame,
+               price_overlay: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    recipe_db → 매핑 → 단가(원가DB / 프렙) 를 한 번에 조인한 재료 행 테이블 (LINE_COLUMNS).
+    skip 타입은 제외, zero 타입(또는 원가DB 재료명 없음)은 mapped '-' 가능·단가 0.
+    매핑·단가 테이블에 같은 이름이 여러 번 있으면 마지막 행 사용.
+    price_overlay(Item / PricePerG): 원가DB·프렙 단가 중 같은 이름의 단가를 덮어씀 (적용된 단가 이력)
+    """
+    if recipe_db.empty:
+        return pd.DataFrame(columns=LINE_COLUMNS)
+
+    lines = pd.DataFrame({
+        "menu": recipe_db["menu"],
+        "ingredient": _text(recipe_db["ingredient"]),
+        "grams": pd.to_numeric(recipe_db["qty_per_serving_g"], errors="coerce").fillna(0).astype(float),
+    })
+
+    if not mapping_df.empty:
+        cost_names = _text(mapping_df["원가DB_재료명"]) if "원가DB_재료명" in mapping_df else pd.Series("", index=mapping_df.index)
+        mapping = pd.DataFrame({
+            "ingredient": _text(mapping_df["레시피북_재료명"]),
+            "cost_name": cost_names.where(~cost_names.isin(["nan", "NaN", "None"]), ""),
+            "type": _text(mapping_df["타입"]) if "타입" in mapping_df else "ingredient",
+        }).drop_duplicates("ingredient", keep="last")
+        lines = lines.merge(mapping, on="ingredient", how="left")
+    else:
+        lines["cost_name"] = pd.NA
+        lines["type"] = pd.NA
+    # 매핑에 없는 재료는 레시피 재료명 그대로 원가DB 에서 찾음
+    unmapped = lines["type"].isna()
+    lines.loc[unmapped, "cost_name"] = lines.loc[unmapped, "ingredient"]
+    lines.loc[unmapped, "type"] = "ingredient"
+    lines = lines[lines["type"] != "skip"]
+
+    zero = (lines["type"] == "zero") | (lines["cost_name"] == "")
+    prices = _price_map(price_db, "Item", "PricePerG")
+    preps = _price_map(prep_db, "prep_name", "price_per_g")
+    if price_overlay is not None and not price_overlay.empty and "Item" in price_overlay:
+        overlay = _price_map(price_overlay, "Item", "PricePerG")
+        prices = _overlaid(prices, overlay)
+        preps = _overlaid(preps, overlay)
+    price = lines["cost_name"].map(prices)
+    price = price.where(lines["type"] != "prep", lines["cost_name"].map(preps))
+
+    return pd.DataFrame({
+        "menu": lines["menu"],
+        "ingredient": lines["ingredient"],
+        "mapped": lines["cost_name"].where(lines["cost_name"] != "", "-"),
+        "grams": lines["grams"],
+        "price_per_g": price.fillna(0).astype(float).where(~zero, 0.0),
+        "type": lines["type"].where(~zero, "zero"),
+    }).reset_index(drop=True)
+
+
+def _overlaid(prices: pd.Series, overlay: pd.Series) -> pd.Series:
+    """prices 에 있는 이름만 overlay 단가로 교체"""
+    prices = prices.copy()
+    common = prices.index.intersection(overlay.index)
+    prices.loc[common] = overlay.loc[common].to_numpy()
+    return prices
+
+
+def _price_map(df: pd.DataFrame, name_col: str, price_col: str) -> pd.Series:
+    if df.empty:
+        return pd.Series(dtype=float)
+    prices = pd.to_numeric(df[price_col], errors="coerce").fillna(0) if price_col in df else 0.0
+    table = pd.DataFrame({"name": _text(df[name_col]), "price": prices})
+    return table.drop_duplicates("name", keep="last").set_index("name")["price"]
+
+
+def flatten_preps(prep_recipe: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    프렙 배합표 → 프렙 1g 당 원재료 g (중첩 프렙은 원재료까지 펼침).
+    prep_recipe 컬럼: prep_name / ingredient / qty_g / yield_g
+      "yield_g g 의 prep_name 을 만드는 데 ingredient 가 qty_g g 들어감"
+      ingredient 가 다른 prep_name 이면 그 프렙의 배합으로 다시 펼침
+    순환 참조는 경고 후 그 재료만 제외.
+    """
+    if prep_recipe.empty:
+        return {}
+    table = pd.DataFrame({
+        "prep": _text(prep_recipe["prep_name"]),
+        "ingredient": _text(prep_recipe["ingredient"]),
+        "qty": pd.to_numeric(prep_recipe["qty_g"], errors="coerce").fillna(0),
+        "yield": pd.to_numeric(prep_recipe["yield_g"], errors="coerce").fillna(0),
+    })
+    table = table[(table["yield"] > 0) & (table["qty"] > 0)]
+    direct: Dict[str, Dict[str, float]] = {}
+    for prep, ingredient, qty, yield_g in table.itertuples(index=False, name=None):
+        parts = direct.setdefault(prep, {})
+        parts[ingredient] = parts.get(ingredient, 0.0) + qty / yield_g
+
+    flat: Dict[str, Dict[str, float]] = {}
+
+    def expand(prep: str, path: Tuple[str, ...]) -> Dict[str, float]:
+        if prep in flat:
+            return flat[prep]
+        out: Dict[str, float] = {}
+        for ingredient, ratio in direct[prep].items():
+            if ingredient in path:
+                print(f"프렙 배합 순환 참조: {' → '.join(path + (ingredient,))} (제외)")
+                continue
+            if ingredient in direct:
+                for raw, sub in expand(ingredient, path + (ingredient,)).items():
+                    out[raw] = out.get(raw, 0.0) + ratio * sub
+            else:
+                out[ingredient] = out.get(ingredient, 0.0) + ratio
+        flat[prep] = out
+        return out
+
+    for prep in direct:
+        expand(prep, (prep,))
+    return flat
+
+
+def compile_model(recipe_db: pd.DataFrame, mapping_df: pd.DataFrame,
+                  price_db: pd.DataFrame, prep_db: pd.DataFrame,
+                  prep_recipe: Optional[pd.DataFrame] = None,
+                  price_overlay: Optional[pd.DataFrame] = None) -> CostModel:
+    """원본 테이블 → CostModel (조인 결과를 메뉴별 재료 목록과 프렙까지 펼친 원재료 사용량으로 묶어 둠)"""
+    lines = join_lines(recipe_db, mapping_df, price_db, prep_db, price_overlay)
+    preps = flatten_preps(prep_recipe if prep_recipe is not None else pd.DataFrame())
+    menus: Dict[str, List[MenuLine]] = {m: [] for m in recipe_db["menu"]} if not recipe_db.empty else {}
+    usage: Dict[str, Dict[str, float]] = {m: {} for m in menus}
+    for row in lines.itertuples(index=False):
+        menus[row.menu].append(MenuLine(row.ingredient, row.mapped, row.grams, row.price_per_g, row.type))
+        used = usage[row.menu]
+        if row.type == "ingredient":
+            used[row.mapped] = used.get(row.mapped, 0.0) + row.grams
+        elif row.type == "prep":
+            # 배합표가 없는 프렙은 차감하지 않음 (기존 동작)
+            for raw, ratio in preps.get(row.mapped, {}).items():
+                used[raw] = used.get(raw, 0.0) + row.grams * ratio
+
+    # 역색인: 원재료(프렙 경유 포함) + 프렙명 → 메뉴별 1인분 g
+    used_by: Dict[str, Dict[str, float]] = {}
+    for menu, used in usage.items():
+        for item, grams in used.items():
+            used_by.setdefault(item, {})[menu] = grams
+    for row in lines[lines["type"] == "prep"].itertuples(index=False):
+        menus_of = used_by.setdefault(row.mapped, {})
+        menus_of[row.menu] = menus_of.get(row.menu, 0.0) + row.grams
+
+    return CostModel({m: tuple(v) for m, v in menus.items()}, recipe_loaded=not recipe_db.empty, lines=lines,
+                     usage={m: tuple(u.items()) for m, u in usage.items()},
+                     used_by={item: tuple(sorted(m.items(), key=lambda kv: (-kv[1], kv[0])))
+                              for item, m in used_by.items()})
+
+
+def _signature(paths: Sequence[str]):
+    sig = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append(None)
+    return tuple(sig)
+
+
+def content_hash(paths: Sequence[str]) -> str:
+    """원본 파일 내용의 sha256 (없는 파일은 '-' 로 구분)"""
+    h = hashlib.sha256(f"v{ARTIFACT_VERSION}".encode())
+    for path in paths:
+        h.update(os.path.basename(path).encode() + b"\0")
+        try:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        except OSError:
+            h.update(b"-")
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def load_artifact(path: str, digest: str) -> Optional[CostModel]:
+    """해시가 일치하는 아티팩트의 CostModel (없거나 다르거나 손상되면 None)"""
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("version") != ARTIFACT_VERSION or data.get("hash") != digest:
+        return None
+    return data.get("model")
+
+
+def save_artifact(path: str, model: CostModel, digest: str) -> None:
+    """행렬까지 미리 만든 CostModel 을 임시 파일 → os.replace 로 저장"""
+    model.matrix()
+    model.usage_matrix()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": ARTIFACT_VERSION, "hash": digest, "model": model}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class CompiledCostModel:
+    """원본 파일들의 변경을 감시하며 CostModel 을 필요할 때만 다시 만듦"""
+
+    def __init__(self, paths: Sequence[str], reader: Callable[[str], pd.DataFrame],
+                 check_interval: float = 2.0, artifact: Optional[str] = None):
+        """
+        Args:
+            paths: (recipe, mapping, price, prep[, prep_recipe[, price_overlay]]) 파일 경로 - compile_model 인자 순서
+            reader: 경로 → DataFrame (core.logic.robust_read_csv)
+            check_interval: 파일 변경 확인(stat) 간격(초). 0 이면 매 조회마다 확인
+            artifact: 컴파일 결과 pickle 경로 (None/"" 이면 저장·로드 안 함)
+        """
+        self.paths = list(paths)
+        self.reader = reader
+        self.check_interval = check_interval
+        self.artifact = artifact or None
+        self._lock = threading.Lock()
+        self._model: Optional[CostModel] = None
+        self._signature = None
+        self._checked_at = 0.0
+
+    def get(self) -> CostModel:
+        now = time.monotonic()
+        model = self._model
+        if model is not None and now - self._checked_at < self.check_interval:
+            return model
+        with self._lock:
+            signature = _signature(self.paths)
+            if self._model is None or signature != self._signature:
+                self._model = self._build()
+                self._signature = signature
+            self._checked_at = time.monotonic()
+            return self._model
+
+    def _build(self) -> CostModel:
+        """아티팩트 해시가 원본과 같으면 로드, 아니면 CSV 에서 컴파일 후 아티팩트 갱신"""
+        digest = content_hash(self.paths)
+        model = load_artifact(self.artifact, digest) if self.artifact else None
+        if model is None:
+            model = compile_model(*(self.reader(p) for p in self.paths))
+            model.version = digest
+            if self.artifact:
+                try:
+                    save_artifact(self.artifact, model, digest)
+                except OSError as e:
+                    print(f"원가 모델 아티팩트 저장 실패 (다음 시작 때 다시 컴파일): {e}")
+        model.version = digest
+        return model
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._model = None
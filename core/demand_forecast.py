@@ -0,0 +1,119 @@
+"""
+식재료 수요 예측 (판매 로그 × 레시피 g 행렬)
+- sales_log 를 (지점, 메뉴) 별 일별 판매 인분 시계열로 펼침 → 행렬 Y (시계열 × 일)
+- 모든 시계열을 한 번에 지수평활 (수준 + 요일 계절성, 가법형)
+    수준:   l = α·(y - s[요일]) + (1-α)·l
+    계절:   s[요일] = γ·(y - l) + (1-γ)·s[요일]
+  시간축만 반복하고 시계열 축은 NumPy 벡터 연산 → 수백 개 시계열도 수 ms
+- 예측 인분 (지점 × 메뉴) @ 메뉴 × 원재료 1인분 g 행렬 = 지점별 원재료 예상 사용량
+- 기록이 계절 2주기(14일)보다 짧으면 계절성 없이 수준만 사용
+"""
+
+from datetime import date, timedelta
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEASON = 7   # 요일 주기
+
+
+def build_series(sales: pd.DataFrame, end: date, history_days: int) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    """
+    sales_log → ((지점, 메뉴) 목록, 일별 판매 인분 행렬 Y)
+    Y[i, t] = end - history_days + 1 + t 일의 판매 인분 (판매가 없는 날은 0)
+    """
+    start = pd.Timestamp(end) - pd.Timedelta(days=history_days - 1)
+    df = pd.DataFrame({
+        "Branch": sales["Branch"].astype(str),
+        "Menu": sales["Menu"].astype(str),
+        "day": pd.to_datetime(sales["Date"].astype(str).str[:10], errors="coerce"),
+        "Servings": pd.to_numeric(sales["Servings"], errors="coerce").fillna(0),
+    })
+    df = df[(df["day"] >= start) & (df["day"] <= pd.Timestamp(end))]
+    if df.empty:
+        return [], np.zeros((0, history_days))
+
+    df["t"] = (df["day"] - start).dt.days
+    grouped = df.groupby(["Branch", "Menu", "t"])["Servings"].sum()
+    keys = sorted(set(zip(grouped.index.get_level_values(0), grouped.index.get_level_values(1))))
+    row = {k: i for i, k in enumerate(keys)}
+    Y = np.zeros((len(keys), history_days))
+    rows = [row[(b, m)] for b, m in zip(grouped.index.get_level_values(0), grouped.index.get_level_values(1))]
+    Y[rows, grouped.index.get_level_values(2).to_numpy()] = grouped.to_numpy()
+    return keys, Y
+
+
+def forecast(Y: np.ndarray, horizon: int, alpha: float = 0.3, gamma: float = 0.2,
+             first_weekday: int = 0, active_days: int = None) -> np.ndarray:
+    """
+    모든 시계열(행)을 동시에 평활해 horizon 일 예측 (음수는 0).
+    first_weekday: Y[:, 0] 의 요일 (월=0) - 계절 인덱스를 달력 요일에 맞춤
+    active_days: 실제 판매 기록이 있는 기간 (계절성 사용 여부 판단, 기본 Y 길이)
+    Returns: (시계열 × horizon)
+    """
+    n, T = Y.shape
+    if n == 0:
+        return np.zeros((0, horizon))
+    use_season = (active_days or T) >= 2 * SEASON
+
+    level = Y[:, :SEASON].mean(axis=1)
+    season = np.zeros((n, SEASON))
+    if use_season:
+        # 초기 계절값: 요일별 평균 - 전체 평균
+        days = (np.arange(T) + first_weekday) % SEASON
+        for d in range(SEASON):
+            season[:, d] = Y[:, days == d].mean(axis=1)
+        season -= season.mean(axis=1, keepdims=True)
+
+    for t in range(T):
+        d = (t + first_weekday) % SEASON
+        y = Y[:, t]
+        new_level = alpha * (y - season[:, d]) + (1 - alpha) * level
+        if use_season:
+            season[:, d] = gamma * (y - new_level) + (1 - gamma) * season[:, d]
+        level = new_level
+
+    ahead = (np.arange(T, T + horizon) + first_weekday) % SEASON
+    return np.clip(level[:, None] + season[:, ahead], 0, None)
+
+
+def ingredient_demand(sales: pd.DataFrame, menu_names: List[str], items: List[str],
+                      grams: np.ndarray, horizon: int, history_days: int = 56,
+                      end: date = None) -> pd.DataFrame:
+    """
+    지점별 원재료 예상 사용량.
+    menu_names / items / grams: 메뉴 × 원재료 1인분 g 행렬 (CostModel.usage_matrix)
+    예측 기간: end 다음날부터 horizon 일
+    Returns: Branch / Item / forecast_g (horizon 일 합계) / per_day_g
+    """
+    columns = ["Branch", "Item", "forecast_g", "per_day_g"]
+    end = end or date.today()
+    keys, Y = build_series(sales, end, history_days)
+    if not keys or not items:
+        return pd.DataFrame(columns=columns)
+
+    first_day = end - timedelta(days=history_days - 1)
+    observed = (Y.sum(axis=0) > 0).nonzero()[0]
+    active_days = history_days - int(observed[0]) if observed.size else 0
+    servings = forecast(Y, horizon, first_weekday=first_day.weekday(), active_days=active_days).sum(axis=1)
+
+    # (지점 × 메뉴) 예측 인분 행렬 → @ (메뉴 × 원재료 g)
+    branches = sorted({b for b, _ in keys})
+    b_idx = {b: i for i, b in enumerate(branches)}
+    m_idx = {m: j for j, m in enumerate(menu_names)}
+    S = np.zeros((len(branches), len(menu_names)))
+    for (branch, menu), value in zip(keys, servings):
+        j = m_idx.get(menu)
+        if j is not None:     # 레시피북에서 빠진 메뉴는 제외
+            S[b_idx[branch], j] += value
+    demand = S @ grams
+
+    bi, ii = np.nonzero(demand > 0)
+    out = pd.DataFrame({
+        "Branch": [branches[i] for i in bi],
+        "Item": [items[i] for i in ii],
+        "forecast_g": demand[bi, ii].round(1),
+        "per_day_g": (demand[bi, ii] / horizon).round(1),
+    }, columns=columns)
+    return out.sort_values(["Branch", "forecast_g"], ascending=[True, False], ignore_index=True)
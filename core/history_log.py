@@ -0,0 +1,267 @@
+"""
+입출고 로그(stock_history.csv) 추가 전용 기록기
+- 새 행만 파일 끝에 덧붙임 (기존 로그 전체 재작성 없음)
+- 기록하는 달(月)이 바뀌면 새 세그먼트 파일로 넘어감
+    stock_history.csv            ← 기존(레거시) 로그, 그대로 유지
+    stock_history_2026-10.csv    ← 2026년 10월에 추가된 행
+    stock_history_2026-11.csv    ← 2026년 11월에 추가된 행
+- fsync 는 매 행이 아니라 일정 행 수 / 일정 시간마다 묶어서 수행
+  (flush 는 매번 하므로 프로세스가 죽어도 OS 캐시에 남은 행은 보존됨)
+- load() 는 레거시 파일 + 세그먼트들을 순서대로 이어 붙여 하나의 DataFrame 으로 반환
+- tail(n) 은 최근 세그먼트부터 파일 끝에서 거꾸로 읽어 마지막 n 행만 반환 (로그 길이와 무관)
+"""
+
+import atexit
+import glob
+import io
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence
+
+import pandas as pd
+
+_SEGMENT_RE = re.compile(r"_(\d{4}-\d{2})\.csv$")
+_TAIL_BLOCK = 64 * 1024
+
+
+class HistoryLog:
+    def __init__(self, base_file: str, columns: Sequence[str],
+                 fsync_every: int = 20, fsync_interval: float = 1.0):
+        """
+        Args:
+            base_file: 레거시 로그 경로 (예: .../stock_history.csv)
+            columns: 로그 컬럼 순서 (config.HISTORY_COLUMNS)
+            fsync_every: 이 행 수만큼 쌓이면 fsync
+            fsync_interval: 마지막 fsync 후 이 시간(초)이 지나면 다음 기록 때 fsync
+        """
+        self.base_file = base_file
+        self.columns = list(columns)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._handle = None          # 현재 세그먼트 파일 핸들 (열어 둔 채 재사용)
+        self._handle_path = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._line_counts: Dict[str, tuple] = {}   # path → _count_lines() 결과 (추가된 부분만 이어서 셈)
+
+    # ================= 경로 ==================
+    def segment_path(self, month: str) -> str:
+        """month: 'YYYY-MM' → stock_history_YYYY-MM.csv"""
+        root, ext = os.path.splitext(self.base_file)
+        return f"{root}_{month}{ext or '.csv'}"
+
+    def segments(self) -> List[str]:
+        """존재하는 세그먼트 파일 목록 (오래된 달 → 최근 달 순)"""
+        root, ext = os.path.splitext(self.base_file)
+        paths = [p for p in glob.glob(f"{glob.escape(root)}_*{ext or '.csv'}") if _SEGMENT_RE.search(p)]
+        return sorted(paths)
+
+    def files(self) -> List[str]:
+        """읽기 순서대로 정렬한 전체 로그 파일 (레거시 파일 먼저)"""
+        base = [self.base_file] if os.path.exists(self.base_file) else []
+        return base + self.segments()
+
+    # ================= 쓰기 ==================
+    def append(self, rows: List[Sequence]) -> int:
+        """
+        rows(컬럼 순서의 리스트들)를 이번 달 세그먼트 끝에 추가.
+        Returns: 추가한 행 수
+        """
+        if not rows:
+            return 0
+        df = pd.DataFrame([list(r) for r in rows], columns=self.columns)
+        path = self.segment_path(datetime.now().strftime("%Y-%m"))
+
+        with self._lock:
+            handle = self._open(path)
+            new_file = os.fstat(handle.fileno()).st_size == 0
+            text = df.to_csv(index=False, header=new_file)
+            # 새 파일이면 기존 CSV 들과 같게 BOM(utf-8-sig) 포함
+            handle.write(text.encode("utf-8-sig" if new_file else "utf-8"))
+            handle.flush()
+            self._unsynced += len(df)
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._fsync()
+        return len(df)
+
+    def sync(self) -> None:
+        """쌓인 행을 즉시 디스크에 반영 (종료 시 자동 호출)"""
+        with self._lock:
+            if self._handle is not None and self._unsynced:
+                self._fsync()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def rewrite(self, df: pd.DataFrame) -> None:
+        """
+        로그 전체를 df 로 교체 (중간 행 삭제·수정 등 추가만으로 표현할 수 없는 경우).
+        레거시 파일에 통째로 쓰고 세그먼트는 삭제.
+        """
+        with self._lock:
+            self._close()
+            tmp = self.base_file + ".tmp"
+            df.reindex(columns=self.columns).to_csv(tmp, index=False, encoding="utf-8-sig")
+            os.replace(tmp, self.base_file)
+            for path in self.segments():
+                os.remove(path)
+
+    def _open(self, path: str):
+        if self._handle is not None and not _same_file(self._handle, path):
+            # 다른 프로세스가 rewrite() 로 세그먼트를 지웠으면 열어 둔 핸들은 지워진 파일 - 다시 엶
+            self._close()
+        if self._handle_path != path:
+            # 달이 바뀌면 이전 세그먼트를 fsync 후 닫고 새 세그먼트로 넘어감
+            self._close()
+            self._handle = open(path, "ab")
+            self._handle_path = path
+        return self._handle
+
+    def _fsync(self) -> None:
+        os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close(self) -> None:
+        if self._handle is not None:
+            if self._unsynced:
+                self._fsync()
+            self._handle.close()
+        self._handle = None
+        self._handle_path = None
+
+    # ================= 읽기 ==================
+    def load(self, reader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        전체 로그를 하나의 DataFrame 으로 반환.
+        reader: 파일 경로 → DataFrame (core.logic.robust_read_csv)
+        """
+        frames = []
+        for path in self.files():
+            df = reader(path)
+            if not df.empty:
+                frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def tail(self, n: int, reader: Callable[[str], pd.DataFrame], dtype=None) -> pd.DataFrame:
+        """
+        마지막 n 행 (최근 파일부터 끝에서 거꾸로 읽어 필요한 만큼만).
+        reader: UTF-8 이 아닌 레거시 파일 등 역방향 읽기를 못 할 때 쓰는 전체 읽기 함수
+        """
+        frames, need = [], n
+        for path in reversed(self.files()):
+            if need <= 0:
+                break
+            df = read_tail(path, need, dtype=dtype)
+            if df is None:
+                df = reader(path).tail(need)
+            if not df.empty:
+                frames.append(df)
+                need -= len(df)
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(reversed(frames), ignore_index=True)
+
+    def row_count(self) -> int:
+        """
+        저장된 데이터 행 수 (파싱 없이 줄 수만 셈, 파일마다 헤더 1줄 제외).
+        빈 줄(공백만 있는 줄 포함)은 read_tail / pandas 처럼 세지 않음 → 읽은 행 수와 같은 기준
+        파일별로 센 결과를 기억해 두고 그 뒤에 추가된 바이트만 읽음 → 로그 길이와 무관
+        """
+        total = 0
+        with self._lock:
+            for path in self.files():
+                _, _, lines, pending = self._count_lines(path)
+                lines += 1 if pending else 0
+                total += max(lines - 1, 0)
+        return total
+
+    def _count_lines(self, path: str) -> tuple:
+        """(inode, 읽은 크기, 끝난 줄 중 내용 있는 줄 수, 끝나지 않은 마지막 줄에 내용 있음)"""
+        st = os.stat(path)
+        cached = self._line_counts.get(path)
+        if cached is None or cached[0] != st.st_ino or cached[1] > st.st_size:
+            cached = (st.st_ino, 0, 0, False)   # 처음 보거나 교체·축소된 파일 → 처음부터 셈
+        ino, size, lines, pending = cached
+        if st.st_size > size:
+            with open(path, "rb") as f:
+                f.seek(size)
+                data = f.read()
+            size += len(data)
+            parts = data.split(b"\n")
+            pending = pending or bool(parts[0].strip())
+            if len(parts) > 1:
+                lines += int(pending) + sum(1 for part in parts[1:-1] if part.strip())
+                pending = bool(parts[-1].strip())
+        cached = (ino, size, lines, pending)
+        self._line_counts[path] = cached
+        return cached
+
+
+def _same_file(handle, path: str) -> bool:
+    try:
+        return os.path.samestat(os.fstat(handle.fileno()), os.stat(path))
+    except OSError:
+        return False
+
+
+def read_tail(path: str, n: int, dtype=None, block_size: int = _TAIL_BLOCK):
+    """
+    CSV 파일의 마지막 n 행을 끝에서부터 블록 단위로 거꾸로 읽어 반환 (헤더는 첫 줄에서).
+    UTF-8 로 해석할 수 없으면 None (호출 측이 전체 읽기로 대체)
+    """
+    if n <= 0 or not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path, "rb") as f:
+        header = f.readline()
+        header_end = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > header_end and buf.count(b"\n") <= n:
+            step = min(block_size, pos - header_end)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.split(b"\n")
+    if pos > header_end:
+        lines = lines[1:]          # 블록 경계에서 잘린 첫 줄
+    lines = [line for line in lines if line.strip()][-n:]
+    if not header.strip() or not lines:
+        return pd.DataFrame()
+    try:
+        text = (header.rstrip(b"\r\n") + b"\n" + b"\n".join(lines)).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return None
+    return pd.read_csv(io.StringIO(text), dtype=dtype)
+
+
+# ================= 경로별 단일 인스턴스 ==================
+_logs: Dict[str, HistoryLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_log(base_file: str, columns: Sequence[str], **kwargs) -> HistoryLog:
+    """같은 파일에 대해서는 프로세스 안에서 하나의 HistoryLog 만 사용 (핸들·fsync 카운터 공유)"""
+    with _logs_lock:
+        log = _logs.get(base_file)
+        if log is None:
+            log = _logs[base_file] = HistoryLog(base_file, columns, **kwargs)
+        return log
+
+
+@atexit.register
+def _sync_all() -> None:
+    for log in list(_logs.values()):
+        try:
+            log.close()
+        except Exception as e:
+            print(f"history log sync 오류: {e}")
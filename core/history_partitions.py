@@ -0,0 +1,166 @@
+"""
+분석용 입출고 로그 저장소 (Parquet, 연월 × 지점 파티션)
+- Usage Analysis / Monthly Report 탭이 "선택한 기간"의 파티션만 읽도록 함
+    history_parquet/
+        YearMonth=2026-10/
+            Branch=동탄/<uuid>.parquet
+            Branch=양재/<uuid>.parquet
+- 원본(stock_history.csv / SQLite)에서 파생된 캐시 → 언제든 rebuild() 로 다시 만들 수 있음
+- manifest.json 에 원본 시그니처를 저장해 두고, 원본과 다르면 전체 재생성
+- pyarrow 가 없으면 AVAILABLE = False (호출 측은 기존 전체 로드 방식으로 대체)
+"""
+
+import json
+import os
+import shutil
+import uuid
+from typing import List, Optional, Sequence
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    AVAILABLE = True
+except ImportError:
+    AVAILABLE = False
+
+PARTITION_COLS = ["YearMonth", "Branch"]
+# 읽기 기본 컬럼 (기존 탭 코드와 같은 HISTORY_COLUMNS + DateObj 순서)
+READ_COLUMNS = ["Date", "Branch", "Category", "Item", "Unit", "Type", "Qty", "DateObj"]
+UNKNOWN_MONTH = "unknown"       # 날짜 해석 불가 행 (기간 조회에는 포함되지 않음)
+COMPACT_THRESHOLD = 64          # 한 파티션의 파일 수가 이보다 많아지면 하나로 합침
+MANIFEST = "manifest.json"
+
+
+class HistoryPartitions:
+    def __init__(self, root: str):
+        self.root = root
+
+    # ================= 상태 ==================
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST)
+
+    def signature(self):
+        """마지막으로 동기화한 원본 시그니처 (없으면 None)"""
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return json.load(f).get("signature")
+        except (OSError, ValueError):
+            return None
+
+    def set_signature(self, signature) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature}, f, ensure_ascii=False)
+        os.replace(tmp, self._manifest_path())
+
+    def periods(self) -> List[str]:
+        """저장된 연월 목록 ['2026-09', '2026-10', ...] (디렉터리 이름만 확인)"""
+        if not os.path.isdir(self.root):
+            return []
+        months = []
+        for name in os.listdir(self.root):
+            if name.startswith("YearMonth=") and name != f"YearMonth={UNKNOWN_MONTH}":
+                months.append(name.split("=", 1)[1])
+        return sorted(months)
+
+    # ================= 쓰기 ==================
+    def append(self, history_df: pd.DataFrame) -> None:
+        """새 로그 행(HISTORY_COLUMNS)을 해당 연월·지점 파티션에 새 파일로 추가"""
+        if history_df.empty:
+            return
+        part_df = _to_partition_frame(history_df)
+        table = pa.Table.from_pandas(part_df, preserve_index=False)
+        pq.write_to_dataset(table, self.root, partition_cols=PARTITION_COLS,
+                            basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet")
+        for ym, branch in part_df[PARTITION_COLS].drop_duplicates().itertuples(index=False):
+            self._compact_if_needed(ym, branch)
+
+    def rebuild(self, history_df: pd.DataFrame, signature) -> None:
+        """전체 로그로 파티션을 새로 생성 (임시 폴더에 만든 뒤 교체)"""
+        tmp_root = self.root + ".building"
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        os.makedirs(tmp_root, exist_ok=True)
+        if not history_df.empty:
+            table = pa.Table.from_pandas(_to_partition_frame(history_df), preserve_index=False)
+            pq.write_to_dataset(table, tmp_root, partition_cols=PARTITION_COLS)
+        old_root = self.root + ".old"
+        shutil.rmtree(old_root, ignore_errors=True)
+        if os.path.exists(self.root):
+            os.replace(self.root, old_root)
+        os.replace(tmp_root, self.root)
+        shutil.rmtree(old_root, ignore_errors=True)
+        self.set_signature(signature)
+
+    def _compact_if_needed(self, year_month: str, branch: str) -> None:
+        part_dir = self._partition_dir(year_month, branch)
+        if not part_dir:
+            return
+        files = [f for f in os.listdir(part_dir) if f.endswith(".parquet")]
+        if len(files) <= COMPACT_THRESHOLD:
+            return
+        table = pq.read_table([os.path.join(part_dir, f) for f in files])
+        tmp = os.path.join(part_dir, f"compact-{uuid.uuid4().hex}.parquet.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, tmp[:-len(".tmp")])
+        for f in files:
+            os.remove(os.path.join(part_dir, f))
+
+    def _partition_dir(self, year_month: str, branch: str) -> Optional[str]:
+        month_dir = os.path.join(self.root, f"YearMonth={year_month}")
+        if not os.path.isdir(month_dir):
+            return None
+        # pyarrow 는 파티션 값을 URL 인코딩하므로 디렉터리 이름을 디코딩해서 비교
+        from urllib.parse import unquote
+        for name in os.listdir(month_dir):
+            if name.startswith("Branch=") and unquote(name.split("=", 1)[1]) == str(branch):
+                return os.path.join(month_dir, name)
+        return None
+
+    # ================= 읽기 ==================
+    def read(self, year_months: Sequence[str], branch: Optional[str] = None,
+             category: Optional[str] = None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        지정한 연월 파티션만 읽음.
+        columns: 필요한 컬럼만 지정 (Branch 포함 가능). None 이면 전체.
+        """
+        wanted = list(columns) if columns else list(READ_COLUMNS)
+        frames = []
+        for ym in year_months:
+            month_dir = os.path.join(self.root, f"YearMonth={ym}")
+            if not os.path.isdir(month_dir):
+                continue
+            dataset = ds.dataset(month_dir, format="parquet", partitioning="hive")
+            expr = None
+            if branch:
+                expr = ds.field("Branch") == branch
+            if category:
+                cat_expr = ds.field("Category") == category
+                expr = cat_expr if expr is None else expr & cat_expr
+            table = dataset.to_table(columns=wanted, filter=expr)
+            frames.append(table.to_pandas())
+        if not frames:
+            return pd.DataFrame(columns=wanted)
+        df = pd.concat(frames, ignore_index=True)
+        if "Branch" in df.columns:
+            df["Branch"] = df["Branch"].astype(str)   # 파티션 컬럼은 dictionary 로 읽히므로 문자열로
+        return df
+
+
+def _to_partition_frame(history_df: pd.DataFrame) -> pd.DataFrame:
+    """HISTORY_COLUMNS 프레임 → 저장용 프레임 (DateObj·YearMonth 계산은 기록 시 1회만)"""
+    df = pd.DataFrame({
+        "Date": history_df["Date"].astype(str),
+        "DateObj": pd.to_datetime(history_df["Date"], errors="coerce"),
+        "Branch": history_df["Branch"].fillna("").astype(str),
+        "Category": history_df["Category"].astype(str),
+        "Item": history_df["Item"].astype(str),
+        "Unit": history_df["Unit"].fillna("").astype(str),
+        "Type": history_df["Type"].astype(str),
+        "Qty": pd.to_numeric(history_df["Qty"], errors="coerce").astype("float64"),
+    })
+    df["YearMonth"] = df["DateObj"].dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+    return df
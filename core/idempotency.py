@@ -0,0 +1,86 @@
+"""
+멱등성 키 저장소 (SQLite, jobs.db 와 같은 파일)
+- POS 가 짧은 타임아웃으로 재시도해도 같은 Idempotency-Key 요청은 한 번만 처리
+- 처리 전 키를 먼저 예약(reserve) → 같은 키의 동시 요청은 "처리 중" 으로 거절 (두 번 차감 방지)
+- 처리 후 응답(상태 코드 + 본문)을 저장 → 이후 같은 키는 저장된 응답을 그대로 반환
+- 같은 키로 내용이 다른 요청이 오면 fingerprint 불일치로 구분
+- 최근 max_keys 개만 보관 (오래된 키부터 삭제)
+- 예약 후 stale_after 초가 지나도록 응답이 저장되지 않은 키(처리 중 종료)는 새 요청이 다시 예약 가능
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key         TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status_code INTEGER,              -- NULL = 처리 중
+    response    TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys (created_at);
+"""
+
+
+class IdempotencyStore:
+    def __init__(self, db_path: str, max_keys: int = 10000, stale_after: float = 300.0):
+        self.db_path = db_path
+        self.max_keys = max_keys
+        self.stale_after = stale_after
+        self._local = threading.local()   # 스레드별 커넥션
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """
+        key 를 처리 중으로 예약.
+        Returns: None (새로 예약됨 → 처리 후 save 호출)
+                 또는 기존 기록 {"fingerprint", "status_code"(처리 중이면 None), "response"}
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, status_code, response, created_at FROM idempotency_keys WHERE key = ?",
+                (key,)).fetchone()
+            if row is not None and not (row[1] is None and now - row[3] > self.stale_after):
+                conn.execute("COMMIT")
+                return {"fingerprint": row[0], "status_code": row[1],
+                        "response": json.loads(row[2]) if row[2] else None}
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status_code, response, created_at) "
+                "VALUES (?, ?, NULL, NULL, ?)", (key, fingerprint, now))
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def save(self, key: str, status_code: int, response: dict) -> None:
+        """처리 결과 저장 + 보관 개수 초과분 삭제"""
+        conn = self._conn()
+        conn.execute("UPDATE idempotency_keys SET status_code = ?, response = ? WHERE key = ?",
+                     (status_code, json.dumps(response, ensure_ascii=False), key))
+        conn.execute(
+            "DELETE FROM idempotency_keys WHERE key IN "
+            "(SELECT key FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,))
+
+    def release(self, key: str) -> None:
+        """처리 실패 시 예약 해제 (같은 키로 다시 시도 가능)"""
+        self._conn().execute("DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL", (key,))
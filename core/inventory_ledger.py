@@ -0,0 +1,204 @@
+"""
+이벤트 소싱 재고 (입출고 로그 = 원본, config.INVENTORY_EVENT_SOURCED)
+- 재고 수량은 입출고 로그를 기록 순서대로 접은(fold) 결과
+    IN  : 수량 += Qty (없는 품목이면 새로 생성)
+    OUT : 수량 = max(수량 - Qty, 0) (없는 품목이면 무시)
+    SET : 수량 = Qty (재고 등록/수정 화면의 직접 입력)
+    DEL : 품목 삭제
+- 이벤트 N 개마다 그 시점 전체 수량을 체크포인트로 저장 → 마지막 체크포인트 이후 꼬리만 재생
+    inventory_checkpoints/ckpt_000000500.json
+- as_of 조회: 날짜 X 이하인 이벤트만 반영
+    체크포인트에는 그때까지의 최대 날짜(max_date)를 저장 → max_date <= X 인 것 중 가장 최근 것 + 짧은 재생
+- 체크포인트마다 마지막 이벤트의 지문을 저장 → 로그가 재작성되어 어긋나면 그 체크포인트부터 버림
+- 최초 사용 시 현재 재고 스냅샷을 기준(baseline) 체크포인트로 저장
+  (이 모드 이전의 직접 수정은 로그에 없으므로, 기준 시점 이전 날짜의 as_of 는 IN/OUT 로그만으로 계산한 근사값)
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from config import INVENTORY_COLUMNS, HISTORY_COLUMNS
+from core.inventory_store import to_float
+
+EVENT_TYPES = ("IN", "OUT", "SET", "DEL")
+_CKPT_RE = re.compile(r"ckpt_(\d+)\.json$")
+
+
+def _norm_date(value) -> str:
+    """'YYYY-MM-DD' 로 비교 (해석 불가 값은 '' → 항상 포함, max_date 에는 영향 없음)"""
+    text = str(value)[:10]
+    return text if text[:1].isdigit() else ""
+
+
+def _fingerprint(row) -> List[str]:
+    date_, branch, category, item, _unit, type_, qty = row
+    return [str(date_), str(branch), str(category), str(item), str(type_), f"{to_float(qty):.6g}"]
+
+
+def apply_event(state: Dict, date_: str, branch, category, item, unit, type_, qty) -> None:
+    """state[(Branch, Category, Item)] = [Unit, Qty, 마지막 변경일] 에 이벤트 1건 반영"""
+    key = (str(branch), str(category), str(item))
+    row = state.get(key)
+    type_ = str(type_).upper()
+    if type_ == "IN":
+        if row is None:
+            state[key] = [unit, qty, date_]
+        else:
+            row[1] += qty
+            row[2] = date_ or row[2]
+    elif type_ == "OUT":
+        if row is not None:
+            row[1] = max(row[1] - qty, 0.0)
+            row[2] = date_ or row[2]
+    elif type_ == "SET":
+        state[key] = [unit or (row[0] if row else ""), qty, date_]
+    elif type_ == "DEL":
+        state.pop(key, None)
+
+
+class InventoryLedger:
+    def __init__(self, root: str, every: int = 500):
+        """
+        Args:
+            root: 체크포인트 폴더
+            every: 이벤트 몇 개마다 체크포인트를 남길지
+        """
+        self.root = root
+        self.every = max(int(every), 1)
+
+    # ================= 체크포인트 파일 ==================
+    def _path(self, count: int) -> str:
+        return os.path.join(self.root, f"ckpt_{count:09d}.json")
+
+    def counts(self) -> List[int]:
+        """저장된 체크포인트의 이벤트 수 목록 (오름차순)"""
+        found = []
+        for path in glob.glob(os.path.join(glob.escape(self.root), "ckpt_*.json")):
+            m = _CKPT_RE.search(path)
+            if m:
+                found.append(int(m.group(1)))
+        return sorted(found)
+
+    def paths(self) -> List[str]:
+        return [self._path(c) for c in self.counts()]
+
+    def _read(self, count: int) -> Optional[dict]:
+        try:
+            with open(self._path(count), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, count: int, max_date: str, last, state: Dict, baseline: bool = False) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        data = {
+            "count": count,
+            "max_date": max_date,
+            "last": last,
+            "baseline": baseline,
+            "rows": [[b, c, i, u, q, d] for (b, c, i), (u, q, d) in state.items()],
+        }
+        tmp = f"{self._path(count)}.tmp.{os.getpid()}"   # 여러 프로세스가 같은 체크포인트를 동시에 써도 섞이지 않게
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self._path(count))
+
+    def _drop_from(self, count: int) -> None:
+        """count 이후(포함) 체크포인트 삭제 - 로그가 재작성되어 더 이상 맞지 않음"""
+        for c in self.counts():
+            if c >= count:
+                try:
+                    os.remove(self._path(c))
+                except OSError:
+                    pass
+
+    def reset(self) -> None:
+        """체크포인트 전체 삭제 - 다음 조회 때 현재 스냅샷으로 기준점을 다시 만듦"""
+        self._drop_from(0)
+
+    def has_checkpoints(self) -> bool:
+        return bool(self.counts())
+
+    # ================= 기준 / 접기 ==================
+    def bootstrap(self, events: pd.DataFrame, inventory: pd.DataFrame) -> None:
+        """현재 재고 스냅샷을 로그 끝 시점의 기준 체크포인트로 저장"""
+        state = {}
+        for row in inventory.reindex(columns=INVENTORY_COLUMNS).itertuples(index=False):
+            key = (str(row.Branch), str(row.Category), str(row.Item))
+            state.setdefault(key, [row.Unit if isinstance(row.Unit, str) else "",
+                                   to_float(row.CurrentQty), _norm_date(row.Date)])
+        count = len(events)
+        dates = [_norm_date(d) for d in events["Date"]] if count else []
+        last = _fingerprint(events[HISTORY_COLUMNS].iloc[count - 1]) if count else None
+        self._write(count, max(dates, default=""), last, state, baseline=True)
+
+    def state(self, events_from: Callable[[int], pd.DataFrame], total: int,
+              as_of: Optional[str] = None) -> Dict:
+        """
+        로그를 접은 재고 상태 - 고른 체크포인트 이후 이벤트만 읽음 (로그 전체를 읽지 않음).
+        events_from(start): 기록 순서 start 번째(0부터) 이후 이벤트 (HISTORY_COLUMNS)
+        total: 로그 전체 이벤트 수
+        as_of: 'YYYY-MM-DD' - 이 날짜 이하 이벤트만 반영
+        전체 접기(as_of=None) 중 every 배수 지점을 지나면 새 체크포인트 저장.
+        """
+        state, start, max_date, events = {}, 0, "", None
+        for count in reversed(self.counts()):
+            ckpt = self._read(count)
+            if ckpt is None or count > total:
+                self._drop_from(count)
+                continue
+            if as_of is not None and ckpt["max_date"] > as_of:
+                continue
+            # 체크포인트 직전 이벤트부터 읽어 지문 확인 (로그가 재작성됐으면 이 체크포인트부터 버림)
+            tail = events_from(max(count - 1, 0))[HISTORY_COLUMNS]
+            if count > 0:
+                if tail.empty or ckpt.get("last") != _fingerprint(tail.iloc[0]):
+                    self._drop_from(count)
+                    continue
+                tail = tail.iloc[1:]
+            state = {(b, c, i): [u, float(q), d] for b, c, i, u, q, d in ckpt["rows"]}
+            start, max_date, events = count, ckpt["max_date"], tail
+            break
+        if events is None:
+            events = events_from(0)[HISTORY_COLUMNS]
+
+        for pos, row in enumerate(events.itertuples(index=False, name=None), start + 1):
+            date_, branch, category, item, unit, type_, qty = row
+            date_ = _norm_date(date_)
+            if as_of is not None and date_ > as_of:
+                continue
+            apply_event(state, date_, branch, category, item,
+                        unit if isinstance(unit, str) else "", type_, to_float(qty))
+            max_date = max(max_date, date_)
+            if as_of is None and pos % self.every == 0:
+                self._write(pos, max_date, _fingerprint(row), state)
+        return state
+
+
+def to_frame(state: Dict, snapshot: pd.DataFrame) -> pd.DataFrame:
+    """
+    접은 수량 + 스냅샷의 속성(Unit, MinQty, Note, Date) → INVENTORY_COLUMNS 프레임.
+    스냅샷에 없는 품목(로그로만 생긴 품목)은 MinQty 0, Note "", Date = 마지막 변경일.
+    Date 는 스냅샷 날짜와 마지막 변경일 중 늦은 쪽 (판매 차감은 재고 파일을 다시 쓰지 않음).
+    """
+    attrs = {}
+    for row in snapshot.reindex(columns=INVENTORY_COLUMNS).to_dict("records"):
+        attrs.setdefault((str(row["Branch"]), str(row["Category"]), str(row["Item"])), row)
+
+    rows = []
+    for (branch, category, item), (unit, qty, last) in state.items():
+        a = attrs.get((branch, category, item))
+        rows.append({
+            "Branch": branch, "Item": item, "Category": category,
+            "Unit": a["Unit"] if a and isinstance(a["Unit"], str) and a["Unit"] else unit,
+            "CurrentQty": qty,
+            "MinQty": to_float(a["MinQty"]) if a else 0.0,
+            "Note": a["Note"] if a and isinstance(a["Note"], str) else "",
+            "Date": max(a["Date"], last) if a and isinstance(a["Date"], str) and a["Date"] else last,
+        })
+    return pd.DataFrame(rows, columns=INVENTORY_COLUMNS)
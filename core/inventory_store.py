@@ -0,0 +1,162 @@
+"""
+재고 테이블 (해시 인덱스)
+- (Branch, Category, Item) 키 → 행 을 dict 로 보관해 조회·수정이 O(1)
+- (Branch, Item) 보조 인덱스: 카테고리 없이 품목명으로 찾는 POS 차감용
+- 변경 후 flush() 한 번으로 설정된 저장 백엔드(save_inventory)에 반영
+  (변경된 지점 목록을 함께 넘겨 지점별 샤드 모드에서는 그 지점 파일만 기록)
+
+사용 예:
+    store = InventoryStore(load_inventory(), saver=save_inventory)
+    store.apply_delta("동탄", "채소", "양파", -1.5, floor=0)
+    store.flush()
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import INVENTORY_COLUMNS
+
+Key = Tuple[str, str, str]
+
+
+def _key(branch, category, item) -> Key:
+    return (str(branch), str(category), str(item))
+
+
+def to_float(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if pd.isna(value) else value
+
+
+class InventoryStore:
+    def __init__(self, df: Optional[pd.DataFrame] = None,
+                 saver: Optional[Callable[[pd.DataFrame], None]] = None):
+        """
+        Args:
+            df: load_inventory() 결과 (INVENTORY_COLUMNS)
+            saver: flush() 때 호출할 저장 함수 saver(df, branches=변경된 지점 목록, keys=변경된 키 목록)
+                   (core.logic.save_inventory 등)
+        """
+        self.saver = saver
+        self.dirty = False
+        self._changed = set()                          # 변경된 지점
+        self._changed_keys = set()                     # 변경·삭제된 (Branch, Category, Item)
+        self._rows: List[Optional[dict]] = []          # 원래 행 순서 유지 (삭제된 행은 None)
+        self._index: Dict[Key, int] = {}               # (Branch, Category, Item) → 행 위치
+        self._by_item: Dict[Tuple[str, str], int] = {}  # (Branch, Item) → 행 위치
+        if df is not None and not df.empty:
+            records = df.reindex(columns=INVENTORY_COLUMNS).to_dict("records")
+            for row in records:
+                self._add(row)
+
+    # ================= 내부 ==================
+    def _add(self, row: dict) -> dict:
+        pos = len(self._rows)
+        self._rows.append(row)
+        k = _key(row["Branch"], row["Category"], row["Item"])
+        # 같은 키가 중복된 파일이면 기존 mask[...].values[0] 처럼 첫 행을 대상으로 함
+        self._index.setdefault(k, pos)
+        self._by_item.setdefault((k[0], k[2]), pos)
+        return row
+
+    # ================= 조회 ==================
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key) -> bool:
+        return _key(*key) in self._index
+
+    def get(self, branch, category, item) -> Optional[dict]:
+        """행 dict 반환 (없으면 None). 반환된 dict 를 직접 수정하지 말고 upsert() 사용."""
+        pos = self._index.get(_key(branch, category, item))
+        return None if pos is None else self._rows[pos]
+
+    def find(self, branch, item) -> Optional[dict]:
+        """카테고리 없이 (지점, 품목명)으로 조회"""
+        pos = self._by_item.get((str(branch), str(item)))
+        return None if pos is None else self._rows[pos]
+
+    def current_qty(self, branch, category, item) -> float:
+        row = self.get(branch, category, item)
+        return to_float(row["CurrentQty"]) if row else 0.0
+
+    # ================= 변경 ==================
+    def upsert(self, branch, category, item, **fields) -> dict:
+        """
+        행이 있으면 fields 로 갱신, 없으면 새 행 추가.
+        새 행의 빠진 값은 기본값(CurrentQty/MinQty 0, 나머지 "")
+        """
+        row = self.get(branch, category, item)
+        if row is None:
+            row = {c: "" for c in INVENTORY_COLUMNS}
+            row.update({"Branch": branch, "Category": category, "Item": item,
+                        "CurrentQty": 0.0, "MinQty": 0})
+            row.update(fields)
+            self._add(row)
+        else:
+            row.update(fields)
+        self.dirty = True
+        self._changed.add(str(branch))
+        self._changed_keys.add(_key(branch, category, item))
+        return row
+
+    def apply_delta(self, branch, category, item, delta: float,
+                    floor: Optional[float] = None, create: Optional[dict] = None,
+                    **fields) -> Optional[dict]:
+        """
+        CurrentQty += delta (floor 지정 시 그 아래로 내려가지 않음).
+        키가 없으면 create(Unit/MinQty/Note/Date 등) 가 주어진 경우에만 새 행을 만들고 delta 를 초기 수량으로 사용.
+        fields: 함께 갱신할 값 (예: Date=today)
+        Returns: 변경된 행 (없고 create 도 없으면 None)
+        """
+        row = self.get(branch, category, item)
+        if row is None:
+            if create is None:
+                return None
+            return self.upsert(branch, category, item, CurrentQty=float(delta), **{**create, **fields})
+
+        new_qty = to_float(row["CurrentQty"]) + float(delta)
+        if floor is not None:
+            new_qty = max(new_qty, floor)
+        row["CurrentQty"] = new_qty
+        row.update(fields)
+        self.dirty = True
+        self._changed.add(str(branch))
+        self._changed_keys.add(_key(branch, category, item))
+        return row
+
+    def delete(self, branch, category, item) -> bool:
+        """키가 같은 행을 모두 삭제 (드문 작업이라 전체 재색인)"""
+        k = _key(branch, category, item)
+        if k not in self._index:
+            return False
+        rows = [r for r in self._rows
+                if r is not None and _key(r["Branch"], r["Category"], r["Item"]) != k]
+        self._rows, self._index, self._by_item = [], {}, {}
+        for row in rows:
+            self._add(row)
+        self.dirty = True
+        self._changed.add(k[0])
+        self._changed_keys.add(k)
+        return True
+
+    # ================= 저장 ==================
+    def to_frame(self) -> pd.DataFrame:
+        rows = [r for r in self._rows if r is not None]
+        return pd.DataFrame(rows, columns=INVENTORY_COLUMNS)
+
+    def flush(self) -> bool:
+        """변경이 있으면 saver 로 저장. Returns: 저장 여부"""
+        if not self.dirty:
+            return False
+        if self.saver is None:
+            raise RuntimeError("InventoryStore.flush(): saver 가 지정되지 않았습니다")
+        self.saver(self.to_frame(), branches=sorted(self._changed), keys=sorted(self._changed_keys))
+        self.dirty = False
+        self._changed.clear()
+        self._changed_keys.clear()
+        return True
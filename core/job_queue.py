@@ -0,0 +1,118 @@
+"""
+영구 작업 큐 (SQLite, WAL 모드) - POS 재고 차감 비동기 처리용
+- 요청을 jobs 테이블에 먼저 기록(커밋)한 뒤 바로 응답 → 결제 응답 시간이 재고 파일 크기와 무관
+- 작업자가 queued → running → done / failed 로 상태를 바꾸며 처리, 결과(JSON)를 같은 행에 저장
+- 서버가 처리 도중 종료돼도 시작 시 running 작업을 queued 로 되돌려 다시 처리 (recover)
+- 완료된 작업은 keep_days 이후 prune() 으로 삭제
+
+사용 예:
+    jobs = JobQueue(config.JOB_QUEUE_DB)
+    job_id = jobs.enqueue("deduct", {"branch": "동탄", "items": [...]})
+    job = jobs.claim(job_id)          # 작업자
+    jobs.complete(job_id, {...})
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    status     TEXT NOT NULL,            -- queued / running / done / failed
+    result     TEXT,
+    error      TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+class JobQueue:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()   # 스레드별 커넥션
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")   # 202 응답 전에 디스크 반영
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # ================= 등록 / 조회 ==================
+    def enqueue(self, kind: str, payload: dict) -> str:
+        """작업 기록 후 id 반환 (커밋 완료 후 반환되므로 이후 종료돼도 유실 없음)"""
+        job_id = uuid.uuid4().hex
+        now = _now()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def queued_ids(self) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid").fetchall()
+        return [r["id"] for r in rows]
+
+    # ================= 작업자 ==================
+    def claim(self, job_id: str) -> Optional[dict]:
+        """queued 작업을 running 으로 바꾸고 반환 (이미 처리 중/완료면 None)"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+            (_now(), job_id),
+        )
+        return self.get(job_id) if cur.rowcount else None
+
+    def complete(self, job_id: str, result: dict) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, updated_at = ? WHERE id = ?",
+            (json.dumps(result, ensure_ascii=False), _now(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error, _now(), job_id),
+        )
+
+    def recover(self) -> int:
+        """처리 도중 중단된(running) 작업을 queued 로 되돌림. Returns: 되돌린 수"""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (_now(),))
+        return cur.rowcount
+
+    def prune(self, keep_days: int = 7) -> int:
+        """keep_days 보다 오래된 완료·실패 작업 삭제. Returns: 삭제 수"""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat(timespec="milliseconds")
+        cur = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,))
+        return cur.rowcount
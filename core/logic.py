@@ -1,8 +1,13 @@
 import os
 import pandas as pd
+from contextlib import contextmanager
 from datetime import date, datetime
 import json
 
+import config
+from core import sqlite_store, history_log, history_partitions, inventory_ledger, write_behind, branch_shards, cost_model, demand_forecast, process_lock
+from core.inventory_store import InventoryStore, to_float
+
 # ================= Files (Absolute Paths for Persistence) ==================
 # Base Project Directory (Parent of 'core')
 BASE_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -12,26 +17,133 @@ DATA_DIR = os.path.join(BASE_PROJECT_DIR, "data")
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR, exist_ok=True)
 
-DATA_FILE = os.path.join(DATA_DIR, "inventory_data.csv")          # 재고 스냅샷
-HISTORY_FILE = os.path.join(DATA_DIR, "stock_history.csv")        # 입출고 로그
-ITEM_FILE = os.path.join(DATA_DIR, "food ingredients.txt")        # 원본 (백업용)
-INV_DB = os.path.join(DATA_DIR, "inventory_db.csv")             # 재고용 DB
-PUR_DB = os.path.join(DATA_DIR, "purchase_db.csv")              # 구매용 DB
-VENDOR_FILE = os.path.join(DATA_DIR, "vendor_mapping.csv")      # 구매처 매핑 DB
-ORDERS_FILE = os.path.join(DATA_DIR, "orders_db.csv")           # 발주(주문) 내역 DB
+# 운영 데이터(재고·로그·발주)는 app-en.py 와 같은 위치(config.BASE_DIR, Render 에서는 /data)를 사용
+DATA_FILE = config.DATA_FILE                                      # 재고 스냅샷
+HISTORY_FILE = config.HISTORY_FILE                                # 입출고 로그
+ITEM_FILE = config.ITEM_FILE                                      # 원본 (백업용)
+INV_DB = config.INV_DB                                            # 재고용 DB
+PUR_DB = config.PUR_DB                                            # 구매용 DB
+VENDOR_FILE = config.VENDOR_FILE                                  # 구매처 매핑 DB
+ORDERS_FILE = config.ORDERS_FILE                                  # 발주(주문) 내역 DB
+SQLITE_DB_FILE = config.SQLITE_DB_FILE                            # SQLite 백엔드 DB
 
 BRANCHES = ["동대문","굿모닝시티","양재","수원영통","동탄","영등포","룸비니"]
 
+# ================= CSV 읽기 (인코딩/구분자 감지 캐시) ==================
+_CSV_ENCODINGS = ['utf-8-sig', 'utf-16', 'cp949', 'latin-1']
+_CSV_DELIMITERS = ",\t;|"
+_SNIFF_SAMPLE_BYTES = 64 * 1024
+
+# (절대경로, mtime_ns, size) → (encoding, sep) : 파일이 바뀌지 않았으면 감지 생략
+_sniff_cache = {}
+# 절대경로 → 마지막으로 성공한 (encoding, sep) : 파일이 커져도(로그 추가 등) 먼저 시도
+_last_dialect = {}
+_SNIFF_CACHE_MAX = 512
+
+
 def robust_read_csv(file_path, **kwargs):
     """
     다양한 인코딩 및 형식을 지원하는 강건한 CSV 읽기 함수.
+
+    - 처음 읽는 파일은 앞부분(64KB)만으로 인코딩·구분자를 감지한 뒤 C 엔진으로 읽음
+    - 감지 결과는 (경로, mtime, size) 키로 캐시 → 같은 파일은 감지 없이 바로 C 엔진
+    - 파일이 바뀌어도 같은 경로의 직전 결과를 먼저 시도 (실패 시에만 다시 감지)
+    - dtype=... 을 넘기면 그대로 적용, 값이 맞지 않으면 dtype 없이 다시 읽음
     """
+    if not isinstance(file_path, (str, os.PathLike)):
+        # 업로드 파일 객체 등은 기존 방식 (구분자 자동 감지 + python 엔진)
+        return _legacy_read_csv(file_path, **kwargs)
     if not os.path.exists(file_path):
         return pd.DataFrame()
-        
-    encodings = ['utf-8-sig', 'utf-16', 'cp949', 'latin-1']
+
+    path = os.path.abspath(file_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return pd.DataFrame()
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    candidates = []
+    if key in _sniff_cache:
+        candidates.append(_sniff_cache[key])
+    elif path in _last_dialect:
+        candidates.append(_last_dialect[path])
+
+    for enc, sep in candidates:
+        df = _read_with_dialect(path, enc, sep, kwargs)
+        if df is not None:
+            _remember_dialect(key, enc, sep)
+            return df
+
+    for enc in _CSV_ENCODINGS:
+        sep = _sniff_delimiter(path, enc)
+        if sep is None:
+            continue   # 이 인코딩으로는 앞부분부터 해석 불가
+        df = _read_with_dialect(path, enc, sep, kwargs)
+        if df is not None:
+            _remember_dialect(key, enc, sep)
+            return df
+
+    # 모든 인코딩 실패 시 최후의 방법 (바이트 무시)
+    return _legacy_read_csv(path, **kwargs)
+
+
+def _remember_dialect(key, enc, sep):
+    if len(_sniff_cache) >= _SNIFF_CACHE_MAX:
+        _sniff_cache.clear()
+    _sniff_cache[key] = (enc, sep)
+    _last_dialect[key[0]] = (enc, sep)
+
+
+def _sniff_delimiter(path, enc):
+    """파일 앞부분을 enc 로 해석해 구분자 반환. 해석이 안 되면 None, 감지 실패 시 ','"""
+    import codecs
+    import csv
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read(_SNIFF_SAMPLE_BYTES)
+        # 샘플 끝에서 글자가 잘려도 오류가 나지 않도록 incremental decoder 사용
+        sample = codecs.getincrementaldecoder(enc)().decode(raw, final=False)
+    except (UnicodeDecodeError, UnicodeError, LookupError, OSError):
+        return None
+    if not sample.strip():
+        return ','
+    lines = sample.splitlines()
+    head = "\n".join(lines[:-1] if len(lines) > 1 else lines)
+    try:
+        return csv.Sniffer().sniff(head, delimiters=_CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def _read_with_dialect(path, enc, sep, kwargs):
+    """C 엔진으로 읽기. 인코딩이 맞지 않거나 읽기 실패 시 None"""
+    try:
+        return pd.read_csv(path, sep=sep, encoding=enc, engine='c', **kwargs)
+    except (UnicodeDecodeError, UnicodeError):
+        return None
+    except ValueError:
+        if 'dtype' not in kwargs:
+            return None
+        # 스키마 dtype 과 맞지 않는 값(예: 수량 칸의 문자)이 있으면 dtype 없이 다시 시도
+        retry = {k: v for k, v in kwargs.items() if k != 'dtype'}
+        try:
+            return pd.read_csv(path, sep=sep, encoding=enc, engine='c', **retry)
+        except Exception:
+            return None
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame()
+    except Exception:
+        return None
+
+
+def _legacy_read_csv(file_path, **kwargs):
+    """구분자 자동 감지(sep=None) + python 엔진으로 인코딩을 차례로 시도하는 기존 방식"""
+    encodings = _CSV_ENCODINGS
     for enc in encodings:
         try:
+            if hasattr(file_path, 'seek'):
+                file_path.seek(0)
             # sep=None, engine='python'은 구분자 자동 감지를 위해 사용
             df = pd.read_csv(file_path, sep=None, engine='python', encoding=enc, **kwargs)
             return df
@@ -43,7 +155,9 @@ def robust_read_csv(file_path, **kwargs):
             
     # 모든 인코딩 실패 시 최후의 방법 (바이트 무시)
     try:
-        return pd.read_csv(file_path, sep=None, engine='python', encoding='utf-8', errors='ignore', **kwargs)
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
+        return pd.read_csv(file_path, sep=None, engine='python', encoding='utf-8', encoding_errors='ignore', **kwargs)
     except:
         return pd.DataFrame()
 
@@ -143,47 +257,481 @@ def get_unit_for_item(file_path, category, item):
     return ""
 
 # ================= Data Load / Save ==================
-def load_inventory():
-    df = robust_read_csv(DATA_FILE)
-    expected = ["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
+# config.STORAGE_BACKEND 로 저장 방식 선택
+#   "csv"    : 기존 CSV 파일 (저장 시 파일 전체 재작성)
+#              단, config.HISTORY_APPEND_ONLY 이면 입출고 로그는 core/history_log.py 로 추가만 함
+#   "sqlite" : core/sqlite_store.py (WAL, 변경된 행만 기록)
+# config.SHARD_BY_BRANCH (CSV 백엔드): 지점별 폴더에 재고·로그를 나눠 저장 (core/branch_shards.py)
+_sqlite_migrated = False
+
+def _use_sqlite():
+    return config.STORAGE_BACKEND == "sqlite"
+
+def _sqlite_db():
+    """SQLite DB 경로 반환. 프로세스당 최초 1회, 비어 있는 테이블은 기존 CSV 에서 옮겨 담음."""
+    global _sqlite_migrated
+    if not _sqlite_migrated:
+        with _data_lock:   # 빈 테이블 확인 → 채우기 사이에 다른 프로세스가 끼어들지 않게
+            sqlite_store.import_frame(SQLITE_DB_FILE, "inventory", _read_expected(DATA_FILE, config.INVENTORY_COLUMNS, config.INVENTORY_DTYPES))
+            sqlite_store.import_frame(SQLITE_DB_FILE, "history", _load_csv_history())
+            sqlite_store.import_frame(SQLITE_DB_FILE, "orders", _read_expected(ORDERS_FILE, config.ORDERS_COLUMNS, config.ORDERS_DTYPES))
+        _sqlite_migrated = True
+    return SQLITE_DB_FILE
+
+def _history_log():
+    return history_log.get_log(HISTORY_FILE, config.HISTORY_COLUMNS,
+                               fsync_every=config.HISTORY_FSYNC_EVERY,
+                               fsync_interval=config.HISTORY_FSYNC_INTERVAL)
+
+def _writer():
+    return write_behind.get_writer(config.WRITE_BEHIND_DELAY)
+
+def _write_csv(df, file_path):
+    """CSV 전체 저장 - write-behind 큐 경유 (연속 저장 합침, 임시 파일 → os.replace)"""
+    _writer().submit(file_path, df, index=False, encoding="utf-8-sig")
+
+def flush_pending_writes():
+    """대기 중인 CSV 저장을 즉시 기록 (백업·복원 전 등)"""
+    _writer().flush()
+
+def _read_latest(file_path, **kwargs):
+    """아직 기록 대기 중인 저장이 있으면 그 내용, 없으면 파일"""
+    pending = _writer().pending(file_path)
+    if pending is not None:
+        return pending
+    return robust_read_csv(file_path, **kwargs)
+
+# ================= 프로세스 간 변경 직렬화 (core/process_lock.py) ==================
+# API 작업자(uvicorn --workers N)와 Streamlit 이 같은 파일을 바꾸므로 read-modify-write 는 모두 파일 잠금 안에서.
+# 가장 바깥 잠금을 놓기 전에 write-behind 저장을 파일에 반영 → 다음에 잠금을 잡는 프로세스가 최신 내용을 읽음
+# 그리고 공유 데이터 버전을 올림 → 프로세스별 캐시(판매 속도, Streamlit 조회 캐시 등)가 다시 읽음
+_data_lock = process_lock.ProcessLock(config.DATA_LOCK_FILE)
+_data_version = process_lock.DataVersion(config.DATA_VERSION_FILE)
+
+@contextmanager
+def data_mutation():
+    """
+    변경 구간 (재진입 가능). with data_mutation(): load → 수정 → save
+    함수 데코레이터로도 사용: @data_mutation()
+    """
+    with _data_lock:
+        try:
+            yield
+        finally:
+            if _data_lock.depth == 1:
+                flush_pending_writes()
+                _data_version.bump()
+
+def data_version():
+    """공유 데이터 버전 (어느 프로세스든 변경을 마칠 때마다 증가) - 캐시 키용"""
+    return _data_version.read()
+
+def _read_expected(file_path, expected, dtype=None):
+    """CSV 를 읽어 expected 컬럼 순서로 맞춤 (없는 컬럼은 빈 값)"""
+    return _ensure_columns(_read_latest(file_path, dtype=dtype), expected)
+
+def _read_history_file(file_path):
+    return robust_read_csv(file_path, dtype=config.HISTORY_DTYPES)
+
+def _ensure_columns(df, expected):
     if df.empty:
         return pd.DataFrame(columns=expected)
-    
+
     # 필요한 컬럼 보장
     for col in expected:
         if col not in df.columns:
             df[col] = ""
     return df[expected]
 
-def save_inventory(df):
-    df.to_csv(DATA_FILE, index=False, encoding="utf-8-sig")
+def to_typed_frame(df, categoricals, quantities):
+    """
+    조회 전용 타입 변환 (메모리 절약 / 탭마다 날짜 재파싱 방지)
+    - categoricals → category, quantities → float32, Date → datetime64 (파싱 1회)
+    저장용이 아님: save_* 에는 일반 프레임을 넘길 것
+    """
+    df = df.copy()
+    for col in categoricals:
+        if col in df.columns:
+            df[col] = df[col].fillna("").astype(str).astype("category")
+    for col in quantities:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    return df
 
-def load_history():
-    df = robust_read_csv(HISTORY_FILE)
-    expected = ["Date","Branch","Category","Item","Unit","Type","Qty"]
-    if df.empty:
-        return pd.DataFrame(columns=expected)
-        
-    for col in expected:
-        if col not in df.columns:
-            df[col] = ""
-    return df[expected]
+# ================= 지점별 샤드 ==================
+# 이벤트 소싱 모드는 로그 전체 순서가 필요하므로 샤드를 사용하지 않음 (SQLite 는 Branch 인덱스 사용)
+
+def branch_sharded():
+    return config.SHARD_BY_BRANCH and not _use_sqlite() and not config.INVENTORY_EVENT_SOURCED
+
+def _shards():
+    shards = branch_shards.BranchShards(config.BRANCH_SHARD_DIR)
+    if not shards.is_migrated():
+        with data_mutation():
+            if not shards.is_migrated():   # 잠금을 기다리는 동안 다른 프로세스가 나눴을 수 있음
+                _split_into_shards(shards)
+    return shards
+
+def _shard_log(shards, branch):
+    shards.ensure(branch)
+    return history_log.get_log(shards.history_base(branch), config.HISTORY_COLUMNS,
+                               fsync_every=config.HISTORY_FSYNC_EVERY,
+                               fsync_interval=config.HISTORY_FSYNC_INTERVAL)
+
+def _split_into_shards(shards):
+    """최초 1회: 기존 단일 재고·로그 파일을 지점별로 나눠 담음 (원본 파일은 그대로 둠)"""
+    if shards.branches():
+        # 샤드가 이미 있으면(백업 복원 등) 다시 나누지 않음
+        shards.mark_migrated()
+        return
+    inv = _read_expected(DATA_FILE, config.INVENTORY_COLUMNS, config.INVENTORY_DTYPES)
+    for name, part in inv.groupby(inv["Branch"].map(branch_shards.shard_name), sort=False):
+        shards.ensure(name)
+        write_behind.write_csv_atomic(shards.inventory_path(name), part, index=False, encoding="utf-8-sig")
+    hist = _load_csv_history()
+    for name, part in hist.groupby(hist["Branch"].map(branch_shards.shard_name), sort=False):
+        _shard_log(shards, name).rewrite(part)
+    shards.mark_migrated()
+
+def iter_inventory_shards(branches=None):
+    """
+    (지점, 재고 DataFrame) 을 지점 샤드마다 하나씩 - 전체 지점 화면은 필요할 때만 이어 붙임.
+    샤드 모드가 아니면 (None, 전체 재고) 한 번.
+    """
+    if not branch_sharded():
+        yield None, load_inventory()
+        return
+    shards = _shards()
+    names = [branch_shards.shard_name(b) for b in branches] if branches else shards.branches()
+    for name in names:
+        yield name, _read_expected(shards.inventory_path(name), config.INVENTORY_COLUMNS, config.INVENTORY_DTYPES)
+
+def _concat_shards(frames, columns):
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+def load_inventory(branch=None, typed=False):
+    """
+    재고 스냅샷 로드 (branch 지정 시 해당 지점 행만)
+    typed=True 면 to_typed_frame() 적용 (조회 전용)
+    """
+    if config.INVENTORY_EVENT_SOURCED:
+        df = _fold_inventory()
+        if branch:
+            df = df[df["Branch"] == branch].reset_index(drop=True)
+    elif branch_sharded():
+        df = _concat_shards([part for _, part in iter_inventory_shards([branch] if branch else None)],
+                            config.INVENTORY_COLUMNS)
+    elif _use_sqlite():
+        df = sqlite_store.load_inventory(_sqlite_db(), branch)
+    else:
+        df = _read_expected(DATA_FILE, config.INVENTORY_COLUMNS, config.INVENTORY_DTYPES)
+        if branch:
+            df = df[df["Branch"] == branch]
+    if typed:
+        df = to_typed_frame(df, config.INVENTORY_CATEGORICALS, ["CurrentQty", "MinQty"])
+    return df
+
+@data_mutation()
+def save_inventory(df, branches=None, keys=None):
+    """
+    재고 저장.
+    branches: 변경된 지점 목록 - 샤드 모드에서는 해당 지점 샤드만 기록 (None 이면 전체)
+              그 외 모드에서는 무시하고 df 전체를 저장하므로 df 는 항상 전체 재고여야 함
+    keys: 변경·삭제된 (Branch, Category, Item) 목록 - SQLite 는 그 행만 UPSERT/DELETE (None 이면 전체 비교)
+    """
+    if _use_sqlite():
+        sqlite_store.save_inventory(_sqlite_db(), df, keys=keys)
+        return
+    if branch_sharded():
+        shards = _shards()
+        names = df["Branch"].map(branch_shards.shard_name)
+        if branches is None:
+            targets = set(names) | set(shards.branches())   # df 에 없는 지점 샤드는 비움
+        else:
+            targets = {branch_shards.shard_name(b) for b in branches}
+        for name in targets:
+            shards.ensure(name)
+            _write_csv(df[names == name], shards.inventory_path(name))
+        return
+    _write_csv(df, DATA_FILE)
+
+def _load_inventory_snapshot():
+    """저장된 재고 파일/테이블 그대로 (이벤트 소싱 모드에서는 속성 + 마지막 저장 수량, 샤드 미사용)"""
+    if _use_sqlite():
+        return sqlite_store.load_inventory(_sqlite_db())
+    return _read_expected(DATA_FILE, config.INVENTORY_COLUMNS, config.INVENTORY_DTYPES)
+
+def load_inventory_store(branch=None):
+    """
+    (Branch, Category, Item) 해시 인덱스 재고 테이블. store.flush() 로 save_inventory 에 저장.
+    branch: 한 지점만 다루는 작업 - 샤드 모드에서는 그 지점 샤드만 로드 (그 외에는 전체)
+    """
+    scope = branch if branch and branch_sharded() else None
+    return InventoryStore(load_inventory(scope), saver=save_inventory)
+
+def load_history(typed=False, branch=None):
+    """
+    입출고 로그 로드 (branch 지정 시 해당 지점만 - 샤드 모드에서는 그 지점 파일만 읽음)
+    typed=True 면 to_typed_frame() 적용 (조회 전용)
+    """
+    if _use_sqlite():
+        df = sqlite_store.load_history(_sqlite_db(), branch=branch)
+    elif branch_sharded():
+        shards = _shards()
+        names = [branch_shards.shard_name(branch)] if branch else shards.branches()
+        df = _concat_shards([_shard_log(shards, name).load(_read_history_file) for name in names],
+                            config.HISTORY_COLUMNS)
+        df = _ensure_columns(df, config.HISTORY_COLUMNS)
+    else:
+        df = _load_csv_history()
+        if branch:
+            df = df[df["Branch"] == branch].reset_index(drop=True)
+    if typed:
+        df = to_typed_frame(df, config.HISTORY_CATEGORICALS, ["Qty"])
+    return df
+
+def load_history_tail(n=50, typed=False):
+    """
+    최근 n 개 로그만 로드 (Recent Stock Movements 용 - 전체 로그를 읽지 않음)
+    CSV 는 파일 끝에서 거꾸로 읽고, SQLite 는 기본키 역순 LIMIT 조회
+    """
+    if _use_sqlite():
+        df = sqlite_store.history_tail(_sqlite_db(), n)
+    elif branch_sharded():
+        # 지점마다 끝에서 n 행씩 읽어 날짜 순으로 합친 뒤 마지막 n 행
+        shards = _shards()
+        tails = [_shard_log(shards, name).tail(n, _read_history_file, dtype=config.HISTORY_DTYPES)
+                 for name in shards.branches()]
+        df = _concat_shards(tails, config.HISTORY_COLUMNS)
+        df = df.sort_values("Date", kind="stable").tail(n)
+    elif config.HISTORY_APPEND_ONLY:
+        df = _history_log().tail(n, _read_history_file, dtype=config.HISTORY_DTYPES)
+    else:
+        pending = _writer().pending(HISTORY_FILE)
+        df = pending.tail(n) if pending is not None else history_log.read_tail(HISTORY_FILE, n, dtype=config.HISTORY_DTYPES)
+        if df is None:
+            df = _read_history_file(HISTORY_FILE).tail(n)
+    df = _ensure_columns(df.reset_index(drop=True), config.HISTORY_COLUMNS)
+    if typed:
+        df = to_typed_frame(df, config.HISTORY_CATEGORICALS, ["Qty"])
+    return df
 
+def _load_csv_history():
+    if config.HISTORY_APPEND_ONLY:
+        # 레거시 stock_history.csv + 월별 세그먼트를 하나로
+        return _ensure_columns(_history_log().load(_read_history_file), config.HISTORY_COLUMNS)
+    return _read_expected(HISTORY_FILE, config.HISTORY_COLUMNS, config.HISTORY_DTYPES)
+
+@data_mutation()
 def save_history(df):
-    df.to_csv(HISTORY_FILE, index=False, encoding="utf-8-sig")
+    """
+    로그 전체 저장 (기존 호출 호환용).
+    새 행 기록은 append_history() 사용을 권장.
+    """
+    if _use_sqlite():
+        sqlite_store.save_history(_sqlite_db(), df)
+        return
+    if branch_sharded():
+        shards = _shards()
+        names = df["Branch"].map(branch_shards.shard_name)
+        for name in set(names) | set(shards.branches()):
+            _save_log(_shard_log(shards, name), df[names == name])
+        return
+    if config.HISTORY_APPEND_ONLY:
+        _save_log(_history_log(), df)
+        return
+    _write_csv(df, HISTORY_FILE)
+
+def _save_log(log, df):
+    count = log.row_count()
+    if len(df) >= count and _same_log_rows(log.load(_read_history_file), df.iloc[:count]):
+        # 저장된 로그 + 뒤에 추가한 행 (앞부분이 그대로) → 추가분만 기록
+        log.append(df.iloc[count:][config.HISTORY_COLUMNS].values.tolist())
+    else:
+        # 중간 행 수정/삭제·순서 변경 등 → 전체 재작성
+        log.rewrite(df)
+
+def _same_log_rows(stored, df):
+    """로그 행 비교 (Qty 는 숫자로, 빈 값은 '' 로, 나머지는 문자열로)"""
+    if len(stored) != len(df):
+        return False
+    def norm(frame):
+        frame = _ensure_columns(frame.reset_index(drop=True), config.HISTORY_COLUMNS)
+        out = frame.drop(columns="Qty").astype(object).fillna("").astype(str)
+        out["Qty"] = pd.to_numeric(frame["Qty"], errors="coerce").fillna(0.0).astype(float)
+        return out
+    return norm(stored).equals(norm(df))
+
+@data_mutation()
+def append_history(rows):
+    """
+    입출고 로그에 새 행만 추가.
+    rows: [[Date, Branch, Category, Item, Unit, Type, Qty], ...]
+    """
+    if not rows:
+        return
+    prev_signature = _history_signature() if _partitions_enabled() else None
+
+    if _use_sqlite():
+        sqlite_store.append_history(_sqlite_db(), rows)
+    elif branch_sharded():
+        shards = _shards()
+        by_shard = {}
+        for r in rows:
+            by_shard.setdefault(branch_shards.shard_name(r[1]), []).append(r)
+        for name, shard_rows in by_shard.items():
+            _shard_log(shards, name).append(shard_rows)
+    elif config.HISTORY_APPEND_ONLY:
+        _history_log().append(rows)
+    else:
+        hist_df = load_history()
+        new_df = pd.DataFrame([list(r) for r in rows], columns=config.HISTORY_COLUMNS)
+        save_history(pd.concat([hist_df, new_df], ignore_index=True))
+
+    if prev_signature is not None:
+        _append_partitions(prev_signature, rows)
+
+# ================= 이벤트 소싱 재고 (config.INVENTORY_EVENT_SOURCED) ==================
+# 재고 수량 = 입출고 로그를 접은 값 (core/inventory_ledger.py), 재고 파일은 MinQty/Note 등 속성 보관
+# 재고 파일 저장이 실패해도 로그에 남은 이벤트 기준으로 수량이 맞춰짐
+
+def _inventory_ledger():
+    return inventory_ledger.InventoryLedger(config.INVENTORY_CHECKPOINT_DIR,
+                                            config.INVENTORY_CHECKPOINT_EVERY)
+
+def _fold_inventory(as_of=None):
+    ledger = _inventory_ledger()
+    snapshot = _load_inventory_snapshot()
+    if not ledger.has_checkpoints():
+        # 최초 1회 (또는 로그 재작성 후): 현재 스냅샷을 기준점으로 (이때만 로그 전체를 읽음)
+        ledger.bootstrap(load_history(), snapshot)
+    total, events_from = _history_events()
+    return inventory_ledger.to_frame(ledger.state(events_from, total, as_of=as_of), snapshot)
+
+def _history_events():
+    """
+    (로그 이벤트 수, start → start 번째 이후 이벤트) - 체크포인트 이후 꼬리만 읽기용
+    SQLite: 기본키 범위 조회 / CSV(추가 전용): 파일 끝에서 거꾸로 읽음
+    """
+    if _use_sqlite():
+        db = _sqlite_db()
+        return sqlite_store.history_count(db), lambda start: sqlite_store.history_from(db, start)
+    if config.HISTORY_APPEND_ONLY:
+        log = _history_log()
+        total = log.row_count()
+        return total, lambda start: _ensure_columns(
+            log.tail(total - start, _read_history_file, dtype=config.HISTORY_DTYPES), config.HISTORY_COLUMNS)
+    events = _load_csv_history()   # 전체 재작성 방식 (레거시)
+    return len(events), lambda start: events.iloc[start:]
+
+@data_mutation()
+def reset_inventory_ledger():
+    """데이터 초기화 등 로그를 통째로 비운 뒤 호출 (빈 로그에서는 기준 체크포인트가 어긋남을 감지할 수 없음)"""
+    _inventory_ledger().reset()
+
+def load_inventory_as_of(as_of, branch=None):
+    """
+    as_of(날짜) 시점의 재고 - 체크포인트 조회 + 이후 이벤트 짧은 재생.
+    이벤트 소싱 모드에서만 지원 (아니면 ValueError)
+    """
+    if not config.INVENTORY_EVENT_SOURCED:
+        raise ValueError("as-of 재고 조회는 INVENTORY_EVENT_SOURCED 모드에서만 지원됩니다")
+    df = _fold_inventory(as_of=str(as_of)[:10])
+    if branch:
+        df = df[df["Branch"] == branch].reset_index(drop=True)
+    return df
+
+# ================= 분석용 기간 조회 (Usage Analysis / Monthly Report) ==================
+# CSV 백엔드 : core/history_partitions.py (연월×지점 Parquet) 에서 해당 월 파티션만 읽음
+# SQLite     : Date 인덱스 범위 조회
+# pyarrow 없음: 전체 로그 로드 후 필터 (기존 방식)
+
+def _partitions_enabled():
+    return (not _use_sqlite()) and config.ENABLE_HISTORY_PARTITIONS and history_partitions.AVAILABLE
+
+def _history_partitions():
+    return history_partitions.HistoryPartitions(config.HISTORY_PARTITION_DIR)
+
+def _history_signature():
+    """원본 로그 변경 감지 값 (파일 이름·크기 / SQLite 시퀀스)"""
+    if _use_sqlite():
+        return sqlite_store.history_signature(_sqlite_db())
+    if branch_sharded():
+        shards = _shards()
+        files = [f for name in shards.branches() for f in _shard_log(shards, name).files()]
+        return [[os.path.relpath(f, config.BRANCH_SHARD_DIR), os.path.getsize(f)] for f in files]
+    if not config.HISTORY_APPEND_ONLY:
+        _writer().flush(HISTORY_FILE)   # 시그니처는 실제 파일 기준
+    files = _history_log().files() if config.HISTORY_APPEND_ONLY else [HISTORY_FILE]
+    return [[os.path.basename(f), os.path.getsize(f)] for f in files if os.path.exists(f)]
+
+def _append_partitions(prev_signature, rows):
+    """원본에 추가한 행을 파티션에도 추가. 이미 어긋나 있으면 다음 조회 때 전체 재생성."""
+    try:
+        parts = _history_partitions()
+        if parts.signature() != prev_signature:
+            return
+        parts.append(pd.DataFrame([list(r) for r in rows], columns=config.HISTORY_COLUMNS))
+        parts.set_signature(_history_signature())
+    except Exception as e:
+        print(f"history 파티션 추가 오류 (다음 조회 때 재생성): {e}")
+
+def _ensure_partitions():
+    parts = _history_partitions()
+    signature = _history_signature()
+    if parts.signature() != signature:
+        parts.rebuild(load_history(), signature)
+    return parts
+
+def history_periods() -> list:
+    """로그가 있는 연월 목록 ['2026-09', '2026-10', ...]"""
+    if _use_sqlite():
+        return sqlite_store.history_periods(_sqlite_db())
+    if _partitions_enabled():
+        return _ensure_partitions().periods()
+    dates = pd.to_datetime(load_history()["Date"], errors="coerce").dropna()
+    return sorted(dates.dt.strftime("%Y-%m").unique().tolist())
+
+def load_history_period(year, month, branch=None, category=None, columns=None) -> pd.DataFrame:
+    """
+    한 달치 입출고 로그만 로드.
+    columns 미지정 시 HISTORY_COLUMNS + DateObj (datetime) 반환.
+    """
+    ym = f"{int(year):04d}-{int(month):02d}"
+    wanted = list(columns) if columns else config.HISTORY_COLUMNS + ["DateObj"]
+
+    if _partitions_enabled():
+        return _ensure_partitions().read([ym], branch=branch, category=category, columns=wanted)
+
+    if _use_sqlite():
+        df = sqlite_store.load_history(_sqlite_db(), branch=branch,
+                                       start_date=f"{ym}-01", end_date=f"{ym}-31")
+    else:
+        df = load_history(branch=branch)
+    df = df.copy()
+    df["DateObj"] = pd.to_datetime(df["Date"], errors="coerce")
+    df = df[df["DateObj"].dt.strftime("%Y-%m") == ym]
+    if category:
+        df = df[df["Category"] == category]
+    return df[wanted].reset_index(drop=True)
 
 def load_orders():
-    df = robust_read_csv(ORDERS_FILE)
-    expected = ["OrderId", "Date", "Branch", "Vendor", "Items", "Status", "CreatedDate"]
-    if df.empty:
-        return pd.DataFrame(columns=expected)
-    for col in expected:
-        if col not in df.columns:
-            df[col] = ""
-    return df[expected]
+    if _use_sqlite():
+        return sqlite_store.load_orders(_sqlite_db())
+    return _read_expected(ORDERS_FILE, config.ORDERS_COLUMNS, config.ORDERS_DTYPES)
 
-def save_orders(df):
-    df.to_csv(ORDERS_FILE, index=False, encoding="utf-8-sig")
+@data_mutation()
+def save_orders(df, keys=None):
+    """keys: 바뀐 OrderId 목록 - SQLite 는 그 행만 UPSERT/DELETE (None 이면 전체 비교)"""
+    if _use_sqlite():
+        sqlite_store.save_orders(_sqlite_db(), df, keys=keys)
+        return
+    _write_csv(df, ORDERS_FILE)
 
 # Helper to get purchase logic helpers
 def get_vendor_for_item(mapping, category, item):
@@ -228,6 +776,7 @@ def group_cart_by_vendor(cart_items, vendor_map):
         })
     return grouped
 
+@data_mutation()
 def confirm_receipt(order_id, confirmed_items_list):
     """
     Handles the confirmation of an order receipt.
@@ -238,9 +787,8 @@ def confirm_receipt(order_id, confirmed_items_list):
     confirmed_items_list: List of dicts [{'cat', 'item', 'qty', 'unit'}, ...] (Modified quantities)
     """
     try:
-        inv_df = load_inventory()
-        hist_df = load_history()
         orders_df = load_orders()
+        hist_rows = []
         
         # Get Order Info for History
         order_row = orders_df[orders_df["OrderId"] == order_id]
@@ -249,6 +797,7 @@ def confirm_receipt(order_id, confirmed_items_list):
         
         o_branch = order_row.iloc[0]["Branch"]
         today_str = str(date.today())
+        store = load_inventory_store(o_branch)
         
         # 1. Update Inventory & History
         for item_data in confirmed_items_list:
@@ -259,31 +808,20 @@ def confirm_receipt(order_id, confirmed_items_list):
             
             if qty > 0:
                 # History
-                hist_df.loc[len(hist_df)] = [
-                    today_str, o_branch, cat, i_name, unit, "IN", qty
-                ]
+                hist_rows.append([today_str, o_branch, cat, i_name, unit, "IN", qty])
                 
-                # Inventory
-                mask = (inv_df["Branch"] == o_branch) & (inv_df["Item"] == i_name) & (inv_df["Category"] == cat)
-                if mask.any():
-                    current_qty = float(inv_df.loc[mask, "CurrentQty"].values[0])
-                    inv_df.loc[mask, "CurrentQty"] = current_qty + qty
-                else:
-                    # New Item
-                    new_row = pd.DataFrame(
-                        [[o_branch, i_name, cat, unit, qty, 0, "", today_str]],
-                        columns=["Branch","Item","Category","Unit","CurrentQty","MinQty","Note","Date"]
-                    )
-                    inv_df = pd.concat([inv_df, new_row], ignore_index=True)
+                # Inventory (없는 품목이면 새로 등록)
+                store.apply_delta(o_branch, cat, i_name, qty,
+                                  create={"Unit": unit, "MinQty": 0, "Note": "", "Date": today_str})
         
         # 2. Update Order
         orders_df.loc[orders_df["OrderId"] == order_id, "Items"] = json.dumps(confirmed_items_list, ensure_ascii=False)
         orders_df.loc[orders_df["OrderId"] == order_id, "Status"] = "Completed"
         
         # 3. Save All
-        save_inventory(inv_df)
-        save_history(hist_df)
-        save_orders(orders_df)
+        append_history(hist_rows)   # 로그 먼저 (이벤트 소싱 모드에서는 로그가 원본)
+        store.flush()
+        save_orders(orders_df, keys=[order_id])
         
         return True, "Inventory Updated Successfully"
         
@@ -297,89 +835,308 @@ RECIPE_DB_FILE       = os.path.join(DATA_DIR, "recipe_db.csv")
 INGREDIENT_MAP_FILE  = os.path.join(DATA_DIR, "ingredient_mapping_final.csv")
 PRICE_DB_FILE        = os.path.join(DATA_DIR, "ingredient_price_db.csv")
 PREP_PRICE_FILE      = os.path.join(DATA_DIR, "prep_price_db.csv")
-SALES_LOG_FILE       = os.path.join(DATA_DIR, "sales_log.csv")
+PREP_RECIPE_FILE     = os.path.join(DATA_DIR, "prep_recipe_db.csv")   # 프렙 → 원재료 배합표
+PRICE_HISTORY_FILE   = config.PRICE_HISTORY_FILE   # 적용일별 g당 단가 이력 (운영 데이터 - BASE_DIR)
+APPLIED_PRICE_FILE   = config.APPLIED_PRICE_FILE   # 적용일이 된 품목별 최신 단가 (원가 모델이 원가DB 위에 덮어 읽음)
+PRICE_HISTORY_COLUMNS = ['EffectiveDate', 'Item', 'PricePerG']
+SALES_LOG_FILE       = config.SALES_LOG_FILE
 
 
-def _load_integration_tables():
-    """레시피·매핑·단가 테이블을 메모리에 로드해 dict 반환."""
-    recipe_db   = robust_read_csv(RECIPE_DB_FILE)
-    mapping_df  = robust_read_csv(INGREDIENT_MAP_FILE)
-    price_db    = robust_read_csv(PRICE_DB_FILE)
-    prep_db     = robust_read_csv(PREP_PRICE_FILE)
+# 원본 파일을 컴파일한 원가 모델 (core/cost_model.py) - 파일이 바뀔 때만 다시 읽음
+_cost_model = cost_model.CompiledCostModel(
+    [RECIPE_DB_FILE, INGREDIENT_MAP_FILE, PRICE_DB_FILE, PREP_PRICE_FILE, PREP_RECIPE_FILE, APPLIED_PRICE_FILE],
+    robust_read_csv,
+    check_interval=config.RECIPE_MODEL_CHECK_INTERVAL,
+    artifact=config.COST_MODEL_ARTIFACT,
+)
 
-    mapping = {}
-    if not mapping_df.empty:
-        for _, r in mapping_df.iterrows():
-            cost_name = str(r.get('원가DB_재료명', ''))
-            cost_name = '' if cost_name in ('nan', 'NaN', 'None') else cost_name.strip()
-            mapping[str(r['레시피북_재료명']).strip()] = {
-                'cost_name': cost_name,
-                'type': str(r.get('타입', 'ingredient')).strip()
-            }
 
-    price_dict = {}
-    if not price_db.empty:
-        for _, r in price_db.iterrows():
-            price_dict[str(r['Item']).strip()] = float(r.get('PricePerG', 0) or 0)
+def get_cost_model():
+    """현재 원가 모델 (메뉴별 재료·단가 목록이 미리 계산된 CostModel)"""
+    return _cost_model.get()
+
 
-    prep_dict = {}
-    if not prep_db.empty:
-        for _, r in prep_db.iterrows():
-            prep_dict[str(r['prep_name']).strip()] = float(r.get('price_per_g', 0) or 0)
+def get_recipe_version() -> str:
+    """레시피·매핑·단가·프렙 원본 파일 내용 해시 - 파일이 바뀌면 달라짐 (응답 캐시·ETag 키)"""
+    return get_cost_model().version
 
-    return recipe_db, mapping, price_dict, prep_dict
+
+def build_cost_model_artifact() -> str:
+    """
+    원가 모델 아티팩트를 미리 만들어 둠 (배포 후 서버 시작 전 1회 - start.sh).
+    원본이 그대로면 기존 아티팩트를 그대로 사용. Returns: 원본 내용 해시
+    """
+    apply_due_prices()   # 예약된 단가 중 적용일이 된 것 반영
+    _cost_model.invalidate()
+    return _cost_model.get().version
 
 
 def get_menu_cost_breakdown(menu_name: str, servings: int = 1) -> tuple:
     """
     메뉴명 + 인분수 → 원가 상세 내역 반환.
+    (컴파일된 원가 모델 사용 - 호출마다 파일을 읽지 않음)
 
     Returns:
         (items: list[dict], total_cost: float)
         items 각 항목: ingredient / mapped / qty_g / price_per_g / cost / type
         실패 시: (None, 에러메시지)
     """
-    recipe_db, mapping, price_dict, prep_dict = _load_integration_tables()
-    if recipe_db.empty:
-        return None, "recipe_db.csv 파일을 찾을 수 없습니다"
+    return get_cost_model().breakdown(menu_name, servings)
 
-    menu_df = recipe_db[recipe_db['menu'] == menu_name]
-    if menu_df.empty:
-        return None, f"'{menu_name}' 메뉴를 레시피북에서 찾을 수 없습니다"
 
-    items, total_cost = [], 0.0
-    for _, row in menu_df.iterrows():
-        ing  = str(row['ingredient']).strip()
-        qty  = float(row['qty_per_serving_g']) * servings
+def get_all_menu_costs(servings: int = 1) -> pd.DataFrame:
+    """
+    전체 메뉴 원가표 (한 번의 벡터 연산).
+    Returns: menu / cost / ingredients / unpriced (단가 0 인 재료 수 - 단가 누락 점검용)
+    """
+    return get_cost_model().menu_costs(servings)
 
-        info      = mapping.get(ing, {'cost_name': ing, 'type': 'ingredient'})
-        cost_name = info['cost_name']
-        ing_type  = info['type']
 
-        if ing_type == 'skip':
-            continue
+def get_average_sale_prices(branch: str = None) -> dict:
+    """sales_log 기준 메뉴별 1인분 평균 판매가 (판매가가 입력된 기록만)"""
+    df = get_sales_summary(branch=branch)
+    if df.empty:
+        return {}
+    price = pd.to_numeric(df['SalePrice'], errors='coerce')
+    servings = pd.to_numeric(df['Servings'], errors='coerce')
+    valid = (price > 0) & (servings > 0)
+    per_serving = (price[valid] / servings[valid]).groupby(df.loc[valid, 'Menu']).mean()
+    return per_serving.round(1).to_dict()
+
+
+def simulate_menu_prices(scenarios: list, sale_prices: dict = None, servings: int = 1) -> tuple:
+    """
+    식재료 단가 변동 시 전 메뉴 원가·마진 (메뉴 × 재료 행렬 × 시나리오 단가 행렬, 한 번에 계산).
+
+    Args:
+        scenarios: [{"name": 선택, "prices": {재료: 새 g당 단가}, "pct": {재료: 변동률 %}}, ...]
+        sale_prices: {메뉴: 1인분 판매가} - 없는 메뉴는 sales_log 평균 판매가 사용
+        servings: 인분 수
+    Returns:
+        (DataFrame, unknown)
+        DataFrame 컬럼: scenario / menu / base_cost / cost / delta / sale_price / margin / margin_rate
+                      (판매가를 모르는 메뉴는 sale_price·margin·margin_rate 가 NaN)
+        unknown: 원가 행렬에 없는 재료명 (무시됨)
+    """
+    model = get_cost_model()
+    base, costs, unknown = model.simulate(scenarios, servings)
+    prices = {**get_average_sale_prices(), **(sale_prices or {})}
+    sale = pd.Series(model.menu_names).map(prices).astype(float).to_numpy() * servings
+
+    frames = []
+    for k, scenario in enumerate(scenarios):
+        margin = sale - costs[:, k]
+        frames.append(pd.DataFrame({
+            "scenario": scenario.get("name") or f"시나리오 {k + 1}",
+            "menu": model.menu_names,
+            "base_cost": base.round(1),
+            "cost": costs[:, k].round(1),
+            "delta": (costs[:, k] - base).round(1),
+            "sale_price": sale,
+            "margin": margin.round(1),
+            "margin_rate": (margin / sale * 100).round(1),
+        }))
+    columns = ["scenario", "menu", "base_cost", "cost", "delta", "sale_price", "margin", "margin_rate"]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    return df, unknown
+
+
+def get_simulation_items() -> pd.DataFrame:
+    """시뮬레이션 가능한 재료와 현재 g당 단가 (item / price_per_g)"""
+    m = get_cost_model().matrix()
+    return pd.DataFrame({"item": m.items, "price_per_g": m.prices})
+
+
+def get_ingredient_menus(item: str) -> pd.DataFrame:
+    """재료 → 사용 메뉴 (역색인 조회). Returns: menu / grams_per_serving (g 내림차순)"""
+    return pd.DataFrame(get_cost_model().menus_using(item), columns=["menu", "grams_per_serving"])
+
+
+# 지점·메뉴별 하루 평균 판매 인분 - 데이터가 바뀔 때만 다시 집계 (공유 데이터 버전 - 다른 작업자의 판매도 반영)
+_sales_rate_cache = {"key": None, "rates": None}
+
+
+def _sales_rates(window_days: int) -> pd.DataFrame:
+    """최근 window_days 일 지점·메뉴별 하루 평균 판매 인분 (Branch / Menu / per_day)"""
+    key = (data_version(), window_days, str(date.today()))
+    if _sales_rate_cache["key"] == key:
+        return _sales_rate_cache["rates"]
+
+    df = get_sales_summary()
+    rates = pd.DataFrame(columns=["Branch", "Menu", "per_day"])
+    if not df.empty:
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        start = pd.Timestamp(date.today()) - pd.Timedelta(days=window_days - 1)
+        recent = df[dates >= start].assign(Servings=pd.to_numeric(df['Servings'], errors='coerce').fillna(0))
+        if not recent.empty:
+            # 기록이 window 보다 짧으면 첫 판매일부터의 일수로 나눔
+            days = min(window_days, (pd.Timestamp(date.today()) - dates[dates >= start].min()).days + 1)
+            rates = recent.groupby(['Branch', 'Menu'], as_index=False)['Servings'].sum()
+            rates['per_day'] = rates.pop('Servings') / max(days, 1)
+    _sales_rate_cache.update(key=key, rates=rates)
+    return rates
+
+
+def get_ingredient_consumption(item: str, window_days: int = 28) -> pd.DataFrame:
+    """
+    재료의 지점별 예상 하루 사용량 = Σ(메뉴 하루 평균 판매 인분 × 1인분 g).
+    판매 속도는 sales_log 를 집계해 둔 값, 메뉴별 g 은 역색인 사용 (요청마다 파일 전체를 훑지 않음).
+    Returns: Branch / grams_per_day (판매 기록이 없으면 빈 DataFrame)
+    """
+    menus = get_ingredient_menus(item)
+    rates = _sales_rates(window_days)
+    if menus.empty or rates.empty:
+        return pd.DataFrame(columns=["Branch", "grams_per_day"])
+    joined = rates.merge(menus, left_on="Menu", right_on="menu")
+    joined["grams_per_day"] = joined["per_day"] * joined["grams_per_serving"]
+    out = joined.groupby("Branch", as_index=False)["grams_per_day"].sum()
+    out["grams_per_day"] = out["grams_per_day"].round(1)
+    return out.sort_values("grams_per_day", ascending=False, ignore_index=True)
+
+
+def forecast_ingredient_demand(days: int = 7, branch: str = None, history_days: int = 56) -> pd.DataFrame:
+    """
+    내일부터 days 일 지점별 원재료 예상 사용량 (core/demand_forecast.py).
+    최근 history_days 일 판매 로그를 (지점, 메뉴) 시계열로 지수평활 → 레시피 g 행렬 곱.
+    Returns: Branch / Item / forecast_g / per_day_g (+ 현재고 CurrentQty / Unit, 재고DB 에 있는 품목만)
+    """
+    model = get_cost_model()
+    items, grams = model.usage_matrix()
+    sales = get_sales_summary(branch=branch)
+    if sales.empty:
+        return pd.DataFrame(columns=["Branch", "Item", "forecast_g", "per_day_g", "CurrentQty", "Unit"])
+    out = demand_forecast.ingredient_demand(sales, model.menu_names, items, grams,
+                                            horizon=days, history_days=history_days)
+    inv = load_inventory(branch)[['Branch', 'Item', 'CurrentQty', 'Unit']].drop_duplicates(['Branch', 'Item'])
+    return out.merge(inv, on=['Branch', 'Item'], how='left')
+
+
+# ================= 단가 이력 / 과거 원가 재계산 ==================
+
+def load_price_history() -> pd.DataFrame:
+    """
+    적용일별 g당 단가 이력 (EffectiveDate / Item / PricePerG).
+    Item 은 원가DB 재료명 또는 프렙명. 한 품목의 단가는 다음 적용일 전까지 유효.
+    """
+    return _read_expected(PRICE_HISTORY_FILE, PRICE_HISTORY_COLUMNS)
 
-        if ing_type == 'zero' or not cost_name:
-            items.append({'ingredient': ing, 'mapped': cost_name or '-',
-                          'qty_g': qty, 'price_per_g': 0, 'cost': 0, 'type': 'zero'})
-            continue
 
-        price = prep_dict.get(cost_name, 0) if ing_type == 'prep' else price_dict.get(cost_name, 0)
-        cost  = round(qty * price, 1)
-        total_cost += cost
-        items.append({'ingredient': ing, 'mapped': cost_name,
-                      'qty_g': qty, 'price_per_g': price, 'cost': cost, 'type': ing_type})
+@data_mutation()
+def add_price_version(item: str, price_per_g: float, effective_date: str = None) -> None:
+    """
+    item 의 새 단가를 effective_date(기본 오늘)부터 적용.
+    이력이 없는 품목이면 현재 원가DB 단가를 1900-01-01 적용분으로 먼저 남겨
+    이후 원가DB 를 고쳐도 그 이전 판매의 원가가 바뀌지 않게 함.
+    effective_date 가 오늘 이전이면 적용 단가표도 바로 갱신 (새 판매 원가에 반영)
+    """
+    item = str(item).strip()
+    effective_date = str(effective_date or date.today())[:10]
+    history = load_price_history()
+    rows = []
+    if not (history['Item'].astype(str).str.strip() == item).any():
+        current = get_cost_model().lines
+        current = current[current['mapped'] == item]
+        if not current.empty:
+            rows.append(['1900-01-01', item, float(current['price_per_g'].iloc[0])])
+    rows.append([effective_date, item, float(price_per_g)])
+    new_rows = pd.DataFrame(rows, columns=PRICE_HISTORY_COLUMNS)
+    history = new_rows if history.empty else pd.concat([history, new_rows], ignore_index=True)
+    _write_csv(history.sort_values(['Item', 'EffectiveDate'], kind='stable'), PRICE_HISTORY_FILE)
+    if effective_date <= str(date.today()):
+        apply_due_prices()
+
+
+@data_mutation()
+def apply_due_prices(as_of: str = None) -> int:
+    """
+    단가 이력에서 as_of(기본 오늘)까지 적용된 품목별 최신 단가를 적용 단가표(APPLIED_PRICE_FILE)에 기록.
+    원가 모델이 원가DB(재료 / 프렙) 위에 덮어 읽음 - 저장소의 원가DB 파일(data/)은 고치지 않음.
+    미래 적용분은 그날 이후 호출(서버 시작 시 build_cost_model_artifact 등)에서 반영.
+    Returns: 적용 단가(또는 적용일)가 바뀐 품목 수
+    """
+    as_of = str(as_of or date.today())[:10]
+    history = load_price_history()
+    history = history[history['EffectiveDate'].astype(str).str[:10] <= as_of]
+    due = (history.assign(Item=history['Item'].astype(str).str.strip(),
+                          EffectiveDate=history['EffectiveDate'].astype(str).str[:10],
+                          PricePerG=pd.to_numeric(history['PricePerG'], errors='coerce'))
+           .dropna(subset=['PricePerG'])
+           .sort_values('EffectiveDate', kind='stable')
+           .drop_duplicates('Item', keep='last')
+           .sort_values('Item')[['Item', 'PricePerG', 'EffectiveDate']]
+           .reset_index(drop=True))
+
+    applied = _read_expected(APPLIED_PRICE_FILE, ['Item', 'PricePerG', 'EffectiveDate'])
+    old = dict(zip(applied['Item'].astype(str).str.strip(),
+                   zip(pd.to_numeric(applied['PricePerG'], errors='coerce'), applied['EffectiveDate'].astype(str))))
+    new = dict(zip(due['Item'], zip(due['PricePerG'], due['EffectiveDate'])))
+    changed = sum(1 for name in set(old) | set(new)
+                  if name not in old or name not in new
+                  or not abs(old[name][0] - new[name][0]) < 1e-9 or old[name][1] != new[name][1])
+    if changed:
+        # 원가 모델은 파일을 직접 읽으므로 write-behind 없이 바로 교체
+        write_behind.write_csv_atomic(APPLIED_PRICE_FILE, due, index=False, encoding='utf-8-sig')
+        _cost_model.invalidate()
+    return changed
+
+
+def recost_sales(start_date: str = None, end_date: str = None, branch: str = None) -> pd.DataFrame:
+    """
+    기간 내 판매 기록의 식재료 원가를 판매일 당시 단가로 다시 계산 (벡터 연산 한 번).
+      1. 판매 행 × 메뉴 재료 행 으로 펼침 (컴파일된 원가 모델의 재료 행)
+      2. (재료, 판매일) 기준 merge_asof - 판매일 이전 가장 최근 적용 단가
+         이력이 없는 품목·날짜는 현재 원가DB 단가
+      3. 재료별 반올림 후 판매 건별 합계
+    레시피(1인분 g)는 현재 레시피북 기준.
+    Returns: sales_log 컬럼 + RecostFoodCost / CostDiff (RecostFoodCost - FoodCost) / RecostMargin
+    """
+    sales = get_sales_summary(branch, start_date, end_date)
+    if sales.empty:
+        return pd.DataFrame()
+    sales = sales.reset_index(drop=True)
+    lines = get_cost_model().lines
+    lines = lines[lines['type'] != 'zero'][['menu', 'mapped', 'grams', 'price_per_g']]
+
+    expanded = pd.DataFrame({
+        'sale': sales.index,
+        'Menu': sales['Menu'],
+        'Servings': pd.to_numeric(sales['Servings'], errors='coerce').fillna(0),
+        'at': pd.to_datetime(sales['Date'].astype(str).str[:10], errors='coerce'),
+    }).merge(lines, left_on='Menu', right_on='menu')
+    expanded['price'] = expanded['price_per_g']
+
+    history = load_price_history()
+    history = pd.DataFrame({
+        'at': pd.to_datetime(history['EffectiveDate'].astype(str).str[:10], errors='coerce'),
+        'mapped': history['Item'].astype(str).str.strip(),
+        'hist_price': pd.to_numeric(history['PricePerG'], errors='coerce'),
+    }).dropna()
+    dated = expanded['at'].notna()
+    if not history.empty and dated.any():
+        left = expanded[dated].sort_values('at', kind='stable')
+        joined = pd.merge_asof(left, history.sort_values('at', kind='stable'),
+                               on='at', by='mapped', direction='backward')
+        # merge_asof 결과는 left 의 순서를 유지하지만 인덱스는 새로 매겨지므로 left 인덱스로 대입
+        expanded.loc[left.index, 'price'] = joined['hist_price'].fillna(joined['price_per_g']).to_numpy()
 
-    return items, round(total_cost, 1)
+    expanded['cost'] = (expanded['grams'] * expanded['Servings'] * expanded['price']).round(1)
+    recost = expanded.groupby('sale')['cost'].sum().reindex(sales.index, fill_value=0.0).round(1)
 
+    out = sales.copy()
+    out['RecostFoodCost'] = recost
+    out['CostDiff'] = (recost - pd.to_numeric(out['FoodCost'], errors='coerce').fillna(0)).round(1)
+    out['RecostMargin'] = (pd.to_numeric(out['SalePrice'], errors='coerce').fillna(0) - recost).round(1)
+    return out
 
+
+@data_mutation()
 def deduct_by_menu(menu_name: str, servings: int, branch: str,
                    sale_price: float = 0) -> tuple:
     """
     메뉴 판매 시 재고 차감 + 매출·원가 기록.
 
     1. 레시피 조회 → 인분수 × 사용량 계산
-    2. 재고 OUT 기록 (ingredient 타입만, 재고DB에 등록된 품목만)
+    2. 재고 OUT 기록 (원재료 + 프렙 배합표로 펼친 원재료, 재고DB에 등록된 품목만)
     3. 최소 수량 미달 품목 알림 목록 반환
     4. sales_log.csv 에 판매·원가 기록
 
@@ -391,44 +1148,37 @@ def deduct_by_menu(menu_name: str, servings: int, branch: str,
     if items is None:
         return False, total_cost, []
 
-    inv_df   = load_inventory()
-    hist_df  = load_history()
-    today    = str(date.today())
-    alerts   = []
-
-    for item in items:
-        if item['type'] not in ('ingredient',):   # zero/prep/skip 은 재고 차감 안 함
-            continue
-        i_name = item['mapped']
-        qty    = item['qty_g']
+    store     = load_inventory_store(branch)
+    hist_rows = []
+    today     = str(date.today())
+    alerts    = []
 
-        # 재고 DB에서 해당 지점·품목 찾기
-        mask = (inv_df['Branch'] == branch) & (inv_df['Item'] == i_name)
-        if not mask.any():
+    # 원재료 사용량 (프렙은 배합표로 펼친 원재료, zero/skip 은 제외)
+    for i_name, qty in get_cost_model().consumption(menu_name, servings):
+        # 재고 DB에서 해당 지점·품목 찾기 (해시 인덱스)
+        row = store.find(branch, i_name)
+        if row is None:
             continue   # 등록되지 않은 품목은 스킵
 
-        cur_qty = float(inv_df.loc[mask, 'CurrentQty'].values[0])
-        min_qty = float(inv_df.loc[mask, 'MinQty'].values[0]) if inv_df.loc[mask, 'MinQty'].values[0] else 0
-        new_qty = max(cur_qty - qty, 0)
-
-        inv_df.loc[mask, 'CurrentQty'] = new_qty
-        inv_df.loc[mask, 'Date'] = today
+        cat  = row['Category']
+        unit = row['Unit']
+        row  = store.apply_delta(branch, cat, i_name, -qty, floor=0, Date=today)
+        new_qty = row['CurrentQty']
+        min_qty = to_float(row['MinQty'])
 
         # 최소 수량 미달 체크
         if new_qty <= min_qty:
-            unit = inv_df.loc[mask, 'Unit'].values[0]
             alerts.append(f"{i_name} ({new_qty:.0f}{unit} / 최소 {min_qty:.0f}{unit})")
 
         # 입출고 기록
-        cat  = inv_df.loc[mask, 'Category'].values[0]
-        unit = inv_df.loc[mask, 'Unit'].values[0]
-        hist_df.loc[len(hist_df)] = [today, branch, cat, i_name, unit, 'OUT', qty]
+        hist_rows.append([today, branch, cat, i_name, unit, 'OUT', qty])
 
     # 판매 로그 저장
     _append_sales_log(menu_name, servings, branch, sale_price, total_cost, today)
 
-    save_inventory(inv_df)
-    save_history(hist_df)
+    # 로그 먼저 (이벤트 소싱 모드에서는 로그가 원본)
+    append_history(hist_rows)
+    _save_deducted(store)
 
     msg = (f"{menu_name} {servings}인분 판매 처리 완료 | "
            f"식재료 원가 {total_cost:,.0f}원"
@@ -436,21 +1186,137 @@ def deduct_by_menu(menu_name: str, servings: int, branch: str,
     return True, msg, alerts
 
 
+class DeductWriteError(RuntimeError):
+    """deduct_by_menus 의 기록 단계(입출고 로그·재고·sales_log) 실패 - 일부가 이미 반영됐을 수 있음"""
+
+
+@data_mutation()
+def deduct_by_menus(sales: list, branch: str, ref: str = None) -> tuple:
+    """
+    여러 메뉴 판매를 한 번에 처리 (POS 영수증 1건 = 요청 1건).
+    deduct_by_menu 를 메뉴 수만큼 부르는 대신
+      1. 모든 메뉴를 재료별 차감량으로 펼쳐 (지점, 품목, 판매일)별로 합산
+      2. 재고를 한 번 읽고 → 합산량만큼 차감 → 한 번 저장
+      3. 입출고 기록 / sales_log 도 각각 한 번만 추가
+    0 아래로 내려가지 않는 차감이므로 합산 후 한 번 빼도 메뉴별로 차례로 뺀 결과와 같음.
+
+    Args:
+        sales: [(menu_name, servings[, sale_price[, branch[, sale_date[, ref]]]]), ...]
+               branch 가 있는 판매는 그 지점에서 차감 (여러 지점 판매를 한 번에 처리 - 일괄 수신용)
+               sale_date('YYYY-MM-DD', 기본 오늘)는 입출고 기록·sales_log 의 날짜
+               ref 가 있는 판매는 그 값을 sales_log 의 Ref 로 기록 (없으면 아래 ref)
+        branch: 기본 지점명
+        ref: 이 차감을 가리키는 참조 (예: 작업 id) - sales_log 의 Ref 컬럼에 기록, applied_sale_refs() 로 반영 여부 확인
+    Returns:
+        (processed: list[str], errors: list[str], alerts: list[str])
+        processed: 처리된 메뉴명 / errors: "메뉴명: 사유" / alerts: 재고 부족 품목 (여러 지점이면 "[지점] " 접두)
+    Raises:
+        DeductWriteError: 기록을 시작한 뒤 실패 (그 전의 실패 - 원가 모델·재고 읽기 등 - 는 원래 예외 그대로, 반영된 것 없음)
+    """
+    today  = str(date.today())
+    totals = {}          # (지점, 원가DB 품목명, 판매일) → 합산 차감량 (g)
+    processed, errors, sales_rows = [], [], []
+
+    model = get_cost_model()
+    for sale in sales:
+        menu_name, servings = sale[0], sale[1]
+        sale_price = sale[2] if len(sale) > 2 else 0
+        sale_branch = sale[3] if len(sale) > 3 and sale[3] else branch
+        sale_date = sale[4] if len(sale) > 4 and sale[4] else today
+        sale_ref = sale[5] if len(sale) > 5 and sale[5] else ref
+        items, total_cost = model.breakdown(menu_name, servings)
+        if items is None:
+            errors.append(f"{menu_name}: {total_cost}")
+            continue
+        for i_name, qty in model.consumption(menu_name, servings):
+            key = (sale_branch, i_name, sale_date)
+            totals[key] = totals.get(key, 0.0) + qty
+        processed.append(menu_name)
+        sales_rows.append((menu_name, servings, sale_branch, sale_price, total_cost, sale_date, sale_ref))
+
+    if not processed:
+        return processed, errors, []
+
+    branches  = {row[2] for row in sales_rows}
+    store     = load_inventory_store(branch if branches == {branch} else None)
+    hist_rows = []
+    touched   = {}       # (지점, 품목) → 차감 후 행 (재고 부족 알림은 모든 차감을 반영한 뒤 판단)
+    for (b, i_name, sale_date), qty in totals.items():
+        row = store.find(b, i_name)
+        if row is None:
+            continue   # 등록되지 않은 품목은 스킵
+        cat  = row['Category']
+        touched[(b, i_name)] = store.apply_delta(b, cat, i_name, -qty, floor=0, Date=today)
+        hist_rows.append([sale_date, b, cat, i_name, row['Unit'], 'OUT', qty])
+
+    alerts = []
+    for (b, i_name), row in touched.items():
+        new_qty = row['CurrentQty']
+        min_qty = to_float(row['MinQty'])
+        unit    = row['Unit']
+        if new_qty <= min_qty:
+            prefix = f"[{b}] " if len(branches) > 1 else ""
+            alerts.append(f"{prefix}{i_name} ({new_qty:.0f}{unit} / 최소 {min_qty:.0f}{unit})")
+
+    try:
+        # 로그 먼저 (이벤트 소싱 모드에서는 로그가 원본)
+        append_history(hist_rows)
+        _save_deducted(store)
+        # sales_log 는 마지막 - Ref 가 남아 있으면 차감까지 반영된 것
+        _append_sales_rows(sales_rows)
+    except Exception as e:
+        raise DeductWriteError(str(e)) from e
+    return processed, errors, alerts
+
+
+def _save_deducted(store):
+    """
+    판매 차감 후 재고 저장 - CSV/SQLite 모드에서만 (연속 차감의 재고 파일 저장은 write-behind 큐에서 합쳐짐).
+    이벤트 소싱 모드에서는 수량이 방금 추가한 로그를 접은 값이고 차감은 속성(Unit/MinQty/Note)을 바꾸지 않으므로
+    재고 파일을 다시 쓰지 않음 (스냅샷 수량은 기준 체크포인트를 새로 만들 때만 쓰임 - 모드를 끌 때는
+    load_inventory() 결과를 save_inventory 로 한 번 저장해 스냅샷 수량을 맞춤)
+    """
+    if not config.INVENTORY_EVENT_SOURCED:
+        store.flush()
+
+
 def _append_sales_log(menu_name, servings, branch, sale_price, cost, today):
     """sales_log.csv 에 판매 1건 추가."""
-    try:
-        df = robust_read_csv(SALES_LOG_FILE)
-        cols = ['Date', 'Branch', 'Menu', 'Servings', 'SalePrice', 'FoodCost', 'Margin', 'MarginRate']
-        if df.empty:
-            df = pd.DataFrame(columns=cols)
+    _append_sales_rows([(menu_name, servings, branch, sale_price, cost, today)])
+
+
+@data_mutation()
+def _append_sales_rows(sales_rows):
+    """
+    sales_log.csv 에 판매 여러 건을 한 번에 추가. sales_rows: [(menu, servings, branch, sale_price, cost, sale_date[, ref])]
+    Ref 는 차감이 반영됐다는 유일한 기록 (applied_sale_refs) → 대기 중인 재고·로그 저장을 먼저 파일에 반영한 뒤
+    sales_log 를 바로 기록. 실패하면 예외를 그대로 올림 (호출 측이 성공으로 보고하지 않도록)
+    """
+    if not sales_rows:
+        return
+    df = _read_latest(SALES_LOG_FILE, dtype={'Ref': str})
+    cols = ['Date', 'Branch', 'Menu', 'Servings', 'SalePrice', 'FoodCost', 'Margin', 'MarginRate', 'Ref']
+    rows = []
+    for menu_name, servings, branch, sale_price, cost, sale_date, *ref in sales_rows:
         margin      = round(sale_price - cost, 1)
         margin_rate = round((margin / sale_price * 100), 1) if sale_price > 0 else 0
-        new_row = pd.DataFrame([[today, branch, menu_name, servings,
-                                 sale_price, cost, margin, margin_rate]], columns=cols)
-        df = pd.concat([df, new_row], ignore_index=True)
-        df.to_csv(SALES_LOG_FILE, index=False, encoding='utf-8-sig')
-    except Exception as e:
-        print(f"sales_log 저장 오류: {e}")
+        rows.append([sale_date, branch, menu_name, servings, sale_price, cost, margin, margin_rate,
+                     (ref[0] if ref else None) or ""])
+    new_rows = pd.DataFrame(rows, columns=cols)
+    # 첫 판매(빈 로그)는 새 행 그대로 - 빈 프레임과 concat 하면 pandas FutureWarning
+    df = new_rows if df.empty else pd.concat([df, new_rows], ignore_index=True)
+    _writer().flush(strict=True)
+    _write_csv(df, SALES_LOG_FILE)
+    _writer().flush(SALES_LOG_FILE, strict=True)
+
+
+def applied_sale_refs(refs) -> set:
+    """refs 중 sales_log 에 이미 기록된(= 차감까지 반영된) 참조 - 중단 후 재실행되는 차감 작업의 중복 확인용"""
+    refs = {str(r) for r in refs if r}
+    df = _read_latest(SALES_LOG_FILE, dtype={'Ref': str})
+    if not refs or df.empty or 'Ref' not in df.columns:
+        return set()
+    return refs & set(df['Ref'].dropna().astype(str))
 
 
 def get_sales_summary(branch: str = None, start_date: str = None, end_date: str = None) -> pd.DataFrame:
@@ -459,7 +1325,7 @@ def get_sales_summary(branch: str = None, start_date: str = None, end_date: str
     branch, start_date(YYYY-MM-DD), end_date 필터 옵션.
     Returns: 집계 DataFrame (없으면 빈 DataFrame)
     """
-    df = robust_read_csv(SALES_LOG_FILE)
+    df = _read_latest(SALES_LOG_FILE)
     if df.empty:
         return pd.DataFrame()
     if branch:
@@ -471,12 +1337,27 @@ def get_sales_summary(branch: str = None, start_date: str = None, end_date: str
     return df
 
 
+def scan_low_stock() -> pd.DataFrame:
+    """
+    전 지점 최소 수량 미달 행 (CurrentQty <= MinQty, MinQty > 0).
+    샤드 모드에서는 지점 파일을 하나씩 읽어 미달 행만 모음.
+    """
+    parts = []
+    for _, df in iter_inventory_shards():
+        if df.empty:
+            continue
+        df = df.copy()
+        df['CurrentQty'] = pd.to_numeric(df['CurrentQty'], errors='coerce').fillna(0)
+        df['MinQty'] = pd.to_numeric(df['MinQty'], errors='coerce').fillna(0)
+        parts.append(df[(df['CurrentQty'] <= df['MinQty']) & (df['MinQty'] > 0)])
+    return _concat_shards(parts, config.INVENTORY_COLUMNS)
+
+
 def get_low_stock_items(branch: str) -> list:
     """지점별 최소 수량 미달 품목 목록 반환."""
-    inv_df = load_inventory()
-    if inv_df.empty:
+    branch_df = load_inventory(branch).copy()
+    if branch_df.empty:
         return []
-    branch_df = inv_df[inv_df['Branch'] == branch].copy()
     branch_df['MinQty'] = pd.to_numeric(branch_df['MinQty'], errors='coerce').fillna(0)
     branch_df['CurrentQty'] = pd.to_numeric(branch_df['CurrentQty'], errors='coerce').fillna(0)
     low = branch_df[branch_df['CurrentQty'] <= branch_df['MinQty']]
@@ -485,7 +1366,4 @@ def get_low_stock_items(branch: str) -> list:
 
 def get_available_menus() -> list:
     """레시피북에 등록된 전체 메뉴 목록 반환."""
-    recipe_db = robust_read_csv(RECIPE_DB_FILE)
-    if recipe_db.empty:
-        return []
-    return sorted(recipe_db['menu'].unique().tolist())
+    return list(get_cost_model().menu_names)
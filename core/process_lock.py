@@ -0,0 +1,94 @@
+"""
+프로세스 간 데이터 잠금 + 공유 데이터 버전
+- uvicorn --workers N 의 작업자들과 Streamlit 이 같은 CSV 를 읽고-수정하고-쓰므로
+  프로세스 안의 잠금(threading / SingleWriter)만으로는 한쪽 변경이 사라질 수 있음
+- ProcessLock: 잠금 파일에 fcntl.flock(LOCK_EX) (권고 잠금) + 스레드 RLock
+  같은 스레드는 다시 잡을 수 있음(재진입) - 바깥쪽에서 잡은 잠금 안에서 save_* 등을 불러도 됨
+  fcntl 이 없는 환경(Windows)에서는 프로세스 안의 스레드 잠금만 사용
+- DataVersion: 변경이 끝날 때마다 1 씩 올리는 공유 카운터 파일
+  프로세스별 캐시는 이 값을 키에 넣어 다른 프로세스의 변경을 감지
+
+사용 예:
+    lock = ProcessLock(config.DATA_LOCK_FILE)
+    with lock:
+        ... load → 수정 → save ...
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+    AVAILABLE = True
+except ImportError:
+    fcntl = None
+    AVAILABLE = False
+
+
+class ProcessLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0          # 현재 소유 스레드의 중첩 깊이
+        self._owner = None
+        self._fd = None
+
+    def acquire(self) -> None:
+        self._rlock.acquire()
+        if self._depth == 0 and AVAILABLE:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)   # 다른 프로세스가 놓을 때까지 대기
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._rlock.release()
+                raise
+        self._owner = threading.get_ident()
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+        self._rlock.release()
+
+    @property
+    def depth(self) -> int:
+        """현재 스레드가 잠금을 가진 중첩 깊이 (잡지 않았으면 0 - 다른 스레드 소유 여부와 무관)"""
+        return self._depth if self._owner == threading.get_ident() else 0
+
+    def __enter__(self) -> "ProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class DataVersion:
+    """공유 데이터 버전 카운터 (ProcessLock 을 가진 상태에서 bump)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self) -> int:
+        version = self.read() + 1
+        tmp = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp, "w") as f:
+            f.write(str(version))
+        os.replace(tmp, self.path)   # 읽는 쪽이 반쯤 쓰인 값을 보지 않음
+        return version
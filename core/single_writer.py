@@ -0,0 +1,76 @@
+"""
+단일 작성자(single-writer) 액터 - API 서버의 모든 변경 작업을 하나의 작업자가 순서대로 실행
+- FastAPI 는 def 엔드포인트를 스레드풀에서 동시에 실행 → 같은 재고 파일을 동시에 읽고/써서
+  한쪽 차감이 사라질 수 있음 (load → 수정 → save 사이에 끼어들기)
+- 변경 요청은 큐에 (함수, 인자) 를 넣고 결과(Future)를 await
+  작업자 태스크 하나가 큐에서 꺼내 한 번에 하나씩 실행 (파일 I/O 는 스레드에서 - 이벤트 루프는 막지 않음)
+- 조회 엔드포인트는 큐를 거치지 않음: 저장이 임시 파일 → os.replace 이고
+  같은 프로세스의 대기 중 저장은 write-behind 큐에서 읽으므로 항상 완성된 스냅샷을 봄
+
+사용 예:
+    writer = SingleWriter()
+    result = await writer.submit(deduct_by_menus, sales, branch)
+"""
+
+import asyncio
+from typing import Any, Callable, Optional
+
+
+class SingleWriter:
+    def __init__(self, name: str = "single-writer"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ================= 작업 요청 ==================
+    async def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """fn(*args, **kwargs) 를 작성자 태스크에서 실행하고 결과 반환 (예외는 그대로 전달)"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((fn, args, kwargs, future))
+        return await future
+
+    def pending(self) -> int:
+        """대기 중인 작업 수"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ================= 시작 / 종료 ==================
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        # 첫 요청 또는 이벤트 루프가 바뀐 경우 (테스트 클라이언트 등) 새로 시작
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        """남은 작업을 모두 처리한 뒤 종료"""
+        if self._task is None or self._task.done() or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # ================= 작업자 ==================
+    async def _run(self) -> None:
+        while True:
+            fn, args, kwargs, future = await self._queue.get()
+            # 요청 측 연결이 끊겨(future 취소) 있어도 이미 요청된 변경이므로 그대로 실행
+            try:
+                result = await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                if future.cancelled():
+                    print(f"{self.name}: 작업 오류 ({getattr(fn, '__name__', fn)}): {e}")
+                else:
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,394 @@
+"""
+SQLite 저장소 (WAL 모드)
+- core/logic.py 의 load_/save_ 함수가 config.STORAGE_BACKEND == "sqlite" 일 때 사용
+- 저장 시 DataFrame 전체를 다시 쓰지 않고 "바뀐 행만" INSERT/UPDATE/DELETE
+- 지점·날짜·품목 인덱스로 조회
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from config import INVENTORY_COLUMNS, HISTORY_COLUMNS, ORDERS_COLUMNS
+
+INVENTORY_KEY = ["Branch", "Category", "Item"]
+ORDERS_KEY = ["OrderId"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    Branch     TEXT NOT NULL,
+    Item       TEXT NOT NULL,
+    Category   TEXT NOT NULL,
+    Unit       TEXT,
+    CurrentQty REAL,
+    MinQty     REAL,
+    Note       TEXT,
+    Date       TEXT,
+    PRIMARY KEY (Branch, Category, Item)
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_branch_item ON inventory (Branch, Item);
+
+CREATE TABLE IF NOT EXISTS history (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    Date     TEXT,
+    Branch   TEXT,
+    Category TEXT,
+    Item     TEXT,
+    Unit     TEXT,
+    Type     TEXT,
+    Qty      REAL
+);
+CREATE INDEX IF NOT EXISTS idx_history_branch_date ON history (Branch, Date);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history (Date);
+
+CREATE TABLE IF NOT EXISTS orders (
+    OrderId     TEXT PRIMARY KEY,
+    Date        TEXT,
+    Branch      TEXT,
+    Vendor      TEXT,
+    Items       TEXT,
+    Status      TEXT,
+    CreatedDate TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (Status);
+"""
+
+# 스레드별 커넥션 캐시 (sqlite3 커넥션은 스레드 간 공유 불가)
+_local = threading.local()
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    db_path 에 대한 (스레드별) 커넥션 반환.
+    최초 연결 시 WAL 모드 설정 + 테이블/인덱스 생성.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # isolation_level=None → 트랜잭션은 아래 _transaction() 에서 명시적으로 관리
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conns[db_path] = conn
+    return conn
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ~ COMMIT/ROLLBACK 컨텍스트 (쓰기 잠금을 처음부터 확보해 lost update 방지)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# ================= 값 정규화 ==================
+def _clean(value):
+    """NaN → None, numpy 스칼라 → 파이썬 기본형 (SQLite 바인딩/비교용)"""
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def _same(a, b) -> bool:
+    """DB 값과 DataFrame 값 비교 (숫자는 float 로, 나머지는 문자열로 비교)"""
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, (int, float)) or isinstance(b, (int, float)):
+        try:
+            return float(a) == float(b)
+        except (TypeError, ValueError):
+            return False
+    return str(a) == str(b)
+
+
+def _records(df: pd.DataFrame, columns: Sequence[str]) -> List[tuple]:
+    df = df.reindex(columns=list(columns))
+    return [tuple(_clean(v) for v in row) for row in df.itertuples(index=False, name=None)]
+
+
+def _read(conn: sqlite3.Connection, sql: str, params: Sequence = (), columns: Sequence[str] = ()) -> pd.DataFrame:
+    cur = conn.execute(sql, tuple(params))
+    rows = cur.fetchall()
+    return pd.DataFrame(rows, columns=list(columns) or [d[0] for d in cur.description])
+
+
+# ================= 키 기반 테이블 공통 (inventory / orders) ==================
+def _sync_keyed_table(conn: sqlite3.Connection, table: str, df: pd.DataFrame,
+                      columns: Sequence[str], key: Sequence[str]) -> Dict[str, int]:
+    """
+    df 를 table 의 "원하는 최종 상태"로 보고 차이만 반영.
+    - df 에만 있는 키   → INSERT
+    - 값이 달라진 키     → UPDATE
+    - DB 에만 있는 키   → DELETE
+    Returns: {"inserted": n, "updated": n, "deleted": n}
+    """
+    key_idx = [columns.index(k) for k in key]
+    # 같은 키가 여러 번 있으면 마지막 행 우선 (기존 CSV 저장 결과와 동일하게 보이도록)
+    wanted = {}
+    for rec in _records(df, columns):
+        k = tuple("" if rec[i] is None else str(rec[i]) for i in key_idx)
+        wanted[k] = rec
+
+    stats = {"inserted": 0, "updated": 0, "deleted": 0}
+    col_sql = ", ".join(columns)
+    key_sql = " AND ".join(f"{k} = ?" for k in key)
+    set_sql = ", ".join(f"{c} = ?" for c in columns if c not in key)
+    value_idx = [i for i, c in enumerate(columns) if c not in key]
+
+    with _transaction(conn):
+        existing = {}
+        for rec in conn.execute(f"SELECT {col_sql} FROM {table}"):
+            existing[tuple("" if rec[i] is None else str(rec[i]) for i in key_idx)] = rec
+
+        for k, rec in wanted.items():
+            old = existing.pop(k, None)
+            if old is None:
+                row = list(rec)
+                for pos, i in enumerate(key_idx):
+                    row[i] = k[pos]   # 키 컬럼은 NOT NULL 이므로 정규화된 문자열 사용
+                placeholders = ", ".join("?" for _ in columns)
+                conn.execute(f"INSERT INTO {table} ({col_sql}) VALUES ({placeholders})", tuple(row))
+                stats["inserted"] += 1
+            elif not all(_same(old[i], rec[i]) for i in value_idx):
+                conn.execute(f"UPDATE {table} SET {set_sql} WHERE {key_sql}",
+                             tuple(rec[i] for i in value_idx) + k)
+                stats["updated"] += 1
+
+        for k in existing:
+            conn.execute(f"DELETE FROM {table} WHERE {key_sql}", k)
+            stats["deleted"] += 1
+    return stats
+
+
+def _apply_keyed_rows(conn: sqlite3.Connection, table: str, df: pd.DataFrame,
+                      columns: Sequence[str], key: Sequence[str], keys) -> Dict[str, int]:
+    """
+    변경된 키(keys)의 행만 반영 - 테이블 전체를 읽지 않음.
+    - df 에 있는 키 → UPSERT (INSERT ... ON CONFLICT DO UPDATE)
+    - df 에 없는 키 → DELETE
+    keys: 키 컬럼 값 튜플 목록 (문자열)
+    Returns: {"upserted": n, "deleted": n}
+    """
+    keys = {tuple(str(v) for v in k) for k in keys}
+    stats = {"upserted": 0, "deleted": 0}
+    if not keys:
+        return stats
+    if df.empty:
+        changed = df.reindex(columns=list(columns))
+    else:
+        index = pd.MultiIndex.from_frame(df[list(key)].fillna("").astype(str))
+        changed = df[index.isin(list(keys))]
+    key_idx = [columns.index(k) for k in key]
+    wanted = {}
+    for rec in _records(changed, columns):   # 같은 키가 여러 번 있으면 마지막 행 우선
+        wanted[tuple("" if rec[i] is None else str(rec[i]) for i in key_idx)] = rec
+
+    col_sql = ", ".join(columns)
+    placeholders = ", ".join("?" for _ in columns)
+    update_sql = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in key)
+    key_sql = " AND ".join(f"{k} = ?" for k in key)
+    with _transaction(conn):
+        for k, rec in wanted.items():
+            row = list(rec)
+            for pos, i in enumerate(key_idx):
+                row[i] = k[pos]   # 키 컬럼은 NOT NULL 이므로 정규화된 문자열 사용
+            conn.execute(f"INSERT INTO {table} ({col_sql}) VALUES ({placeholders}) "
+                         f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {update_sql}", tuple(row))
+            stats["upserted"] += 1
+        for k in keys - set(wanted):
+            stats["deleted"] += conn.execute(f"DELETE FROM {table} WHERE {key_sql}", k).rowcount
+    return stats
+
+
+# ================= Inventory ==================
+def load_inventory(db_path: str, branch: Optional[str] = None) -> pd.DataFrame:
+    conn = connect(db_path)
+    cols = ", ".join(INVENTORY_COLUMNS)
+    if branch:
+        return _read(conn, f"SELECT {cols} FROM inventory WHERE Branch = ? ORDER BY rowid",
+                     (branch,), INVENTORY_COLUMNS)
+    return _read(conn, f"SELECT {cols} FROM inventory ORDER BY rowid", (), INVENTORY_COLUMNS)
+
+
+def get_inventory_row(db_path: str, branch: str, category: str, item: str) -> Optional[dict]:
+    """기본키 (Branch, Category, Item) 인덱스 조회 - 없으면 None"""
+    conn = connect(db_path)
+    cur = conn.execute(
+        f"SELECT {', '.join(INVENTORY_COLUMNS)} FROM inventory WHERE Branch = ? AND Category = ? AND Item = ?",
+        (branch, category, item))
+    row = cur.fetchone()
+    return dict(zip(INVENTORY_COLUMNS, row)) if row else None
+
+
+def save_inventory(db_path: str, df: pd.DataFrame, keys=None) -> Dict[str, int]:
+    """
+    keys: 바뀐 (Branch, Category, Item) 목록 - 주어지면 그 행만 UPSERT/DELETE,
+          없으면 df 를 최종 상태로 보고 테이블 전체와 비교
+    """
+    if keys is not None:
+        return _apply_keyed_rows(connect(db_path), "inventory", df, INVENTORY_COLUMNS, INVENTORY_KEY, keys)
+    return _sync_keyed_table(connect(db_path), "inventory", df, INVENTORY_COLUMNS, INVENTORY_KEY)
+
+
+# ================= History ==================
+def load_history(db_path: str, branch: Optional[str] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """입출고 로그 조회 (branch / 날짜 범위 조건은 인덱스 사용)"""
+    conn = connect(db_path)
+    where, params = [], []
+    if branch:
+        where.append("Branch = ?")
+        params.append(branch)
+    if start_date:
+        where.append("Date >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("Date <= ?")
+        params.append(end_date)
+    sql = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return _read(conn, sql + " ORDER BY id", params, HISTORY_COLUMNS)
+
+
+def history_tail(db_path: str, n: int) -> pd.DataFrame:
+    """마지막 n 개 로그 (기본키 역순 조회 후 기록 순서로 되돌림)"""
+    conn = connect(db_path)
+    df = _read(conn, f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history ORDER BY id DESC LIMIT ?",
+               (int(n),), HISTORY_COLUMNS)
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+def history_count(db_path: str) -> int:
+    """
+    로그 행 수 - id 범위로 계산 (COUNT(*) 전체 스캔 없음).
+    id 는 항상 연속: 로그는 추가만 하고, 지울 때는 save_history 가 전체를 지우고 다시 넣음 (AUTOINCREMENT 가 이어짐)
+    """
+    lo, hi = connect(db_path).execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+    return 0 if lo is None else hi - lo + 1
+
+
+def history_from(db_path: str, start: int) -> pd.DataFrame:
+    """기록 순서로 start 번째(0부터) 이후 로그 - 기본키 범위 조회 (WHERE id >= 첫 id + start)"""
+    conn = connect(db_path)
+    lo = conn.execute("SELECT MIN(id) FROM history").fetchone()[0]
+    if lo is None:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return _read(conn, f"SELECT {', '.join(HISTORY_COLUMNS)} FROM history WHERE id >= ? ORDER BY id",
+                 (lo + int(start),), HISTORY_COLUMNS)
+
+
+def append_history(db_path: str, rows: List[Sequence]) -> int:
+    """로그 행 추가만 수행 (rows: HISTORY_COLUMNS 순서의 리스트들)"""
+    if not rows:
+        return 0
+    conn = connect(db_path)
+    placeholders = ", ".join("?" for _ in HISTORY_COLUMNS)
+    with _transaction(conn):
+        conn.executemany(f"INSERT INTO history ({', '.join(HISTORY_COLUMNS)}) VALUES ({placeholders})",
+                         [tuple(_clean(v) for v in r) for r in rows])
+    return len(rows)
+
+
+def history_periods(db_path: str) -> List[str]:
+    """로그가 있는 연월 목록 (Date 인덱스만 사용)"""
+    conn = connect(db_path)
+    rows = conn.execute("SELECT DISTINCT substr(Date, 1, 7) FROM history WHERE Date IS NOT NULL ORDER BY 1")
+    return [r[0] for r in rows if r[0] and len(r[0]) == 7 and r[0][4] == "-"]
+
+
+def history_signature(db_path: str) -> list:
+    """로그 변경 감지용 값 [MAX(id), AUTOINCREMENT 시퀀스] - 행 추가·전체 교체 시 항상 바뀜"""
+    conn = connect(db_path)
+    max_id = conn.execute("SELECT MAX(id) FROM history").fetchone()[0]
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'history'").fetchone()
+    return [max_id or 0, seq[0] if seq else 0]
+
+
+def save_history(db_path: str, df: pd.DataFrame) -> Dict[str, int]:
+    """
+    기존 save_history(df) 호출 호환용.
+    df 가 "DB 내용 + 뒤에 추가된 행" 형태면 추가분만 INSERT,
+    그 외(중간 행 수정/삭제, 일괄 가져오기 등)는 한 트랜잭션 안에서 전체 교체.
+    """
+    conn = connect(db_path)
+    records = _records(df, HISTORY_COLUMNS)
+    col_sql = ", ".join(HISTORY_COLUMNS)
+    placeholders = ", ".join("?" for _ in HISTORY_COLUMNS)
+
+    with _transaction(conn):
+        count = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+        last = conn.execute(f"SELECT {col_sql} FROM history ORDER BY id DESC LIMIT 1").fetchone()
+        is_tail_append = (
+            len(records) >= count
+            and (count == 0 or all(_same(a, b) for a, b in zip(last, records[count - 1])))
+        )
+        if is_tail_append:
+            new_rows = records[count:]
+            conn.executemany(f"INSERT INTO history ({col_sql}) VALUES ({placeholders})", new_rows)
+            return {"inserted": len(new_rows), "replaced": 0}
+
+        conn.execute("DELETE FROM history")
+        conn.executemany(f"INSERT INTO history ({col_sql}) VALUES ({placeholders})", records)
+        return {"inserted": 0, "replaced": len(records)}
+
+
+# ================= Orders ==================
+def load_orders(db_path: str, status: Optional[str] = None) -> pd.DataFrame:
+    conn = connect(db_path)
+    cols = ", ".join(ORDERS_COLUMNS)
+    if status:
+        return _read(conn, f"SELECT {cols} FROM orders WHERE Status = ? ORDER BY rowid",
+                     (status,), ORDERS_COLUMNS)
+    return _read(conn, f"SELECT {cols} FROM orders ORDER BY rowid", (), ORDERS_COLUMNS)
+
+
+def save_orders(db_path: str, df: pd.DataFrame, keys=None) -> Dict[str, int]:
+    """keys: 바뀐 OrderId 목록 (save_inventory 와 같음)"""
+    if keys is not None:
+        return _apply_keyed_rows(connect(db_path), "orders", df, ORDERS_COLUMNS, ORDERS_KEY,
+                                 [(k,) for k in keys])
+    return _sync_keyed_table(connect(db_path), "orders", df, ORDERS_COLUMNS, ORDERS_KEY)
+
+
+# ================= CSV → SQLite 최초 이전 ==================
+def is_empty(db_path: str, table: str) -> bool:
+    conn = connect(db_path)
+    return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+
+def import_frame(db_path: str, table: str, df: pd.DataFrame) -> int:
+    """
+    비어 있는 테이블에 기존 CSV 내용을 옮겨 담음 (최초 1회).
+    이미 데이터가 있으면 아무것도 하지 않음.
+    """
+    if df is None or df.empty or not is_empty(db_path, table):
+        return 0
+    if table == "inventory":
+        return save_inventory(db_path, df)["inserted"]
+    if table == "orders":
+        return save_orders(db_path, df)["inserted"]
+    if table == "history":
+        return append_history(db_path, _records(df, HISTORY_COLUMNS))
+    raise ValueError(f"Unknown table: {table}")
@@ -0,0 +1,133 @@
+"""
+CSV 저장 write-behind 큐
+- save_inventory / save_orders 등이 같은 파일을 짧은 시간 안에 여러 번 저장하면 마지막 내용만 한 번 기록
+- 기록은 임시 파일에 쓴 뒤 os.replace 로 교체 → 다른 프로세스(API 서버)가 반쯤 쓰인 파일을 읽지 않음
+- 같은 프로세스의 읽기는 pending() 으로 아직 기록 전인 최신 내용을 먼저 확인 (read-your-writes)
+- 프로세스 종료 시(atexit) 남은 저장을 모두 기록
+- delay=0 이면 큐 없이 즉시 기록 (원자적 교체는 동일)
+"""
+
+import atexit
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+def write_csv_atomic(path: str, df: pd.DataFrame, **csv_kwargs) -> None:
+    """같은 폴더의 임시 파일에 쓴 뒤 os.replace (교체는 원자적)"""
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        df.to_csv(tmp, **csv_kwargs)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class WriteBehind:
+    def __init__(self, delay: float = 0.3):
+        """
+        Args:
+            delay: 첫 저장 요청 후 실제 기록까지 기다리는 시간(초). 그 사이 같은 파일 저장은 합쳐짐
+        """
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()              # 기록 순서 보장 (큐에서 꺼내기 + 기록을 한 번에)
+        self._pending: Dict[str, tuple] = {}          # path → (df, csv_kwargs, 기록 예정 시각)
+        self._inflight: Dict[str, pd.DataFrame] = {}  # 기록 중인 내용 (교체 완료 전 읽기용)
+        self._thread = None
+
+    # ================= 저장 요청 ==================
+    def submit(self, path: str, df: pd.DataFrame, **csv_kwargs) -> None:
+        """path 에 df 저장 요청 (이미 대기 중인 저장이 있으면 내용만 교체, 기록 시각은 유지)"""
+        snapshot = df.copy()   # 호출 측이 이후 df 를 수정해도 영향 없음
+        if self.delay <= 0:
+            with self._io_lock:
+                write_csv_atomic(path, snapshot, **csv_kwargs)
+            return
+        with self._cond:
+            due = self._pending[path][2] if path in self._pending else time.monotonic() + self.delay
+            self._pending[path] = (snapshot, csv_kwargs, due)
+            self._ensure_thread()
+            self._cond.notify()
+
+    def pending(self, path: str) -> Optional[pd.DataFrame]:
+        """아직 파일에 반영되지 않은 최신 내용 (없으면 None)"""
+        with self._cond:
+            if path in self._pending:
+                return self._pending[path][0].copy()
+            if path in self._inflight:
+                return self._inflight[path].copy()
+        return None
+
+    def flush(self, path: Optional[str] = None, strict: bool = False) -> None:
+        """
+        대기 중인 저장을 즉시 기록 (path 지정 시 해당 파일만).
+        strict=True: 기록 실패 시 (다시 대기열에 넣은 뒤) 첫 오류를 호출 측에 전달
+        """
+        errors = self._write_due(force=True, only=path)
+        if strict and errors:
+            raise errors[0]
+
+    # ================= 백그라운드 기록 ==================
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                wait = min(entry[2] for entry in self._pending.values()) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            self._write_due()
+
+    def _write_due(self, force: bool = False, only: Optional[str] = None) -> list:
+        errors = []
+        with self._io_lock:
+            now = time.monotonic()
+            with self._cond:
+                paths = [p for p, entry in self._pending.items()
+                         if (force or entry[2] <= now) and (only is None or p == only)]
+                batch = {p: self._pending.pop(p) for p in paths}
+                self._inflight.update({p: entry[0] for p, entry in batch.items()})
+            for path, (df, csv_kwargs, _due) in batch.items():
+                try:
+                    write_csv_atomic(path, df, **csv_kwargs)
+                except Exception as e:
+                    errors.append(e)
+                    print(f"write-behind 저장 오류 ({os.path.basename(path)}), 다시 시도 예정: {e}")
+                    with self._cond:
+                        # 그 사이 새 저장 요청이 없으면 다시 대기열로
+                        self._pending.setdefault(path, (df, csv_kwargs, time.monotonic() + max(self.delay, 1.0)))
+                finally:
+                    with self._cond:
+                        self._inflight.pop(path, None)
+        return errors
+
+
+# ================= 프로세스 단일 인스턴스 ==================
+_writer: Optional[WriteBehind] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer(delay: float) -> WriteBehind:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind(delay)
+        return _writer
+
+
+@atexit.register
+def flush_all() -> None:
+    """종료 시 남은 저장 모두 기록"""
+    if _writer is not None:
+        _writer.flush()
@@ -18,8 +18,14 @@ cat << CONFIG_EOF > Caddyfile
 }
 CONFIG_EOF
 
+# 0. 원가 모델 아티팩트 준비 (레시피·단가 CSV 가 바뀐 경우에만 다시 컴파일)
+python -c "from core.logic import build_cost_model_artifact; print('cost model', build_cost_model_artifact()[:12])"
+
 # 1. FastAPI 서버 실행 (백그라운드)
-uvicorn api_server:app --host 127.0.0.1 --port 8000 &
+# API_WORKERS 개 작업자 프로세스 - 파일 변경은 프로세스 간 잠금으로 직렬화 (core/process_lock.py)
+# 이전 실행에서 처리 중이던 비동기 차감 작업은 작업자가 뜨기 전에 한 번만 되돌림
+python -c "import config; from core.job_queue import JobQueue; print('recovered jobs', JobQueue(config.JOB_QUEUE_DB).recover())"
+uvicorn api_server:app --host 127.0.0.1 --port 8000 --workers "${API_WORKERS:-1}" &
 
 # 2. Streamlit 화면 실행 (백그라운드)
 streamlit run app-en.py --server.port 8501 --server.address 127.0.0.1 &
@@ -0,0 +1,101 @@
+import os
+import sys
+
+# core/ 및 config.py 임포트를 위해 저장소 루트를 경로에 추가 (api_server.py 와 같은 방식)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+import config
+from core import logic, process_lock
+
+MENU = "갈릭 난"          # 원가DB(data/)에 있는 메뉴 - 재료가 재고에 등록돼 있어야 차감됨
+BRANCH = "동탄"
+START_QTY = 1000.0
+
+# 운영 데이터 경로 (BASE_DIR 아래) - 테스트마다 tmp_path 로 돌림. 레시피·단가 원본(data/)은 읽기만 함
+_CONFIG_FILES = ["DATA_FILE", "HISTORY_FILE", "ORDERS_FILE", "SALES_LOG_FILE", "SQLITE_DB_FILE",
+                 "PRICE_HISTORY_FILE", "JOB_QUEUE_DB", "DATA_LOCK_FILE", "DATA_VERSION_FILE"]
+_CONFIG_DIRS = ["HISTORY_PARTITION_DIR", "BRANCH_SHARD_DIR", "INVENTORY_CHECKPOINT_DIR"]
+_LOGIC_FILES = ["DATA_FILE", "HISTORY_FILE", "ORDERS_FILE", "SALES_LOG_FILE", "SQLITE_DB_FILE",
+                "PRICE_HISTORY_FILE"]
+
+
+def menu_ingredients(menu=MENU):
+    """메뉴 1인분의 원재료 (원가DB 품목명 → g)"""
+    usage = {}
+    for item, qty in logic.get_cost_model().consumption(menu, 1):
+        usage[item] = usage.get(item, 0.0) + qty
+    return usage
+
+
+def stock(branch=BRANCH):
+    """현재 재고 수량 (품목 → 수량) - 대기 중인 저장을 반영한 뒤 읽음"""
+    logic.flush_pending_writes()
+    inv = logic.load_inventory(branch)
+    return dict(zip(inv["Item"], pd.to_numeric(inv["CurrentQty"])))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    운영 데이터(재고·로그·sales_log·작업 큐 등)를 tmp_path 로 돌리고
+    MENU 의 재료를 BRANCH 재고에 START_QTY 씩 등록한 CSV 모드 저장소
+    """
+    logic.flush_pending_writes()   # 이전 테스트의 대기 중인 저장이 새 경로와 섞이지 않게
+    monkeypatch.setattr(config, "BASE_DIR", str(tmp_path))
+    for name in _CONFIG_FILES:
+        monkeypatch.setattr(config, name, str(tmp_path / os.path.basename(getattr(config, name))))
+    for name in _CONFIG_DIRS:
+        monkeypatch.setattr(config, name, str(tmp_path / os.path.basename(getattr(config, name))))
+    for name in _LOGIC_FILES:
+        monkeypatch.setattr(logic, name, getattr(config, name))
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "csv")
+    monkeypatch.setattr(config, "HISTORY_APPEND_ONLY", True)
+    monkeypatch.setattr(config, "SHARD_BY_BRANCH", False)
+    monkeypatch.setattr(config, "INVENTORY_EVENT_SOURCED", False)
+    monkeypatch.setattr(logic, "_data_lock", process_lock.ProcessLock(config.DATA_LOCK_FILE))
+    monkeypatch.setattr(logic, "_data_version", process_lock.DataVersion(config.DATA_VERSION_FILE))
+    monkeypatch.setattr(logic, "_sqlite_migrated", False)
+
+    rows = [[BRANCH, item, "식재료", "g", START_QTY, 0, "", "2026-10-01"] for item in menu_ingredients()]
+    pd.DataFrame(rows, columns=config.INVENTORY_COLUMNS).to_csv(config.DATA_FILE, index=False,
+                                                                encoding="utf-8-sig")
+    yield tmp_path
+    logic.flush_pending_writes()
+
+
+@pytest.fixture
+def api(data_dir, monkeypatch):
+    """api_server - 작업 큐·멱등성 키·단일 작성자를 tmp 저장소용 새 인스턴스로"""
+    import api_server
+    from core.idempotency import IdempotencyStore
+    from core.job_queue import JobQueue
+    from core.single_writer import SingleWriter
+
+    monkeypatch.setattr(api_server, "jobs", JobQueue(config.JOB_QUEUE_DB))
+    monkeypatch.setattr(api_server, "idempotency", IdempotencyStore(config.JOB_QUEUE_DB))
+    monkeypatch.setattr(api_server, "writer", SingleWriter("test-writer"))
+    return api_server
+
+
+def call(api_server, requests):
+    """
+    requests: [(method, url, kwargs), ...] 를 한 이벤트 루프에서 동시에 보내고 응답 목록 반환
+    (요청이 예약한 백그라운드 작업까지 마친 뒤 작성자 정리)
+    """
+    import asyncio
+    import httpx
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*[client.request(method, url, **kwargs)
+                                               for method, url, kwargs in requests])
+        while api_server._job_tasks:
+            await asyncio.gather(*list(api_server._job_tasks))
+        await api_server.writer.stop()
+        return responses
+
+    return asyncio.run(run())
@@ -0,0 +1,104 @@
+import hashlib
+
+from conftest import BRANCH, MENU, START_QTY, call, menu_ingredients, stock
+
+OUT = "/api/inventory/out"
+
+
+def _body(qty=1, **extra):
+    return {"branch_id": 1, "items": [{"item_id": MENU, "qty": qty}], **extra}
+
+
+def _expected(servings):
+    return {item: START_QTY - g * servings for item, g in menu_ingredients().items()}
+
+
+def test_same_key_replays_first_response_without_deducting_again(api):
+    headers = {"Idempotency-Key": "pos-1"}
+    first, = call(api, [("POST", OUT, {"json": _body(2), "headers": headers})])
+    again, = call(api, [("POST", OUT, {"json": _body(2), "headers": headers})])
+
+    assert first.status_code == again.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.json() == first.json()
+    assert stock() == _expected(2)
+
+
+def test_request_id_is_the_key_when_no_header(api):
+    call(api, [("POST", OUT, {"json": _body(1, request_id="pos-2")})])
+    again, = call(api, [("POST", OUT, {"json": _body(1, request_id="pos-2")})])
+
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert stock() == _expected(1)
+
+
+def test_same_key_with_different_body_is_422(api):
+    headers = {"Idempotency-Key": "pos-3"}
+    call(api, [("POST", OUT, {"json": _body(1), "headers": headers})])
+    other, = call(api, [("POST", OUT, {"json": _body(3), "headers": headers})])
+
+    assert other.status_code == 422
+    assert stock() == _expected(1)
+
+
+def test_key_still_in_progress_is_409(api):
+    request = api.DeductRequest(**_body(1))
+    fingerprint = hashlib.sha256(request.model_dump_json(exclude={"request_id"}).encode("utf-8")).hexdigest()
+    assert api.idempotency.reserve("inventory/out:pos-4", fingerprint) is None   # 처리 중인 첫 요청
+
+    busy, = call(api, [("POST", OUT, {"json": _body(1), "headers": {"Idempotency-Key": "pos-4"}})])
+
+    assert busy.status_code == 409
+    assert busy.headers["Retry-After"] == "1"
+    assert stock() == _expected(0)
+
+
+def test_concurrent_retries_deduct_once(api):
+    headers = {"Idempotency-Key": "pos-5"}
+    responses = call(api, [("POST", OUT, {"json": _body(1), "headers": headers})] * 5)
+
+    codes = {r.status_code for r in responses}
+    assert 200 in codes and codes <= {200, 409}
+    assert stock() == _expected(1)
+
+
+def test_stale_key_after_applied_deduction_is_recovered(api):
+    # 차감·sales_log 기록 후 응답 저장 전에 중단 → 예약이 만료된 뒤 같은 키로 재시도
+    key = "inventory/out:pos-6"
+    api.deduct_by_menus([(MENU, 1, 0)], branch=BRANCH, ref=key)
+
+    retry, = call(api, [("POST", OUT, {"json": _body(1), "headers": {"Idempotency-Key": "pos-6"}})])
+
+    assert retry.status_code == 200
+    assert retry.json()["recovered"] is True
+    assert stock() == _expected(1)
+
+
+def test_recovered_job_is_not_deducted_again(api):
+    job_id = api.jobs.enqueue("deduct", {"branch": BRANCH, "sales": [[MENU, 1, 0]]})
+    api._run_deduct_job(job_id)
+    assert api.jobs.get(job_id)["status"] == "done"
+    assert stock() == _expected(1)
+
+    # complete 전에 중단된 것처럼 running 으로 되돌린 뒤 재시작 복구
+    api.jobs._conn().execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+    assert api.jobs.recover() == 1
+    api._run_deduct_job(job_id)
+
+    job = api.jobs.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"]["recovered"] is True
+    assert stock() == _expected(1)
+
+
+def test_async_mode_replays_202_and_job_deducts_once(api):
+    headers = {"Idempotency-Key": "pos-7"}
+    first, = call(api, [("POST", OUT + "?mode=async", {"json": _body(1), "headers": headers})])
+    again, = call(api, [("POST", OUT + "?mode=async", {"json": _body(1), "headers": headers})])
+
+    assert first.status_code == again.status_code == 202
+    assert again.json()["job_id"] == first.json()["job_id"]
+    job, = call(api, [("GET", first.json()["status_url"], {})])
+    assert job.json()["status"] == "done"
+    assert stock() == _expected(1)
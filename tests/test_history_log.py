@@ -0,0 +1,47 @@
+import pandas as pd
+
+from core.history_log import HistoryLog
+
+COLUMNS = ["Date", "Branch", "Category", "Item", "Unit", "Type", "Qty"]
+
+
+def _reader(path):
+    return pd.read_csv(path)
+
+
+def _row(i):
+    return ["2026-10-01", "동탄", "채소", f"item{i}", "g", "IN", i]
+
+
+def test_row_count_matches_rows_read_with_blank_lines(tmp_path):
+    log = HistoryLog(str(tmp_path / "stock_history.csv"), COLUMNS)
+    log.append([_row(1), _row(2)])
+    log.close()
+    segment = log.segments()[-1]
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write("\n   \n")                        # 손으로 고치다 남은 빈 줄 / 공백 줄 (중간)
+    log.append([_row(3)])
+    log.close()
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write("\n\n")                           # 끝에 남은 빈 줄
+
+    assert log.row_count() == len(log.load(_reader)) == 3
+    assert log.tail(3, _reader)["Item"].tolist() == ["item1", "item2", "item3"]
+
+
+def test_row_count_counts_appended_bytes_incrementally(tmp_path):
+    log = HistoryLog(str(tmp_path / "stock_history.csv"), COLUMNS)
+    log.append([_row(1)])
+    log.close()
+    assert log.row_count() == 1
+
+    segment = log.segments()[-1]
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write("2026-10-02,동탄,채소,item2,g,OUT")     # 끝나지 않은 줄 (쓰는 중)
+    assert log.row_count() == 2
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write(",2\n\n")
+    assert log.row_count() == len(log.load(_reader)) == 2
+
+    log.append([_row(3)])
+    assert log.row_count() == len(log.load(_reader)) == 3
@@ -0,0 +1,59 @@
+import json
+
+from conftest import MENU, START_QTY, call, menu_ingredients, stock
+
+INGEST = "/api/inventory/ingest"
+
+
+def _ndjson(records):
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+
+def _sale(**extra):
+    return {"branch_id": 1, "item_id": MENU, "qty": 1, **extra}
+
+
+def _post(api, records, headers=None):
+    response, = call(api, [("POST", INGEST, {"content": _ndjson(records), "headers": headers or {}})])
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def _expected(servings):
+    return {item: START_QTY - g * servings for item, g in menu_ingredients().items()}
+
+
+def test_resent_ids_are_skipped(api):
+    batches, done = _post(api, [_sale(id="R-1"), _sale(id="R-2"), _sale(id="R-1")])
+    assert done["done"] is True and done["deducted"] == 2
+    assert [n for b in batches for n in b["skipped"]] == [3]       # 같은 스트림 안에서 겹친 id
+
+    batches, done = _post(api, [_sale(id="R-1"), _sale(id="R-2"), _sale(id="R-3")])
+    assert done["deducted"] == 1
+    assert [n for b in batches for n in b["skipped"]] == [1, 2]    # 이미 반영된 재전송
+
+    assert stock() == _expected(3)
+
+
+def test_resent_stream_with_same_key_applies_only_remaining_lines(api):
+    _post(api, [_sale(), _sale()], headers={"Idempotency-Key": "upload-1"})
+
+    # 끊긴 스트림을 같은 키로 처음부터 다시 보냄 (앞의 두 줄 + 새 줄)
+    batches, done = _post(api, [_sale(), _sale(), _sale()], headers={"Idempotency-Key": "upload-1"})
+    assert done["deducted"] == 1
+    assert [n for b in batches for n in b["skipped"]] == [1, 2]
+
+    # 다른 키(다른 업로드)는 같은 내용이어도 새 판매
+    _, done = _post(api, [_sale()], headers={"Idempotency-Key": "upload-2"})
+    assert done["deducted"] == 1
+
+    assert stock() == _expected(4)
+
+
+def test_lines_without_id_or_key_are_not_deduplicated(api):
+    _post(api, [_sale()])
+    _, done = _post(api, [_sale()])
+
+    assert done["deducted"] == 1
+    assert stock() == _expected(2)
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+import config
+from conftest import BRANCH, MENU, START_QTY, menu_ingredients, stock
+from core import logic
+
+FLOUR = "중2등급 밀가루"
+
+# (판매일, 인분) 차감과 (입고일, 수량) 입고를 날짜 순으로
+EVENTS = [
+    ("2026-10-02", "OUT", 2),
+    ("2026-10-03", "IN", 500.0),
+    ("2026-10-05", "OUT", 3),
+    ("2026-10-09", "OUT", 1),
+    ("2026-10-10", "IN", 50.0),
+    ("2026-10-12", "OUT", 4),
+]
+
+
+def _replay(events):
+    """app-en.py 와 같은 방식으로 기록: 차감은 deduct_by_menus, 입고는 로그 + (CSV 모드만) 재고 반영"""
+    for day, kind, amount in events:
+        if kind == "OUT":
+            processed, errors, _ = logic.deduct_by_menus([(MENU, amount, 0, BRANCH, day)], branch=BRANCH)
+            assert processed == [MENU] and not errors
+            continue
+        with logic.data_mutation():
+            logic.append_history([[day, BRANCH, "식재료", FLOUR, "g", "IN", amount]])
+            if not config.INVENTORY_EVENT_SOURCED:
+                store = logic.load_inventory_store(BRANCH)
+                store.apply_delta(BRANCH, "식재료", FLOUR, amount)
+                store.flush()
+
+
+@pytest.fixture
+def event_sourced(data_dir, monkeypatch):
+    monkeypatch.setattr(config, "INVENTORY_EVENT_SOURCED", True)
+    monkeypatch.setattr(config, "INVENTORY_CHECKPOINT_EVERY", 3)   # 체크포인트 이후 꼬리 읽기까지
+    return data_dir
+
+
+def test_event_sourced_fold_matches_csv_mode(data_dir, tmp_path_factory, monkeypatch):
+    _replay(EVENTS)
+    expected = stock()
+    assert expected[FLOUR] == START_QTY + 550 - 100 * 10
+
+    monkeypatch.setattr(config, "INVENTORY_EVENT_SOURCED", True)
+    monkeypatch.setattr(config, "INVENTORY_CHECKPOINT_EVERY", 3)
+    es_dir = tmp_path_factory.mktemp("event_sourced")
+    snapshot = pd.read_csv(config.DATA_FILE)
+    for name in ["DATA_FILE", "HISTORY_FILE", "SALES_LOG_FILE"]:
+        path = str(es_dir / (name.lower() + ".csv"))
+        monkeypatch.setattr(config, name, path)
+        monkeypatch.setattr(logic, name, path)
+    monkeypatch.setattr(config, "INVENTORY_CHECKPOINT_DIR", str(es_dir / "inventory_checkpoints"))
+    snapshot.assign(CurrentQty=START_QTY).to_csv(config.DATA_FILE, index=False, encoding="utf-8-sig")
+
+    _replay(EVENTS)
+
+    assert stock() == expected
+    assert len(logic._inventory_ledger().counts()) > 1   # 기준 + 3건마다 체크포인트
+
+
+def test_as_of_matches_csv_mode_replay_of_earlier_events(event_sourced):
+    _replay(EVENTS)
+    logic.flush_pending_writes()
+
+    for as_of in ["2026-10-01", "2026-10-03", "2026-10-05", "2026-10-11", "2026-10-12"]:
+        df = logic.load_inventory_as_of(as_of, branch=BRANCH)
+        folded = dict(zip(df["Item"], pd.to_numeric(df["CurrentQty"])))
+        expected = {item: START_QTY for item in menu_ingredients()}
+        for day, kind, amount in EVENTS:
+            if day > as_of:
+                continue
+            if kind == "IN":
+                expected[FLOUR] += amount
+            else:
+                for item, g in menu_ingredients().items():
+                    expected[item] = max(expected[item] - g * amount, 0.0)
+        assert folded == expected, as_of
+
+
+def test_as_of_requires_event_sourced_mode(data_dir):
+    with pytest.raises(ValueError):
+        logic.load_inventory_as_of("2026-10-05")
+
+
+def test_event_sourced_deduction_does_not_rewrite_snapshot(event_sourced):
+    before = open(config.DATA_FILE, "rb").read()
+    _replay([e for e in EVENTS if e[1] == "OUT"])
+    logic.flush_pending_writes()
+
+    assert open(config.DATA_FILE, "rb").read() == before   # 수량은 로그를 접은 값
+    assert stock()[FLOUR] == START_QTY - 100 * 10
+    assert logic.load_inventory(BRANCH)["Date"].max() == "2026-10-12"
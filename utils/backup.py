@@ -7,6 +7,7 @@ Backup utilities for Everest Inventory System
 
 import os
 import shutil
+import sqlite3
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional
 import pandas as pd
@@ -17,6 +18,36 @@ def get_backup_dir(base_dir: str) -> str:
     return os.path.join(base_dir, "backups")
 
 
+def _backup_name(file_path: str, base_dir: str) -> str:
+    """Relative path inside the backup folder (basename for files outside base_dir)"""
+    rel = os.path.relpath(os.path.abspath(file_path), os.path.abspath(base_dir))
+    if rel.startswith(os.pardir):
+        return os.path.basename(file_path)
+    return rel
+
+
+def _is_sqlite(path: str) -> bool:
+    return path.endswith(".db")
+
+
+def _sqlite_copy(src: str, dest: str) -> None:
+    """
+    Copy a SQLite database with the online backup API.
+    Includes transactions that are only in the -wal file and gives a consistent snapshot of a live DB.
+    When dest is a live DB, its content is replaced under SQLite's own locking, so open connections
+    in other processes and their -wal/-shm files stay consistent (a plain file copy can corrupt it).
+    """
+    source = sqlite3.connect(src, timeout=30)
+    try:
+        target = sqlite3.connect(dest, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+
 def create_backup(base_dir: str, files_to_backup: List[str]) -> Tuple[bool, str]:
     """
     Create a backup of specified files.
@@ -39,9 +70,14 @@ def create_backup(base_dir: str, files_to_backup: List[str]) -> Tuple[bool, str]
         backed_up = []
         for file_path in files_to_backup:
             if os.path.exists(file_path):
-                filename = os.path.basename(file_path)
+                # Keep sub-folders under base_dir (e.g. branches/<branch>/inventory.csv)
+                filename = _backup_name(file_path, base_dir)
                 dest = os.path.join(backup_folder, filename)
-                shutil.copy2(file_path, dest)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                if _is_sqlite(file_path):
+                    _sqlite_copy(file_path, dest)
+                else:
+                    shutil.copy2(file_path, dest)
                 backed_up.append(filename)
         
         if backed_up:
@@ -75,9 +111,9 @@ def list_backups(base_dir: str) -> List[dict]:
         if os.path.isdir(folder_path):
             # Get folder size
             total_size = sum(
-                os.path.getsize(os.path.join(folder_path, f))
-                for f in os.listdir(folder_path)
-                if os.path.isfile(os.path.join(folder_path, f))
+                os.path.getsize(os.path.join(root, f))
+                for root, _dirs, files in os.walk(folder_path)
+                for f in files
             )
             
             # Parse date from folder name
@@ -115,14 +151,23 @@ def restore_from_backup(backup_path: str, target_dir: str) -> Tuple[bool, str]:
         if not os.path.exists(backup_path):
             return False, f"❌ Backup not found: {backup_path}"
         
-        # Copy all files from backup to target
+        # Copy all files from backup to target (sub-folders included)
         restored = []
-        for filename in os.listdir(backup_path):
-            src = os.path.join(backup_path, filename)
-            dest = os.path.join(target_dir, filename)
-            
-            if os.path.isfile(src):
-                shutil.copy2(src, dest)
+        for root, _dirs, files in os.walk(backup_path):
+            for name in files:
+                if name.endswith(("-wal", "-shm")):
+                    continue   # WAL files from older backups would be mixed into the live DB's WAL
+                src = os.path.join(root, name)
+                filename = os.path.relpath(src, backup_path)
+                dest = os.path.join(target_dir, filename)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                if _is_sqlite(name):
+                    _sqlite_copy(src, dest)
+                else:
+                    # Copy to a temp file and swap it in, so readers never see a half-copied file
+                    tmp = f"{dest}.restore.{os.getpid()}"
+                    shutil.copy2(src, tmp)
+                    os.replace(tmp, dest)
                 restored.append(filename)
         
         return True, f"✅ Restored {len(restored)} files from backup"